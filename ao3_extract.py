@@ -0,0 +1,143 @@
+# coding:utf-8
+"""
+AO3 页面解析
+
+每个页面只用 lxml 解析一次，所有查询使用预编译的 XPath，
+作品页一次得到标题、作者、元数据、章节列表和正文段落。
+"""
+
+from lxml import etree
+
+AO3_HOST = "https://archiveofourown.org"
+
+_TITLE = etree.XPath('//h2[@class="title heading"]')
+_AUTHOR = etree.XPath('//a[@rel="author"]')
+_FANDOMS = etree.XPath('//dd[@class="fandom tags"]//a/text()')
+_RATING = etree.XPath('//dd[@class="rating tags"]//a/text()')
+_WARNINGS = etree.XPath('//dd[@class="warning tags"]//a/text()')
+_RELATIONSHIPS = etree.XPath('//dd[@class="relationship tags"]//a/text()')
+_CHARACTERS = etree.XPath('//dd[@class="character tags"]//a/text()')
+_FREEFORM = etree.XPath('//dd[@class="freeform tags"]//a/text()')
+_SUMMARY = etree.XPath('//div[@class="summary module"]//blockquote//text()')
+_WORDS = etree.XPath('//dd[@class="words"]/text()')
+_CHAPTERS = etree.XPath('//dd[@class="chapters"]/text()')
+_CHAPTER_INDEX = etree.XPath('//div[@id="chapter_index"]//option/@value')
+_WORK_PARAGRAPHS = etree.XPath('//div[@class="userstuff module"]//p | //div[@id="chapters"]//div[@class="userstuff"]//p')
+_FALLBACK_TEXT = etree.XPath('//div[contains(@class, "userstuff")]//text()')
+_CHAPTER_TITLE = etree.XPath('//h3[@class="title"]//text()')
+_CHAPTER_PARAGRAPHS = etree.XPath('//div[@class="userstuff module"]//p')
+_STRING = etree.XPath('string()')
+_NEXT_PAGE = etree.XPath('//li[@class="next"]//a/@href')
+_LIST_LINKS = {
+    'series': etree.XPath('//ul[@class="series work index group"]//h4[@class="heading"]//a[1]/@href'),
+    'author': etree.XPath('//ol[@class="work index group"]//h4[@class="heading"]//a[1]/@href'),
+    'tag': etree.XPath('//ol[contains(@class, "work index")]//h4[@class="heading"]//a[1]/@href'),
+}
+
+
+def _parse(html_content):
+    return etree.HTML(html_content)
+
+
+def _stripped_text(element):
+    """等价于 BeautifulSoup 的 get_text(strip=True)"""
+    return ''.join(t.strip() for t in element.itertext())
+
+
+def _paragraphs(elements):
+    paragraphs = []
+    for p in elements:
+        text = _STRING(p).strip()
+        if text:
+            paragraphs.append(text)
+    return paragraphs
+
+
+class WorkPage:
+    """作品页解析结果
+
+    不保留 lxml 树，可以在进程之间传递（pickle）
+    """
+    __slots__ = ('title', 'author', 'metadata', 'chapter_ids', 'paragraphs', 'fallback_paragraphs')
+
+    def __init__(self, tree, save_metadata=True):
+        title_elem = _TITLE(tree)
+        self.title = _stripped_text(title_elem[0]) if title_elem else "未知标题"
+
+        author_elem = _AUTHOR(tree)
+        self.author = _stripped_text(author_elem[0]) if author_elem else "未知作者"
+
+        self.metadata = _extract_metadata(tree) if save_metadata else []
+        # 转成普通 str，XPath 结果字符串会引用整棵树
+        self.chapter_ids = [str(value) for value in _CHAPTER_INDEX(tree)]
+        self.paragraphs = _paragraphs(_WORK_PARAGRAPHS(tree))
+
+        # 正文选择器没有结果时的兜底：取 userstuff 中较长的文本片段
+        self.fallback_paragraphs = _fallback_paragraphs(tree)
+
+
+def _fallback_paragraphs(tree):
+    texts = (t.strip() for t in _FALLBACK_TEXT(tree))
+    return [t for t in texts if t and len(t) > 10]
+
+
+def _extract_metadata(tree):
+    metadata = []
+
+    fandoms = _FANDOMS(tree)
+    if fandoms:
+        metadata.append(f"Fandom: {', '.join(fandoms)}")
+
+    rating = _RATING(tree)
+    if rating:
+        metadata.append(f"Rating: {rating[0]}")
+
+    warnings = _WARNINGS(tree)
+    if warnings:
+        metadata.append(f"Warnings: {', '.join(warnings)}")
+
+    relationships = _RELATIONSHIPS(tree)
+    if relationships:
+        metadata.append(f"Relationships: {', '.join(relationships[:5])}")
+
+    characters = _CHARACTERS(tree)
+    if characters:
+        metadata.append(f"Characters: {', '.join(characters[:10])}")
+
+    tags = _FREEFORM(tree)
+    if tags:
+        metadata.append(f"Tags: {', '.join(tags[:10])}")
+
+    summary_elem = _SUMMARY(tree)
+    if summary_elem:
+        summary = ' '.join([s.strip() for s in summary_elem if s.strip()])
+        metadata.append(f"\nSummary:\n{summary}")
+
+    words = _WORDS(tree)
+    chapters = _CHAPTERS(tree)
+    if words:
+        metadata.append(f"\nWords: {words[0]}")
+    if chapters:
+        metadata.append(f"Chapters: {chapters[0]}")
+
+    return metadata
+
+
+def parse_work_page(html_content, save_metadata=True):
+    """解析作品页，返回 WorkPage"""
+    return WorkPage(_parse(html_content), save_metadata)
+
+
+def parse_chapter_page(html_content):
+    """解析章节页，返回 (章节标题, 段落列表)；没有标题时章节标题为空字符串"""
+    tree = _parse(html_content)
+    ch_title = ' '.join([t.strip() for t in _CHAPTER_TITLE(tree) if t.strip()])
+    return ch_title, _paragraphs(_CHAPTER_PARAGRAPHS(tree))
+
+
+def parse_work_list(html_content, kind):
+    """解析系列 / 作者 / Tag 列表页，返回 (作品链接列表, 是否有下一页)"""
+    tree = _parse(html_content)
+    links = _LIST_LINKS[kind](tree)
+    work_urls = [f"{AO3_HOST}{link}" for link in links if '/works/' in link]
+    return work_urls, bool(_NEXT_PAGE(tree))
@@ -0,0 +1,453 @@
+# coding:utf-8
+"""
+AO3 下载任务：作品、系列、作者、Tag
+"""
+
+import os
+import time
+import threading
+import queue
+import re
+import requests
+import cpu_pool
+from document import Document, Chapter
+from exporters import render_txt, document_digest
+import export_manifest
+from core import (config, task_status, add_log, add_to_history, downloaded_file_path, export_queue,
+                  index_saved_file, is_url_downloaded, iter_pipeline_queue, set_task_error, start_pipeline_producer)
+
+# AO3 待下载作品队列上限（列表抓取领先下载的最大数量）
+AO3_WORK_QUEUE_SIZE = 50
+# AO3 合集（系列 / 作者 / Tag 全部作品合并为一本）的保存子目录
+AO3_ANTHOLOGY_DIR = '合集'
+
+
+def run_ao3_task(params):
+    """运行AO3文章爬取任务 - 参考 https://github.com/610yilingliu/download_ao3_v2"""
+    from ao3_extract import parse_work_page, parse_chapter_page, parse_work_list
+    
+    urls = params.get('urls', [])
+    mode = params.get('mode', 'work')  # work, series, author, tag
+    download_chapters = params.get('download_chapters', True)
+    save_metadata = params.get('save_metadata', True)
+    export_pdf = params.get('export_pdf', False)  # 是否导出PDF
+    pdf_backend = params.get('pdf_backend') or config.get('pdf_backend', 'xhtml2pdf')  # PDF 后端
+    export_epub = params.get('export_epub', False)  # 是否导出EPUB
+    anthology = params.get('anthology', False)  # 是否把本次的全部作品合并导出为一本合集 EPUB
+    anthology_pdf = params.get('anthology_pdf', False)  # 合集同时导出 PDF
+    skip_existing = params.get('skip_existing', True)  # 已下载过的作品不再请求（关闭时重新获取，内容未变化的不重写）
+    
+    if not urls:
+        add_log('❌ 请提供AO3链接')
+        set_task_error('请提供AO3链接')
+        return
+    
+    add_log(f"📚 开始AO3爬取任务，模式: {mode}")
+    add_log(f"📍 共 {len(urls)} 个链接")
+    
+    # 创建保存目录（使用自定义路径）
+    save_root = config.get('save_path', './dir')
+    base_dir = os.path.join(save_root, 'ao3')
+    os.makedirs(base_dir, exist_ok=True)
+    
+    # AO3请求Session - 更好的连接管理
+    session = requests.Session()
+    session.headers.update({
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+        'Accept-Language': 'en-US,en;q=0.5',
+        'Accept-Encoding': 'gzip, deflate',
+        'Connection': 'keep-alive',
+    })
+    # 设置cookie绕过年龄确认
+    session.cookies.set('accepted_tos', '20180523', domain='.archiveofourown.org')
+    session.cookies.set('view_adult', 'true', domain='.archiveofourown.org')
+    
+    saved_count = 0
+    # 失败的请求 / 作品（列表线程和下载线程都会追加）
+    failures = []
+    # 合集中的作品（TXT 路径，按列表顺序）和作者
+    anthology_works = []
+    anthology_authors = []
+    
+    def safe_filename(name):
+        """生成安全的文件名"""
+        # Windows非法字符
+        invalid_chars = r'[\\/*?:"<>|\r\n\t]'
+        name = re.sub(invalid_chars, '_', name).strip()
+        # 移除连续空格和下划线
+        name = re.sub(r'[_\s]+', ' ', name).strip()
+        return name[:100] if name else "untitled"
+    
+    def anthology_name(url):
+        """由系列 / 作者 / Tag 链接生成合集名称"""
+        series_match = re.search(r'/series/(\d+)', url)
+        if series_match:
+            return f"系列 {series_match.group(1)}"
+        user_match = re.search(r'/users/([^/?]+)', url)
+        if user_match:
+            return f"作者 {requests.utils.unquote(user_match.group(1))}"
+        tag_match = re.search(r'/tags/([^/]+)/works', url)
+        if tag_match:
+            return f"Tag {requests.utils.unquote(tag_match.group(1))}"
+        return "AO3合集"
+    
+    def fetch_with_retry(url, max_retries=3, wait_time=30):
+        """带重试逻辑的请求函数"""
+        for attempt in range(max_retries):
+            try:
+                response = session.get(url, timeout=30)
+                
+                if response.status_code == 200:
+                    return response
+                elif response.status_code == 429:
+                    # 请求过于频繁
+                    add_log(f"   ⚠️ 请求过于频繁(429)，等待 {wait_time} 秒后重试...")
+                    time.sleep(wait_time)
+                    continue
+                elif response.status_code == 404:
+                    add_log(f"   ⚠️ 作品不存在或已删除 (404)")
+                    return None
+                elif response.status_code == 403:
+                    add_log(f"   ⚠️ 无权访问 (403)，可能需要登录或作品已锁定")
+                    return None
+                else:
+                    add_log(f"   ⚠️ HTTP {response.status_code}，重试中...")
+                    time.sleep(5)
+                    
+            except requests.exceptions.Timeout:
+                add_log(f"   ⚠️ 请求超时，重试 {attempt + 1}/{max_retries}")
+                time.sleep(10)
+            except requests.exceptions.ConnectionError:
+                add_log(f"   ⚠️ 连接错误，重试 {attempt + 1}/{max_retries}")
+                time.sleep(10)
+            except Exception as e:
+                add_log(f"   ⚠️ 请求错误: {str(e)}")
+                time.sleep(5)
+        
+        add_log(f"   ❌ 多次重试后仍然失败")
+        failures.append(url)
+        return None
+    
+    def enqueue_exports(txt_filepath, doc_digest, title):
+        """把过期的 PDF / EPUB 交给后台导出队列（已是最新的格式不再渲染）"""
+        formats = [fmt for fmt, wanted in (('pdf', export_pdf), ('epub', export_epub)) if wanted]
+        formats = export_queue.stale_formats(txt_filepath, formats, doc_digest, pdf_backend)
+        if export_queue.enqueue(txt_filepath, formats, title=title, pdf_backend=pdf_backend):
+            add_log(f"   📦 已加入导出队列: {', '.join(fmt.upper() for fmt in formats)}")
+    
+    def download_work(work_url):
+        """下载单个作品"""
+        nonlocal saved_count
+        
+        try:
+            # 检查是否已下载（自动去重）：文件仍在时跳过；文件已删除或关闭了 skip_existing 时重新获取，
+            # 是否重写由导出清单中的内容哈希决定
+            known_path = downloaded_file_path(work_url) if skip_existing and is_url_downloaded(work_url) else None
+            if known_path and os.path.exists(known_path):
+                add_log(f"⏭️ 已下载过，跳过: {work_url}")
+                # 只补上缺少的导出格式
+                saved = export_manifest.saved_entry(os.path.dirname(known_path), work_url)
+                if saved and export_queue.has_source(saved[0]):
+                    enqueue_exports(*saved, os.path.splitext(os.path.basename(saved[0]))[0])
+                # 之前下载过的作品仍按顺序编入合集
+                if anthology and export_queue.has_source(known_path):
+                    anthology_works.append(known_path)
+                return
+            
+            add_log(f"📖 正在获取: {work_url}")
+            
+            # 处理 ?view_adult=true 参数
+            if '?' not in work_url:
+                work_url_with_adult = work_url + "?view_adult=true"
+            else:
+                work_url_with_adult = work_url + "&view_adult=true"
+            
+            # 获取作品页面 (带重试)
+            response = fetch_with_retry(work_url_with_adult)
+            if response is None:
+                return
+            
+            # 单次解析作品页：标题、作者、元数据、章节列表、正文（在进程池中执行）
+            page = cpu_pool.run(parse_work_page, response.content.decode('utf-8'), save_metadata)
+            title = page.title
+            author = page.author
+            metadata = page.metadata
+            
+            add_log(f"   📝 标题: {title}")
+            add_log(f"   👤 作者: {author}")
+            
+            # 获取正文内容，整理为章节列表（TXT / HTML / PDF / EPUB 共用）
+            chapters = []
+            
+            # 检查是否有多章节
+            chapter_links = page.chapter_ids
+            
+            if chapter_links and download_chapters and len(chapter_links) > 1:
+                add_log(f"   📑 共 {len(chapter_links)} 章节")
+                
+                # 章节页交给进程池解析，当前线程继续请求下一章，最后按章节顺序取回结果
+                chapter_futures = []
+                for idx, chapter_id in enumerate(chapter_links):
+                    chapter_url = f"{work_url.split('?')[0]}/chapters/{chapter_id.split('/')[-1]}?view_adult=true"
+                    add_log(f"      第 {idx+1}/{len(chapter_links)} 章...")
+                    task_status['progress'] = int((idx / len(chapter_links)) * 50) + 50
+                    
+                    try:
+                        ch_response = fetch_with_retry(chapter_url)
+                        if ch_response is None:
+                            continue
+                        chapter_futures.append(
+                            (idx, cpu_pool.submit(parse_chapter_page, ch_response.content.decode('utf-8'))))
+                        
+                        time.sleep(0.5)  # 避免请求过快
+                        
+                    except Exception as e:
+                        add_log(f"      ⚠️ 获取章节失败: {str(e)}")
+                
+                for idx, ch_future in chapter_futures:
+                    try:
+                        ch_title, ch_content = ch_future.result()
+                    except Exception as e:
+                        add_log(f"      ⚠️ 解析第 {idx + 1} 章失败: {str(e)}")
+                        continue
+                    chapters.append(Chapter(ch_title or f"第 {idx + 1} 章", ch_content))
+            
+            chaptered = bool(chapters)
+            if not chaptered:
+                # 单章节或不下载全部章节；都没有时尝试其他方式获取内容
+                chapters = [Chapter(None, page.paragraphs or page.fallback_paragraphs)]
+            
+            doc = Document('ao3', title, author, work_url, chapters, metadata=metadata, chaptered=chaptered)
+            article = render_txt(doc)
+            
+            # 创建作者目录
+            author_dir = os.path.join(base_dir, safe_filename(author))
+            os.makedirs(author_dir, exist_ok=True)
+            
+            # 保存TXT文件：同一作品写回原来的文件，内容未变化时跳过
+            txt_filename = f"{safe_filename(title)}.txt"
+            txt_filepath = export_manifest.claim_path(author_dir, txt_filename, work_url)
+            doc_digest = document_digest(doc)
+            
+            unchanged = export_manifest.is_current(txt_filepath, doc_digest)
+            if unchanged:
+                add_log(f"   ⏭️ 内容未变化: {os.path.basename(txt_filepath)}")
+            else:
+                with open(txt_filepath, 'w', encoding='utf-8') as f:
+                    f.write(article)
+                export_manifest.record(txt_filepath, doc_digest, work_url)
+                index_saved_file(txt_filepath)
+                
+                saved_count += 1
+                add_log(f"   ✅ 已保存: {os.path.basename(txt_filepath)}")
+                
+                # 记录到下载历史
+                add_to_history(
+                    item_type='ao3',
+                    url=work_url,
+                    title=title,
+                    author=author,
+                    file_path=txt_filepath,
+                    source='ao3'
+                )
+            
+            # 保存源文件，PDF / EPUB 交给后台导出队列渲染（已是最新的格式不再渲染）
+            if not export_queue.has_source(txt_filepath) or not unchanged:
+                export_queue.save_source(txt_filepath, doc)
+            
+            enqueue_exports(txt_filepath, doc_digest, title)
+            
+            if anthology:
+                anthology_works.append(txt_filepath)
+                if author not in anthology_authors:
+                    anthology_authors.append(author)
+            
+        except Exception as e:
+            add_log(f"   ❌ 下载失败: {str(e)}")
+            failures.append(work_url)
+    
+    def get_works_from_series(series_url):
+        """逐个产出系列中的作品链接"""
+        try:
+            add_log(f"📚 获取系列作品列表: {series_url}")
+            response = fetch_with_retry(series_url)
+            if response is None:
+                return
+            work_urls, _ = parse_work_list(response.content.decode('utf-8'), 'series')
+            
+            add_log(f"   找到 {len(work_urls)} 篇作品")
+            yield from work_urls
+        except Exception as e:
+            add_log(f"   ❌ 获取系列失败: {str(e)}")
+            failures.append(series_url)
+    
+    def get_works_from_author(author_url, max_pages=20):
+        """逐页产出作者的作品链接（拿到一页就交给下载队列）"""
+        try:
+            add_log(f"👤 获取作者作品列表: {author_url}")
+            
+            total_works = 0
+            page = 1
+            
+            while True:
+                page_url = f"{author_url}?page={page}"
+                response = fetch_with_retry(page_url)
+                if response is None:
+                    break
+                new_works, has_next = parse_work_list(response.content.decode('utf-8'), 'author')
+                
+                if not new_works:
+                    break
+                
+                total_works += len(new_works)
+                add_log(f"   第 {page} 页: 找到 {len(new_works)} 篇")
+                yield from new_works
+                
+                # 检查是否有下一页
+                if not has_next:
+                    break
+                
+                page += 1
+                if page > max_pages:
+                    add_log(f"   ⚠️ 已达到 {max_pages} 页限制")
+                    break
+                
+                time.sleep(0.5)
+            
+            add_log(f"   共找到 {total_works} 篇作品")
+            
+        except Exception as e:
+            add_log(f"   ❌ 获取作者作品失败: {str(e)}")
+            failures.append(author_url)
+    
+    def get_works_from_tag(tag_url, max_pages=5):
+        """逐页产出Tag下的作品链接（拿到一页就交给下载队列）"""
+        try:
+            # 提取tag名称用于显示
+            tag_match = re.search(r'/tags/([^/]+)/works', tag_url)
+            tag_name = tag_match.group(1) if tag_match else ("搜索结果" if '/works/search' in tag_url else "未知标签")
+            tag_name = requests.utils.unquote(tag_name)
+            
+            add_log(f"🏷️ 获取Tag作品列表: {tag_name}")
+            
+            total_works = 0
+            page = 1
+            
+            while True:
+                # AO3 tag页面的分页格式
+                if '?' in tag_url:
+                    page_url = f"{tag_url}&page={page}"
+                else:
+                    page_url = f"{tag_url}?page={page}"
+                
+                add_log(f"   正在获取第 {page} 页...")
+                response = fetch_with_retry(page_url)
+                
+                if response is None:
+                    add_log(f"   ⚠️ 获取页面失败")
+                    break
+                
+                new_works, has_next = parse_work_list(response.content.decode('utf-8'), 'tag')
+                
+                if not new_works:
+                    add_log(f"   第 {page} 页没有更多作品")
+                    break
+                
+                total_works += len(new_works)
+                add_log(f"   第 {page} 页: 找到 {len(new_works)} 篇")
+                yield from new_works
+                
+                # 检查是否有下一页
+                if not has_next:
+                    add_log("   已到达最后一页")
+                    break
+                
+                page += 1
+                if page > max_pages:
+                    add_log(f"   ⚠️ 已达到 {max_pages} 页限制")
+                    break
+                
+                time.sleep(1)  # AO3对频繁请求比较敏感
+            
+            add_log(f"   🏷️ Tag [{tag_name}] 共找到 {total_works} 篇作品")
+            
+        except Exception as e:
+            add_log(f"   ❌ 获取Tag作品失败: {str(e)}")
+            failures.append(tag_url)
+    
+    # 获取最大页数参数
+    max_pages = params.get('max_pages', 5)
+    
+    def iter_work_urls():
+        """按输入顺序产出待下载作品链接，跨来源实时去重"""
+        seen = set()
+        for url in urls:
+            url = url.strip()
+            if not url:
+                continue
+            
+            if '/series/' in url:
+                # 系列作品
+                source = get_works_from_series(url)
+            elif '/users/' in url and '/works' in url:
+                # 作者作品页
+                source = get_works_from_author(url, max_pages)
+            elif ('/tags/' in url and '/works' in url) or '/works/search' in url:
+                # Tag作品页 / 作品搜索结果（列表结构相同）
+                source = get_works_from_tag(url, max_pages)
+            elif '/works/' in url:
+                # 单个作品
+                source = [url]
+            else:
+                add_log(f"⚠️ 无法识别的链接格式: {url}")
+                continue
+            
+            for work_url in source:
+                if work_url in seen:
+                    continue
+                seen.add(work_url)
+                yield work_url
+    
+    # 列表抓取与作品下载并行：列表线程边翻页边入队，下载在拿到第一页后即开始
+    work_queue = queue.Queue(maxsize=AO3_WORK_QUEUE_SIZE)
+    stop_event = threading.Event()
+    listing_state = start_pipeline_producer(iter_work_urls(), work_queue, stop_event, 'ao3-listing')
+    
+    try:
+        for idx, work_url in enumerate(iter_pipeline_queue(work_queue)):
+            if not task_status['running']:
+                add_log("⚠️ 任务已停止，结束下载")
+                break
+            # 总数随列表抓取增长，按当前已知数量估算进度
+            task_status['progress'] = min(99, int((idx / max(1, listing_state['count'])) * 100))
+            download_work(work_url)
+            time.sleep(1)  # 避免请求过快
+    finally:
+        stop_event.set()
+    
+    add_log(f"📊 共发现 {listing_state['count']} 篇作品")
+    
+    if anthology:
+        if len(anthology_works) < 2:
+            add_log("   ⚠️ 可编入合集的作品不足 2 篇，不生成合集")
+        else:
+            name = safe_filename(anthology_name(urls[0]))
+            if len(urls) > 1:
+                name += f" 等{len(urls)}个来源"
+            formats = ['epub'] + (['pdf'] if anthology_pdf else [])
+            out_base = os.path.join(base_dir, AO3_ANTHOLOGY_DIR, name)
+            author_label = anthology_authors[0] if len(anthology_authors) == 1 else '多位作者'
+            export_queue.enqueue_anthology(out_base, anthology_works, formats, title=name, author=author_label,
+                                           pdf_backend=pdf_backend)
+            add_log(f"📚 合集已加入导出队列: {name}（{len(anthology_works)} 篇，{', '.join(fmt.upper() for fmt in formats)}）")
+    
+    add_log(f"✅ AO3下载完成！")
+    add_log(f"   📚 共保存 {saved_count} 篇文章")
+    if failures:
+        add_log(f"   ⚠️ 下载失败: {len(failures)} 处")
+        set_task_error(f"{len(failures)} 处下载失败")
+    if export_pdf or export_epub:
+        add_log(f"   📦 PDF / EPUB 在后台导出队列中生成，进度见导出状态")
+    add_log(f"   📁 保存位置: {base_dir}/作者名/")
+
@@ -0,0 +1,209 @@
+# coding:utf-8
+"""
+命令行批量运行任务（不启动 Web 服务）
+
+用法: python batch.py jobs.json [--jobs 2] [--cpu-workers N] [--pdf-workers N]
+
+jobs.json 是任务列表（JSON 数组，或每行一个 JSON 的 JSONL；"-" 表示从标准输入读取），
+每个任务与 POST /api/task/start 的请求体相同:
+    {"type": "ao3", "params": {"urls": ["https://archiveofourown.org/works/123"], "export_epub": true}}
+支持的任务类型: single_img、single_txt、author_img、author_txt、like_share_tag、ao3、zip
+
+每个任务在单独的子进程中运行（任务状态、日志都是进程内的全局状态），--jobs 个任务同时运行。
+进度以 NDJSON 逐行写到标准输出，每行一个事件:
+    start / log / progress / history / end（带 job 序号），最后是 summary
+下载历史由主进程统一写入；子进程的导出队列使用各自的队列文件，任务结束前等待导出完成，
+结束时删除队列文件，导出失败的作业在 end 事件的 exports.failed 中列出
+（源文件仍在，之后可以用 POST /api/export 重新导出）。
+子进程共用保存目录时，导出清单和同步标记在跨进程文件锁下重新读取后合并写入（见 file_lock.py）。
+不导入 Flask；有任务失败时退出码为 1。
+"""
+
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+
+# 默认同时运行的任务数；未指定 --cpu-workers / --pdf-workers 时各子进程按并行任务数平分 CPU
+DEFAULT_JOBS = 1
+# 子进程异常退出时在 end 事件中附带的标准错误行数
+STDERR_TAIL = 20
+
+
+def read_jobs(path):
+    """读取任务列表：JSON 数组或 JSONL，类型未知的任务直接报错"""
+    from tasks import LOFTER_TASKS
+
+    known_types = set(LOFTER_TASKS) | {'ao3', 'zip'}
+    text = sys.stdin.read() if path == '-' else open(path, 'r', encoding='utf-8').read()
+    text = text.strip()
+    if text.startswith('['):
+        jobs = json.loads(text)
+    else:
+        jobs = [json.loads(line) for line in text.splitlines() if line.strip()]
+    for job in jobs:
+        if not isinstance(job, dict) or job.get('type') not in known_types:
+            raise ValueError(f"未知的任务类型: {job}")
+    return jobs
+
+
+# ---- 子进程：运行一个任务 ----
+
+def close_queue(export_queue, queue_file):
+    """导出完成后删除本进程的队列文件（不会再有进程读取它），返回 end 事件的 exports：
+    各状态的作业数和失败的导出（标题、路径、各格式的错误信息）"""
+    status = export_queue.status(limit=None)
+    failed = [{'title': job['title'], 'path': job.get('txt_path') or job.get('out_base', ''),
+               'errors': {fmt: result['message'] for fmt, result in job['results'].items() if not result['ok']}}
+              for job in status['jobs'] if job['status'] == 'failed']
+    if os.path.exists(queue_file):
+        os.remove(queue_file)
+    return {'counts': status['counts'], 'failed': failed}
+
+
+def run_one(job_id, job, cpu_workers, pdf_workers):
+    """子进程内运行一个任务，事件以 NDJSON 写到标准输出"""
+    out = sys.stdout
+    # 任务中的 print 改写到标准错误，不混入 NDJSON
+    sys.stdout = sys.stderr
+    out_lock = threading.Lock()
+
+    def emit(event, **fields):
+        line = json.dumps({'event': event, 'job': job_id, 'time': time.time(), **fields}, ensure_ascii=False)
+        with out_lock:
+            out.write(line + '\n')
+            out.flush()
+
+    import core
+    import cpu_pool
+    import tasks
+    from pdf_render import pdf_pool
+
+    core.log_listener = lambda message: emit('log', message=message, progress=core.task_status['progress'])
+    core.history_sink = lambda **record: emit('history', **record)
+    core.index_files = False
+    cpu_pool.configure(cpu_workers)
+    pdf_pool.configure(pdf_workers)
+    queue_file = f"{os.path.splitext(core.EXPORT_QUEUE_FILE)[0]}.batch-{os.getpid()}.json"
+    core.export_queue.use_file(queue_file)
+
+    finished = threading.Event()
+
+    def report_progress():
+        last = None
+        while not finished.wait(0.5):
+            progress = core.task_status['progress']
+            if progress != last:
+                emit('progress', progress=progress)
+                last = progress
+
+    threading.Thread(target=report_progress, name='batch-progress', daemon=True).start()
+    start = time.monotonic()
+    tasks.run_spider_task(job['type'], job.get('params', {}))
+    # 爬取结束后等待本进程提交的 PDF / EPUB 导出完成
+    core.export_queue.wait_idle()
+    finished.set()
+    exports = close_queue(core.export_queue, queue_file)
+    error = core.task_status['error']
+    emit('end', ok=error is None, error=error, exports=exports, elapsed=round(time.monotonic() - start, 3))
+    cpu_pool.shutdown()
+    pdf_pool.shutdown()
+    return 0 if error is None else 1
+
+
+# ---- 主进程：调度子进程并汇总输出 ----
+
+def run_batch(jobs, parallel, cpu_workers, pdf_workers):
+    """按 parallel 个子进程并行运行 jobs，返回失败的任务数"""
+    import core
+
+    out_lock = threading.Lock()
+    slots = threading.Semaphore(parallel)
+    results = {}
+
+    def emit(event):
+        with out_lock:
+            sys.stdout.write(json.dumps(event, ensure_ascii=False) + '\n')
+            sys.stdout.flush()
+
+    def run(job_id, job):
+        cmd = [sys.executable, os.path.abspath(__file__), '--run-one', str(job_id), json.dumps(job),
+               str(cpu_workers), str(pdf_workers)]
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+                                encoding='utf-8', errors='replace')
+        emit({'event': 'start', 'job': job_id, 'time': time.time(), 'type': job['type'], 'pid': proc.pid})
+        stderr_tail = deque(maxlen=STDERR_TAIL)
+        stderr_reader = threading.Thread(target=lambda: stderr_tail.extend(proc.stderr), daemon=True)
+        stderr_reader.start()
+        ended = False
+        for line in proc.stdout:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            if event.get('event') == 'history':
+                core.add_to_history(event['item_type'], event['url'], event['title'], event['author'],
+                                    event['file_path'], event['source'])
+            elif event.get('event') == 'end':
+                ended = True
+                results[job_id] = event['ok']
+            emit(event)
+        proc.wait()
+        stderr_reader.join()
+        if not ended:
+            # 子进程在任务开始前就退出（例如导入失败、被终止）
+            results[job_id] = False
+            emit({'event': 'end', 'job': job_id, 'time': time.time(), 'ok': False,
+                  'error': f"进程退出，返回码 {proc.returncode}", 'stderr': ''.join(stderr_tail)})
+
+    def worker(job_id, job):
+        try:
+            run(job_id, job)
+        finally:
+            slots.release()
+
+    threads = []
+    for job_id, job in enumerate(jobs):
+        slots.acquire()
+        thread = threading.Thread(target=worker, args=(job_id, job), name=f'batch-job-{job_id}', daemon=True)
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    return sum(1 for ok in results.values() if not ok)
+
+
+def option(args, name, default):
+    if name in args:
+        return int(args[args.index(name) + 1])
+    return default
+
+
+def main(argv):
+    # NDJSON 和日志统一用 UTF-8（Windows 控制台默认编码无法输出 emoji）
+    for stream in (sys.stdout, sys.stderr):
+        stream.reconfigure(encoding='utf-8', errors='replace')
+    if argv[:1] == ['--run-one']:
+        job_id, job, cpu_workers, pdf_workers = argv[1:5]
+        return run_one(int(job_id), json.loads(job), int(cpu_workers), int(pdf_workers))
+    if not argv or argv[0] in ('-h', '--help'):
+        print(__doc__)
+        return 0
+
+    jobs = read_jobs(argv[0])
+    parallel = max(1, option(argv, '--jobs', DEFAULT_JOBS))
+    share = max(1, ((os.cpu_count() or 2) - 1) // min(parallel, max(1, len(jobs))))
+    cpu_workers = option(argv, '--cpu-workers', share)
+    pdf_workers = option(argv, '--pdf-workers', share)
+    start = time.monotonic()
+    failed = run_batch(jobs, parallel, cpu_workers, pdf_workers)
+    sys.stdout.write(json.dumps({'event': 'summary', 'time': time.time(), 'jobs': len(jobs), 'failed': failed,
+                                 'elapsed': round(time.monotonic() - start, 3)}, ensure_ascii=False) + '\n')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
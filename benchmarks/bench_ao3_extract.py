@@ -0,0 +1,139 @@
+"""
+AO3 页面解析基准：ao3_extract 单次 lxml 解析与旧版 BeautifulSoup + lxml 双解析对比
+
+用法: python benchmarks/bench_ao3_extract.py [段落数量]
+分别测量作品页和章节页的单页 CPU 耗时，两种方式结果一致时才计时。
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+from lxml import etree
+
+from ao3_extract import parse_work_page, parse_chapter_page
+
+
+def build_work_page(num_paragraphs, num_chapters=30):
+    """生成与 AO3 作品页结构相近的 HTML"""
+    options = ''.join(f'<option value="/works/1/chapters/{100 + i}">{i + 1}. Chapter</option>'
+                      for i in range(num_chapters))
+    paragraphs = ''.join(f'<p>Paragraph {i} with <em>some</em> emphasis and a fairly long sentence '
+                         f'that keeps going to look like real prose, again and again.</p>\n'
+                         for i in range(num_paragraphs))
+    return f'''<!DOCTYPE html><html><head><title>Work</title></head><body>
+<div id="header"><ul>{'<li><a href="/x">nav</a></li>' * 80}</ul></div>
+<dl class="work meta group">
+<dd class="rating tags"><ul><li><a class="tag">Teen And Up Audiences</a></li></ul></dd>
+<dd class="warning tags"><ul><li><a class="tag">No Archive Warnings Apply</a></li></ul></dd>
+<dd class="fandom tags"><ul><li><a class="tag">Fandom A</a></li><li><a class="tag">Fandom B</a></li></ul></dd>
+<dd class="relationship tags"><ul>{''.join(f'<li><a class="tag">A/B {i}</a></li>' for i in range(8))}</ul></dd>
+<dd class="character tags"><ul>{''.join(f'<li><a class="tag">Char {i}</a></li>' for i in range(12))}</ul></dd>
+<dd class="freeform tags"><ul>{''.join(f'<li><a class="tag">Tag {i}</a></li>' for i in range(15))}</ul></dd>
+<dd class="words">123,456</dd><dd class="chapters">{num_chapters}/{num_chapters}</dd>
+</dl>
+<div id="chapter_index"><select>{options}</select></div>
+<div id="workskin"><div class="preface group">
+<h2 class="title heading">
+  A Very Long Work Title
+</h2>
+<h3 class="byline heading"><a rel="author" href="/users/someone">someone</a></h3>
+<div class="summary module"><blockquote class="userstuff"><p>The summary, line one.</p><p>Line two.</p></blockquote></div>
+</div>
+<div id="chapters"><div class="chapter"><h3 class="title"><a>Chapter 1</a>: The Beginning</h3>
+<div class="userstuff module">{paragraphs}</div></div></div></div>
+</body></html>'''
+
+
+def legacy_work(html_content):
+    soup = BeautifulSoup(html_content, 'html.parser')
+    tree = etree.HTML(html_content)
+    title_elem = soup.find('h2', class_='title heading')
+    title = title_elem.get_text(strip=True) if title_elem else "未知标题"
+    author_elem = soup.find('a', rel='author')
+    author = author_elem.get_text(strip=True) if author_elem else "未知作者"
+    metadata = []
+    fandoms = tree.xpath('//dd[@class="fandom tags"]//a/text()')
+    if fandoms:
+        metadata.append(f"Fandom: {', '.join(fandoms)}")
+    rating = tree.xpath('//dd[@class="rating tags"]//a/text()')
+    if rating:
+        metadata.append(f"Rating: {rating[0]}")
+    warnings = tree.xpath('//dd[@class="warning tags"]//a/text()')
+    if warnings:
+        metadata.append(f"Warnings: {', '.join(warnings)}")
+    relationships = tree.xpath('//dd[@class="relationship tags"]//a/text()')
+    if relationships:
+        metadata.append(f"Relationships: {', '.join(relationships[:5])}")
+    characters = tree.xpath('//dd[@class="character tags"]//a/text()')
+    if characters:
+        metadata.append(f"Characters: {', '.join(characters[:10])}")
+    tags = tree.xpath('//dd[@class="freeform tags"]//a/text()')
+    if tags:
+        metadata.append(f"Tags: {', '.join(tags[:10])}")
+    summary_elem = tree.xpath('//div[@class="summary module"]//blockquote//text()')
+    if summary_elem:
+        summary = ' '.join([s.strip() for s in summary_elem if s.strip()])
+        metadata.append(f"\nSummary:\n{summary}")
+    words = tree.xpath('//dd[@class="words"]/text()')
+    chapters = tree.xpath('//dd[@class="chapters"]/text()')
+    if words:
+        metadata.append(f"\nWords: {words[0]}")
+    if chapters:
+        metadata.append(f"Chapters: {chapters[0]}")
+    chapter_links = tree.xpath('//div[@id="chapter_index"]//option/@value')
+    paragraphs = []
+    for p in tree.xpath('//div[@class="userstuff module"]//p | //div[@id="chapters"]//div[@class="userstuff"]//p'):
+        text = etree.tostring(p, method='text', encoding='unicode')
+        if text.strip():
+            paragraphs.append(text.strip())
+    return title, author, metadata, chapter_links, paragraphs
+
+
+def legacy_chapter(html_content):
+    BeautifulSoup(html_content, 'html.parser')
+    ch_tree = etree.HTML(html_content)
+    ch_title_elem = ch_tree.xpath('//h3[@class="title"]//text()')
+    ch_title = ' '.join([t.strip() for t in ch_title_elem if t.strip()])
+    ch_content = []
+    for p in ch_tree.xpath('//div[@class="userstuff module"]//p'):
+        text = etree.tostring(p, method='text', encoding='unicode')
+        if text.strip():
+            ch_content.append(text.strip())
+    return ch_title, ch_content
+
+
+def new_work(html_content):
+    page = parse_work_page(html_content)
+    return page.title, page.author, page.metadata, page.chapter_ids, page.paragraphs
+
+
+def bench(func, html_content, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(html_content)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    num_paragraphs = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    html_content = build_work_page(num_paragraphs)
+    assert legacy_work(html_content) == new_work(html_content), "作品页解析结果不一致"
+    assert legacy_chapter(html_content) == parse_chapter_page(html_content), "章节页解析结果不一致"
+
+    print(f"页面大小: {len(html_content) / 1024:.0f} KB, 段落数: {num_paragraphs}")
+    for label, legacy, new in (("作品页", legacy_work, new_work),
+                               ("章节页", legacy_chapter, parse_chapter_page)):
+        old_time = bench(legacy, html_content)
+        new_time = bench(new, html_content)
+        print(f"{label}: 旧版 {old_time * 1000:7.1f} ms, ao3_extract {new_time * 1000:7.1f} ms, "
+              f"每页节省 {(old_time - new_time) * 1000:6.1f} ms ({old_time / new_time:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
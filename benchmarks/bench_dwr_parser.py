@@ -0,0 +1,113 @@
+"""
+DWR 解析基准：单次遍历的 parse_dwr 与旧版“按 activityTags 切分 + 逐字段正则”对比
+
+用法: python benchmarks/bench_dwr_parser.py [帖子数量]
+只比较字段提取（不含 html2text 转换），两种方式结果一致时才计时。
+"""
+
+import ast
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dwr_parser import parse_dwr
+
+
+def _esc(text):
+    return ''.join(c if ord(c) < 128 else '\\u%04X' % ord(c) for c in text)
+
+
+def build_response(num_posts):
+    """生成与 Lofter getFavTrackItem 结构相近的 DWR 响应"""
+    parts = ['//#DWR-INSERT\n//#DWR-REPLY\nvar s0=[];\n']
+    var = 1
+    for i in range(num_posts):
+        post, tags, blog = var, var + 1, var + 2
+        var += 3
+        body = _esc('<p>' + '这是一段用于测试的正文内容，' * 40 + f'{i}</p>')
+        photos = ('[{\\"orign\\":\\"http://imglf3.lf127.net/img/%d.jpg?imageView&thumbnail=500x0\\",'
+                  '\\"raw\\":\\"http://imglf3.lf127.net/img/%d.png\\",\\"small\\":false}]' % (i, i))
+        parts.append(
+            f'var s{post}={{}};var s{tags}=[];var s{blog}={{}};s0[{i}]=s{post};\n'
+            f's{post}.activityTags=s{tags};s{post}.allowView=100;s{post}.blogId={5000 + i % 50};'
+            f's{post}.blogInfo=s{blog};s{post}.collectionId=0;s{post}.commentCount={i % 7};'
+            f's{post}.content="{body}";s{post}.cctype=0;s{post}.digest="{_esc("摘要")}";'
+            f's{post}.favoriteCount={i};s{post}.id={100000 + i};s{post}.isPublished=true;'
+            f's{post}.originPhotoLinks="{photos}";s{post}.permalink="p{i}";'
+            f's{post}.publishTime={1690000000000 - i * 1000};s{post}.tag="{_esc("标签")}";'
+            f's{post}.title="{_esc("标题" + str(i))}";s{post}.type=1;\n'
+            f's{blog}.avatarBoxImage=null;s{blog}.bigAvaImg="http://img.example/{i}.jpg";'
+            f's{blog}.blogId={5000 + i % 50};s{blog}.blogName="author{i % 50}";'
+            f's{blog}.blogNickName="{_esc("作者" + str(i % 50))}";'
+            f's{blog}.blogPageUrl="http://author{i % 50}.lofter.com";\n'
+        )
+    parts.append("dwr.engine._remoteHandleCallback('472351','0',s0);\n")
+    return ''.join(parts)
+
+
+def legacy_parse(content):
+    """旧实现：按 activityTags 切分后每个字段单独 re.search"""
+    results = []
+    for fav_info in content.split("activityTags")[1:]:
+        blog_url = re.search(r's\d{1,5}.blogPageUrl="(.*?)"', fav_info)
+        if not blog_url:
+            continue
+        blog_url = blog_url.group(1)
+        author_name = re.search(r's\d{1,5}.blogNickName="(.*?)"', fav_info).group(1) \
+            .encode('latin-1').decode('unicode_escape', errors="replace")
+        re.search(r"http[s]{0,1}://(.*?).lofter.com", blog_url).group(1)
+        public_time = int(re.search(r's\d{1,5}.publishTime=(.*?);', fav_info).group(1))
+        img_urls = []
+        urls_search = re.search(r'originPhotoLinks="(\[.*?\])"', fav_info)
+        if urls_search:
+            urls_str = urls_search.group(1).replace("\\", "").replace("false", "False").replace("true", "True")
+            for url_info in ast.literal_eval(urls_str):
+                img_urls.append(url_info.get("raw", "") or url_info.get("orign", "").split("?imageView")[0])
+        content_search = re.search(r's\d{1,5}.content="(.*?)";', fav_info)
+        body = content_search.group(1).encode('latin-1').decode("unicode_escape", errors="ignore")
+        title = re.search(r's\d{1,5}.title="(.*?)"', fav_info).group(1) \
+            .encode('latin-1').decode('unicode_escape', errors="ignore")
+        results.append((blog_url, author_name, public_time, img_urls, body, title))
+    return results
+
+
+def new_parse(content):
+    import json
+    results = []
+    fields = ("blogPageUrl", "blogNickName", "publishTime", "originPhotoLinks", "content", "title")
+    for record in parse_dwr(content).records("activityTags", fields):
+        img_urls = [info.get("raw", "") or info.get("orign", "").split("?imageView")[0]
+                    for info in json.loads(record["originPhotoLinks"])]
+        results.append((record["blogPageUrl"], record["blogNickName"], record["publishTime"],
+                        img_urls, record["content"], record["title"]))
+    return results
+
+
+def bench(func, content, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(content)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    num_posts = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    content = build_response(num_posts)
+    assert legacy_parse(content) == new_parse(content), "两种解析结果不一致"
+
+    legacy = bench(legacy_parse, content)
+    new = bench(new_parse, content)
+    size_mb = len(content) / 1024 / 1024
+    print(f"响应大小: {size_mb:.1f} MB, 帖子数: {num_posts}")
+    print(f"旧版正则:  {legacy * 1000:8.1f} ms  ({num_posts / legacy:,.0f} 条/秒)")
+    print(f"parse_dwr: {new * 1000:8.1f} ms  ({num_posts / new:,.0f} 条/秒)")
+    print(f"加速比: {legacy / new:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+EPUB 写出基准：流式 EpubWriter 与旧版 ebooklib（整本书在内存中组装）对比峰值内存和耗时
+
+用法: python benchmarks/bench_epub_writer.py [章节数] [每章段落数]
+流式写出从源文件逐章读取（与导出队列一致）；未安装 ebooklib 时只测流式写出。
+"""
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import exporters
+from document import Chapter, Document
+
+
+def build_document(num_chapters, num_paragraphs):
+    paragraph = '这是一段用于测试的正文内容，长度接近真实小说中的一个自然段。' * 4
+    chapters = [Chapter(f"第 {i + 1} 章", [f"{paragraph}{j}" for j in range(num_paragraphs)])
+                for i in range(num_chapters)]
+    return Document('ao3', 'Benchmark Work', 'someone', 'https://archiveofourown.org/works/1', chapters,
+                    metadata=['Rating: General Audiences', '\nWords: 500,000'], chaptered=True)
+
+
+def legacy_epub(doc, filepath):
+    """旧实现：每章拼成完整字符串交给 ebooklib，整本书写出前都在内存中"""
+    from ebooklib import epub
+    book = epub.EpubBook()
+    book.set_identifier('bench')
+    book.set_title(doc.title)
+    book.set_language('zh')
+    book.add_author(doc.author)
+    chapters = []
+    for idx, chapter in enumerate(doc.chapters):
+        ch = epub.EpubHtml(title=chapter.title, file_name=f'chapter_{idx+1}.xhtml', lang='zh')
+        content = f'<html><head></head><body><h2>{chapter.title}</h2>'
+        for para in chapter.paragraphs:
+            content += f'<p>{para}</p>'
+        ch.content = content + '</body></html>'
+        book.add_item(ch)
+        chapters.append(ch)
+    book.toc = chapters
+    book.add_item(epub.EpubNcx())
+    book.add_item(epub.EpubNav())
+    book.spine = ['nav'] + chapters
+    epub.write_epub(filepath, book)
+
+
+def measure(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    num_chapters = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    num_paragraphs = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    with tempfile.TemporaryDirectory() as tmp:
+        source_path = os.path.join(tmp, 'work.jsonl')
+        exporters.write_source(source_path, build_document(num_chapters, num_paragraphs))
+        print(f"源文件大小: {os.path.getsize(source_path) / 1024 / 1024:.1f} MB, "
+              f"{num_chapters} 章 x {num_paragraphs} 段")
+
+        def streaming():
+            exporters.write_epub(exporters.read_source(source_path, lazy=True), os.path.join(tmp, 'new.epub'))
+
+        elapsed, peak = measure(streaming)
+        print(f"EpubWriter: {elapsed * 1000:8.1f} ms, 峰值内存 {peak / 1024 / 1024:7.1f} MB")
+
+        try:
+            import ebooklib  # noqa: F401
+        except ImportError:
+            print("未安装 ebooklib，跳过旧版对比")
+            return
+
+        def legacy():
+            legacy_epub(exporters.read_source(source_path), os.path.join(tmp, 'old.epub'))
+
+        elapsed, peak = measure(legacy)
+        print(f"ebooklib:   {elapsed * 1000:8.1f} ms, 峰值内存 {peak / 1024 / 1024:7.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
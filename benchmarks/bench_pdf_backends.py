@@ -0,0 +1,71 @@
+"""
+PDF 后端基准：xhtml2pdf（HTML / CSS 排版）与 ReportLab platypus 直接排版对比每秒页数和峰值内存
+
+用法: python benchmarks/bench_pdf_backends.py [章节数] [每章段落数]
+每个后端在单独的子进程中运行（与 PDF 进程池中的情形一致），峰值内存取子进程的最大常驻内存。
+"""
+
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import exporters
+from document import Chapter, Document
+
+
+def build_document(num_chapters, num_paragraphs):
+    paragraph = '这是一段用于测试的正文内容，长度接近真实小说中的一个自然段。' * 4
+    chapters = [Chapter(f"第 {i + 1} 章", [f"{paragraph}{j}" for j in range(num_paragraphs)])
+                for i in range(num_chapters)]
+    return Document('ao3', 'Benchmark Work', 'someone', 'https://archiveofourown.org/works/1', chapters,
+                    metadata=['Fandom: Test', 'Rating: General Audiences', 'Words: 100,000'], chaptered=True)
+
+
+def run_backend(backend, source_path, pdf_path):
+    """子进程内：渲染一次并输出耗时和峰值内存（JSON）"""
+    start = time.perf_counter()
+    if backend == 'reportlab':
+        from pdf_direct import render_source_pdf
+        render_source_pdf(source_path, pdf_path)
+    else:
+        from pdf_render import render_pdf
+        render_pdf(exporters.render_html(exporters.read_source(source_path)), pdf_path)
+    elapsed = time.perf_counter() - start
+    # Linux 下 ru_maxrss 单位为 KB
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    print(json.dumps({'elapsed': elapsed, 'peak': peak}))
+
+
+def measure(backend, source_path, pdf_path):
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), '--run', backend, source_path, pdf_path],
+                            check=True, capture_output=True, text=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    from pypdf import PdfReader
+    result['pages'] = len(PdfReader(pdf_path).pages)
+    return result
+
+
+def main():
+    num_chapters = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    num_paragraphs = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    with tempfile.TemporaryDirectory() as tmp:
+        source_path = os.path.join(tmp, 'work.jsonl')
+        exporters.write_source(source_path, build_document(num_chapters, num_paragraphs))
+        print(f"{num_chapters} 章 x {num_paragraphs} 段，源文件 {os.path.getsize(source_path) / 1024:.0f} KB")
+        for backend in ('xhtml2pdf', 'reportlab'):
+            result = measure(backend, source_path, os.path.join(tmp, f'{backend}.pdf'))
+            print(f"{backend:9}: {result['elapsed']:7.2f} s, {result['pages']:4} 页, "
+                  f"{result['pages'] / result['elapsed']:7.1f} 页/秒, 峰值内存 {result['peak'] / 1024 / 1024:6.1f} MB")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--run':
+        run_backend(*sys.argv[2:5])
+    else:
+        main()
@@ -0,0 +1,84 @@
+"""
+后端冷启动基准：导入耗时（python -X importtime）和从启动进程到端口可以响应的时间
+
+用法: python benchmarks/bench_startup.py [--top 20] [--no-serve]
+- 在子进程中用 -X importtime 导入 web_app，列出累计耗时最多的模块
+- 检查 PDF / EPUB / 解析相关的重量级库是否被提前导入（应当只在任务需要时才加载），有则返回非 0
+- 在临时目录中启动 web_app.py，测量到 /api/task/status 返回的时间（端口 5000 需空闲）
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 只在任务需要时才应该导入的模块
+LAZY_MODULES = ('requests', 'lxml', 'xhtml2pdf', 'reportlab', 'pypdf', 'PIL', 'html2text', 'bs4', 'ebooklib',
+                'lofter_tasks', 'ao3_tasks', 'pdf_direct', 'multiprocessing', 'waitress')
+
+
+def import_times():
+    """返回 import web_app 引起的导入 [(模块名, 自身微秒, 累计微秒, 深度)]，最后一项是 web_app"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import web_app'],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    # -X importtime 按完成顺序输出：web_app 的依赖在它之前、上一个顶层导入（如 site）之后
+    end = next(i for i, row in enumerate(rows) if row[0] == 'web_app' and row[3] == 0)
+    start = max((i for i in range(end) if rows[i][3] == 0), default=-1) + 1
+    return rows[start:end + 1]
+
+
+def time_to_first_response(timeout=30):
+    """启动 web_app.py（开发服务器），返回到第一个 API 请求成功的秒数"""
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        proc = subprocess.Popen([sys.executable, os.path.join(ROOT, 'web_app.py'), '--dev'], cwd=tmp,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            while time.perf_counter() - start < timeout:
+                try:
+                    urllib.request.urlopen('http://127.0.0.1:5000/api/task/status', timeout=1).read()
+                    return time.perf_counter() - start
+                except OSError:
+                    if proc.poll() is not None:
+                        raise RuntimeError('web_app.py 启动失败')
+                    time.sleep(0.01)
+            raise RuntimeError('等待端口超时')
+        finally:
+            proc.terminate()
+            proc.wait()
+
+
+def main():
+    top = int(sys.argv[sys.argv.index('--top') + 1]) if '--top' in sys.argv else 20
+    rows = import_times()
+    total = rows[-1][2]
+    print(f"import web_app: {total / 1000:.1f} ms")
+    print(f"\n累计耗时最多的 {top} 个顶层依赖:")
+    direct = sorted((row for row in rows if row[3] == 1), key=lambda row: row[2], reverse=True)
+    for name, self_us, cumulative_us, _ in direct[:top]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  (自身 {self_us / 1000:6.1f} ms)  {name}")
+
+    eager = sorted({name.split('.')[0] for name, _, _, _ in rows} & set(LAZY_MODULES))
+    if eager:
+        print(f"\n⚠️ 启动时被提前导入: {', '.join(eager)}")
+    else:
+        print("\n重量级库均未在启动时导入")
+
+    if '--no-serve' not in sys.argv:
+        print(f"\n启动到首个响应: {time_to_first_response():.2f} s")
+    return 1 if eager else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,160 @@
+# coding:utf-8
+"""
+按内容寻址的图片存储
+
+同一张 Lofter 图片常被喜欢、推荐、Tag、单篇、作者等不同任务重复保存到
+img/this、img/作者[ip]、<mode>_save/img/作者 等目录。图片内容只在
+保存目录下的 .blobs/ 中按 SHA-256 存一份，SQLite 索引记录「规范化图片链接 -> 内容哈希」；
+各任务原有的目录结构用硬链接生成（文件系统不支持硬链接时退回复制），
+已下载过的图片不再请求网络，重复的图片也不再占用磁盘。链接的规范化见 image_urls.py。
+"""
+
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+from image_urls import image_key
+
+BLOB_DIR_NAME = '.blobs'
+INDEX_NAME = 'index.sqlite'
+
+
+class BlobStore:
+    """一个保存目录下的图片内容存储"""
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        # 同一链接同时只由一个线程下载，其他线程等它写入索引后直接复用
+        self._inflight = {}
+        self._db = sqlite3.connect(os.path.join(root, INDEX_NAME), check_same_thread=False)
+        self._db.execute('''CREATE TABLE IF NOT EXISTS urls (
+            url_key TEXT PRIMARY KEY,
+            digest TEXT NOT NULL,
+            ext TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created REAL NOT NULL
+        )''')
+        self._db.commit()
+
+    def blob_path(self, digest, ext):
+        return os.path.join(self.root, digest[:2], f"{digest}.{ext}")
+
+    def lookup(self, url):
+        """已存储的链接返回内容文件路径，否则返回 None"""
+        with self._lock:
+            row = self._db.execute('SELECT digest, ext FROM urls WHERE url_key = ?',
+                                   (image_key(url),)).fetchone()
+        if row is None:
+            return None
+        path = self.blob_path(*row)
+        return path if os.path.exists(path) else None
+
+    def put(self, url, content, ext):
+        """存入一张图片的内容，返回内容文件路径（内容已存在时只登记链接）"""
+        digest = hashlib.sha256(content).hexdigest()
+        path = self.blob_path(digest, ext)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO urls (url_key, digest, ext, size, created) VALUES (?, ?, ?, ?, ?)',
+                             (image_key(url), digest, ext, len(content), time.time()))
+            self._db.commit()
+        return path
+
+    def fetch(self, url, ext, download):
+        """返回 (内容文件路径, 是否新下载)；链接未存储时调用 download() 取得图片内容"""
+        key = image_key(url)
+        with self._lock:
+            gate = self._inflight.setdefault(key, threading.Lock())
+        with gate:
+            try:
+                path = self.lookup(url)
+                if path is not None:
+                    return path, False
+                return self.put(url, download(), ext), True
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+
+    @staticmethod
+    def link(blob_path, dest_path):
+        """把内容文件放到 dest_path：硬链接，失败时复制"""
+        if os.path.exists(dest_path):
+            if os.path.samefile(blob_path, dest_path):
+                return
+            os.remove(dest_path)
+        try:
+            os.link(blob_path, dest_path)
+        except OSError:
+            shutil.copyfile(blob_path, dest_path)
+
+    def materialize(self, url, dest_path, download):
+        """把图片放到 dest_path，返回 (内容文件路径, 是否新下载)"""
+        ext = os.path.splitext(dest_path)[1].lstrip('.') or 'bin'
+        blob_path, downloaded = self.fetch(url, ext, download)
+        self.link(blob_path, dest_path)
+        return blob_path, downloaded
+
+
+class JobImages:
+    """一次任务内已保存的图片：规范化键 -> 内容文件，以及去重统计
+
+    同一任务中重复出现的图片直接按内存中的哈希表链接，不再查询索引；
+    统计区分新下载、任务内重复和之前任务已存档三种情况
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._paths = {}
+        self.downloaded = 0
+        self.job_duplicates = 0
+        self.archived = 0
+
+    def get(self, key):
+        with self._lock:
+            path = self._paths.get(key)
+            if path is not None:
+                self.job_duplicates += 1
+            return path
+
+    def add(self, key, blob_path, downloaded):
+        with self._lock:
+            self._paths[key] = blob_path
+            if downloaded:
+                self.downloaded += 1
+            else:
+                self.archived += 1
+
+    @property
+    def avoided(self):
+        return self.job_duplicates + self.archived
+
+    def summary(self):
+        """任务结束时的日志文本，没有避免任何下载时返回空字符串"""
+        if not self.avoided:
+            return ''
+        return (f"♻️ 避免重复下载 {self.avoided} 张图片"
+                f"（本次任务内重复 {self.job_duplicates} 张，之前已存档 {self.archived} 张）")
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def store_for(save_root):
+    """保存目录对应的 BlobStore（按绝对路径缓存）"""
+    root = os.path.abspath(os.path.join(save_root, BLOB_DIR_NAME))
+    with _stores_lock:
+        store = _stores.get(root)
+        if store is None:
+            store = _stores[root] = BlobStore(root)
+        return store
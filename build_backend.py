@@ -1,6 +1,8 @@
 """
 Build Flask backend into standalone executable using PyInstaller
 For Tauri sidecar
+
+Usage: python build_backend.py [--onedir]
 """
 
 import os
@@ -14,7 +16,12 @@ if sys.platform == "win32":
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
 
-def build():
+BACKEND_NAME = "loarchive-backend-x86_64-pc-windows-msvc"  # Tauri sidecar naming format
+
+
+def build(onedir=False):
+    """With onedir=True PyInstaller emits a directory (exe + dependencies) instead of a single file:
+    nothing is unpacked to a temp dir on every launch, so cold start is much faster"""
     print("=" * 50)
     print("Building LoArchive Backend Service")
     print("=" * 50)
@@ -30,10 +37,10 @@ def build():
     # PyInstaller command
     cmd = [
         sys.executable, "-m", "PyInstaller",
-        "--onefile",           # Single file mode
+        "--onedir" if onedir else "--onefile",
         "--noconsole",         # No console window
         "--clean",             # Clean temp files
-        "--name", "loarchive-backend-x86_64-pc-windows-msvc",  # Tauri sidecar naming format
+        "--name", BACKEND_NAME,
         "--distpath", output_dir,
         "--workpath", os.path.join(script_dir, "build", "pyinstaller"),
         "--specpath", os.path.join(script_dir, "build"),
@@ -44,7 +51,6 @@ def build():
         "--hidden-import", "flask",
         "--hidden-import", "flask_cors",
         "--hidden-import", "requests",
-        "--hidden-import", "bs4",
         "--hidden-import", "lxml",
         "--hidden-import", "lxml.html",
         "--hidden-import", "lxml.etree",
@@ -56,7 +62,9 @@ def build():
         "--hidden-import", "html2text",
         "--hidden-import", "xhtml2pdf",
         "--hidden-import", "reportlab",
-        "--hidden-import", "ebooklib",
+        "--hidden-import", "pypdf",
+        "--hidden-import", "PIL",
+        "--hidden-import", "waitress",
         # Main program
         os.path.join(script_dir, "web_app.py")
     ]
@@ -69,12 +77,18 @@ def build():
     result = subprocess.run(cmd, cwd=script_dir)
     
     if result.returncode == 0:
-        exe_path = os.path.join(output_dir, "loarchive-backend-x86_64-pc-windows-msvc.exe")
+        if onedir:
+            exe_path = os.path.join(output_dir, BACKEND_NAME, f"{BACKEND_NAME}.exe")
+        else:
+            exe_path = os.path.join(output_dir, f"{BACKEND_NAME}.exe")
         if os.path.exists(exe_path):
             size_mb = os.path.getsize(exe_path) / (1024 * 1024)
             print(f"\n[SUCCESS] Build completed!")
             print(f"   File: {exe_path}")
             print(f"   Size: {size_mb:.1f} MB")
+            if onedir:
+                print(f"   Directory: {os.path.dirname(exe_path)}")
+                print("   Ship the whole directory (bundle.resources) and launch the exe inside it")
         else:
             print("\n[ERROR] Build seemed to succeed but output file not found")
             return False
@@ -100,5 +114,5 @@ if __name__ == "__main__":
         print("Installing PyInstaller...")
         subprocess.run([sys.executable, "-m", "pip", "install", "pyinstaller"])
     
-    success = build()
+    success = build(onedir="--onedir" in sys.argv)
     sys.exit(0 if success else 1)
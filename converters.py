@@ -0,0 +1,195 @@
+# coding:utf-8
+"""
+CPU 密集型的内容转换
+
+这里的函数都是纯函数（不依赖 Flask 和全局任务状态），可以直接调用，
+也可以通过 cpu_pool 提交到进程池中执行。html2text 转换器按选项在每个
+进程内只创建一次并复用。
+"""
+
+import json
+import re
+import time
+
+from dwr_parser import parse_dwr
+from image_urls import unique_image_urls
+
+# 从 DWR 记录中实际用到的字段（其余字段不做解码）
+LOFTER_POST_FIELDS = ("blogPageUrl", "blogNickName", "publishTime", "originPhotoLinks", "content", "title",
+                      "id", "permalink")
+ARCHIVE_POST_FIELDS = ("permalink", "time", "imgurl", "type", "id")
+
+# 本进程内复用的 html2text 转换器：(ignore_links, ignore_images) -> HTML2Text
+_converters = {}
+
+_LAST_PUBLISH_TIME = re.compile(r'\.publishTime=(\d+);')
+_RECORD_VAR = re.compile(r'(s\d+)\.activityTags=')
+_RECORD_ID = re.compile(r'(s\d+)\.id=(\d+);')
+_RECORD_PUBLISH_TIME = re.compile(r'(s\d+)\.publishTime=(\d+);')
+
+
+def init_worker():
+    """进程池工作进程启动时调用：预先导入依赖并创建常用转换器"""
+    _get_converter(False, False)
+    _get_converter(True, True)
+    from lxml import etree  # noqa: F401
+
+
+def _get_converter(ignore_links, ignore_images):
+    key = (ignore_links, ignore_images)
+    converter = _converters.get(key)
+    if converter is None:
+        import html2text
+        converter = html2text.HTML2Text()
+        converter.ignore_links = ignore_links
+        converter.ignore_images = ignore_images
+        _converters[key] = converter
+    return converter
+
+
+def html_to_text(html, ignore_links=False, ignore_images=False):
+    """HTML 转纯文本（Markdown 风格），复用本进程的转换器实例"""
+    return _get_converter(ignore_links, ignore_images).handle(html)
+
+
+def build_blog_info(record):
+    """把 DWR 帖子记录（parse_dwr(...).records('activityTags') 的一项）整理成保存用的博客信息
+
+    缺少博客链接的记录返回 None
+    """
+    # 博客链接
+    blog_url = record.get("blogPageUrl")
+    if not blog_url:
+        return None
+
+    # 博客链接是作者主页时（blogPageUrl 取自 blogInfo）用 permalink 拼出文章链接，
+    # 文章链接同时作为保存时识别同一篇文章的依据
+    permalink = record.get("permalink")
+    if permalink and "/post/" not in blog_url:
+        blog_url = f"{blog_url.rstrip('/')}/post/{permalink}"
+
+    # 作者名 / 作者IP
+    author_name = record.get("blogNickName") or "未知作者"
+    author_ip = re.search(r"http[s]{0,1}://(.*?).lofter.com", blog_url).group(1)
+
+    # 发表时间
+    public_timestamp = record.get("publishTime")
+    if public_timestamp:
+        time_local = time.localtime(int(int(public_timestamp) / 1000))
+        public_time = time.strftime("%Y-%m-%d", time_local)
+    else:
+        public_time = "未知时间"
+
+    # 图片链接（originPhotoLinks 解码后是一段 JSON）
+    img_urls = []
+    photo_links = record.get("originPhotoLinks")
+    if photo_links:
+        try:
+            for url_info in json.loads(photo_links):
+                img_url = url_info.get("raw", "") or url_info.get("orign", "")
+                if img_url:
+                    img_urls.append(img_url)
+        except Exception:
+            pass
+        # 原图链接，同一图片的不同尺寸 / 参数变体只保留一个
+        img_urls = unique_image_urls(img_urls, skip_thumbnails=False)
+
+    # 正文内容
+    content = record.get("content") or ""
+    if content:
+        try:
+            content = html_to_text(content)
+        except Exception:
+            pass
+
+    # 标题
+    title = record.get("title") or ""
+
+    return {
+        "url": blog_url,
+        "author_name": author_name,
+        "author_ip": author_ip,
+        "public_time": public_time,
+        "img_urls": img_urls,
+        "content": content,
+        "title": title,
+        "has_img": len(img_urls) > 0,
+        "post_id": str(record["id"]) if record.get("id") is not None else None,
+    }
+
+
+def dwr_page_meta(content):
+    """不做完整解析，快速得到一页 DWR 响应的帖子数和最后一条的发表时间戳（没有则为 None）"""
+    count = content.count('.activityTags=')
+    last_publish_time = None
+    pos = content.rfind('.publishTime=')
+    if pos >= 0:
+        match = _LAST_PUBLISH_TIME.match(content, pos)
+        if match:
+            last_publish_time = int(match.group(1))
+    return count, last_publish_time
+
+
+def dwr_page_posts(content):
+    """不做完整解析，快速得到一页 DWR 响应中每条帖子的 (帖子 ID, 发表时间戳)，缺少的字段为 None"""
+    ids = dict(_RECORD_ID.findall(content))
+    publish_times = dict(_RECORD_PUBLISH_TIME.findall(content))
+    posts = []
+    for var in _RECORD_VAR.findall(content):
+        publish_time = publish_times.get(var)
+        posts.append((ids.get(var), int(publish_time) if publish_time else None))
+    return posts
+
+
+def parse_fav_page(content, limit=None):
+    """解析一整页喜欢/推荐/Tag 的 DWR 响应，返回与帖子一一对应的博客信息列表（无效记录为 None）"""
+    records = parse_dwr(content).records("activityTags", LOFTER_POST_FIELDS)
+    if limit is not None:
+        records = records[:limit]
+    blogs = []
+    for record in records:
+        try:
+            blogs.append(build_blog_info(record))
+        except Exception:
+            blogs.append(None)
+    return blogs
+
+
+def extract_lofter_article(blog_html):
+    """从 Lofter 博客页提取 (标题, 正文)"""
+    from lxml.html import etree
+
+    blog_parse = etree.HTML(blog_html)
+
+    # 获取标题
+    title_path = blog_parse.xpath("//h2//text()")
+    if title_path:
+        title = title_path[0].strip()
+    else:
+        title = ""
+
+    # 获取正文内容
+    # 尝试多种方式获取正文
+    content_text = ""
+
+    # 方法1: 尝试获取文章主体
+    content_elements = blog_parse.xpath("//div[contains(@class,'content')]//text()")
+    if content_elements:
+        content_text = "\n".join([t.strip() for t in content_elements if t.strip()])
+
+    # 方法2: 如果方法1失败，尝试获取所有p标签
+    if not content_text:
+        p_elements = blog_parse.xpath("//article//p//text() | //div[@class='text']//p//text()")
+        if p_elements:
+            content_text = "\n\n".join([t.strip() for t in p_elements if t.strip()])
+
+    # 方法3: 使用html2text转换
+    if not content_text:
+        try:
+            content_text = html_to_text(blog_html, ignore_links=True, ignore_images=True)
+            # 清理一些无用内容
+            content_text = re.sub(r'\n{3,}', '\n\n', content_text)
+        except Exception:
+            content_text = "无法解析正文内容"
+
+    return title, content_text
@@ -0,0 +1,432 @@
+# coding:utf-8
+"""
+后端公共部分：配置、任务状态与日志、下载历史、图片保存、断点、流水线工具和导出队列
+
+Web 服务（web_app.py）、任务调度（tasks.py）和各爬取任务（lofter_tasks.py、ao3_tasks.py）
+共用这里的状态。这里只导入轻量模块：requests、lxml 以及 PDF / EPUB 相关的库
+由任务在需要时导入，服务启动时不加载。
+"""
+
+import os
+import json
+import time
+import threading
+import queue
+import hashlib
+import blob_store
+import file_index
+import thumbnails
+from export_queue import ExportQueue
+from image_urls import image_key, unique_image_urls
+
+# 全局状态（使用 task_lock 保护并发访问）
+task_lock = threading.Lock()
+task_status = {
+    'running': False,
+    'current_task': None,
+    'progress': 0,
+    'message': '',
+    'logs': [],
+    'error': None
+}
+
+# 配置信息
+config = {
+    'login_key': 'LOFTER-PHONE-LOGIN-AUTH',
+    'login_auth': '',
+    'file_path': './dir',
+    'save_path': './dir',  # 用户自定义保存路径
+    'dark_mode': False,
+    'auto_dedup': True,  # 自动去重
+    'notify_on_complete': True,  # 完成通知
+    'lofter_page_interval': 0.5,  # Lofter 翻页请求最小间隔（秒）
+    'lofter_post_interval': 0.2,  # 多线程抓取 Lofter 博客页时的请求最小间隔（秒）
+    'cpu_workers': 0,  # 解析/转换进程数，0 为自动（CPU 核数 - 1）
+    'pdf_workers': 0,  # PDF 渲染进程数，0 为自动（CPU 核数 - 1）
+    'pdf_backend': 'xhtml2pdf',  # PDF 后端：xhtml2pdf（HTML 排版）或 reportlab（直接排版，更快）
+    'thumb_workers': 1,  # 缩略图生成进程数，0 为自动（CPU 核数 - 1）
+    'thumb_pregenerate': True,  # 保存图片时预先生成缩略图
+    'production_server': False,  # 使用 waitress 生产服务器（也可用 --production 启动参数）
+    'server_threads': 8,  # 生产服务器处理请求的线程数
+    'server_connection_limit': 100,  # 同时保持的连接上限，超出的连接在 backlog 中排队
+    'server_backlog': 1024,  # listen backlog
+    'shutdown_timeout': 600  # 关闭服务时等待当前任务和导出完成的最长时间（秒）
+}
+
+# 下载历史文件路径
+HISTORY_FILE = './download_history.json'
+# 配置文件路径
+CONFIG_FILE = './loarchive_config.json'
+# 断点目录（长任务翻页进度）
+CHECKPOINT_DIR = './checkpoints'
+# 导出队列文件与源文件目录（用于后台导出和重新导出）
+EXPORT_QUEUE_FILE = './export_queue.json'
+EXPORT_SOURCE_DIR = './export_sources'
+# 关注列表（定时增量刷新）文件
+WATCH_FILE = './watch_list.json'
+# 历史记录锁
+history_lock = threading.Lock()
+# 命令行批量运行（batch.py）的子进程中设置：日志转发给主进程；下载记录交给主进程统一写入历史；
+# 不更新文件索引（多个进程不同时写索引，由 Web 服务的后台对账发现新文件）
+log_listener = None
+history_sink = None
+index_files = True
+
+def load_config_file():
+    """从文件加载配置"""
+    global config
+    if os.path.exists(CONFIG_FILE):
+        try:
+            with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
+                saved_config = json.load(f)
+                config.update(saved_config)
+        except Exception as e:
+            print(f"加载配置文件失败: {e}")
+    return config
+
+def save_config_file():
+    """保存配置到文件"""
+    try:
+        with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
+            json.dump(config, f, ensure_ascii=False, indent=2)
+    except Exception as e:
+        print(f"保存配置文件失败: {e}")
+
+def _compute_stats(items):
+    """从 items 列表实时计算统计"""
+    total = len(items)
+    images = sum(1 for i in items if i.get('type') == 'image')
+    articles = sum(1 for i in items if i.get('type') in ('article', 'ao3'))
+    return {'total': total, 'images': images, 'articles': articles}
+
+def load_download_history():
+    """加载下载历史"""
+    default_history = {'items': []}
+    if os.path.exists(HISTORY_FILE):
+        try:
+            with open(HISTORY_FILE, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+                if 'items' not in data:
+                    data['items'] = []
+                return data
+        except Exception as e:
+            print(f"加载历史记录失败: {e}")
+            return default_history
+    return default_history
+
+def save_download_history(history):
+    """保存下载历史（先写临时文件再替换，其他进程不会读到写了一半的文件）"""
+    tmp_path = HISTORY_FILE + '.tmp'
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(history, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, HISTORY_FILE)
+    except Exception as e:
+        print(f"保存历史记录失败: {e}")
+
+def add_to_history(item_type, url, title, author, file_path, source='lofter'):
+    """添加到下载历史（线程安全）"""
+    if history_sink is not None:
+        history_sink(item_type=item_type, url=url, title=title, author=author, file_path=file_path, source=source)
+        return True
+    with history_lock:
+        history = load_download_history()
+
+        # 检查是否已存在（去重）
+        for item in history['items']:
+            if item.get('url') == url:
+                return False
+
+        # 生成唯一 ID: 时间戳 + 随机数
+        record = {
+            'id': f"{int(time.time() * 1000)}-{os.urandom(4).hex()}",
+            'type': item_type,  # 'image', 'article', 'ao3'
+            'url': url,
+            'title': title or '无标题',
+            'author': author or '未知作者',
+            'file_path': file_path,
+            'source': source,
+            'download_time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'timestamp': int(time.time())
+        }
+
+        history['items'].insert(0, record)
+
+        # 限制历史记录数量（保留最近1000条）
+        if len(history['items']) > 1000:
+            history['items'] = history['items'][:1000]
+
+        save_download_history(history)
+        return True
+
+def is_url_downloaded(url):
+    """检查URL是否已下载过"""
+    if not config.get('auto_dedup', True):
+        return False
+    with history_lock:
+        history = load_download_history()
+        return any(item.get('url') == url for item in history['items'])
+
+def downloaded_file_path(url):
+    """返回下载历史中该URL保存的文件路径，没有记录时返回 None"""
+    with history_lock:
+        history = load_download_history()
+        for item in history['items']:
+            if item.get('url') == url:
+                return item.get('file_path')
+    return None
+
+def clear_download_history():
+    """清空下载历史"""
+    with history_lock:
+        save_download_history({'items': []})
+    return True
+
+def load_config():
+    """加载配置"""
+    global config
+    # 首先从配置文件加载
+    load_config_file()
+    # 然后尝试从 login_info.py 加载（如果存在）
+    try:
+        from login_info import login_auth, login_key
+        config['login_key'] = login_key
+        config['login_auth'] = login_auth
+    except Exception:
+        pass
+    return config
+
+def save_login_info(login_key, login_auth):
+    """保存登录信息到 login_info.py"""
+    content = f'''message = """
+这个文件是专门填登录信息的，lofter某次更新之后很多页面都要登录才能看，所以每个程序都要有登录信息才能用
+在这里填好可以同步到每个程序
+反正就是不填这里其他的都跑不起来
+"""
+
+# 登录方式对应的key，这里默认是手机登录
+login_key = "{login_key}"
+
+# 授权码
+login_auth = "{login_auth}"
+'''
+    with open('login_info.py', 'w', encoding='utf-8') as f:
+        f.write(content)
+    
+    config['login_key'] = login_key
+    config['login_auth'] = login_auth
+    
+    # 重新导入以更新模块
+    import importlib
+    try:
+        import login_info
+        importlib.reload(login_info)
+    except Exception:
+        pass
+
+def add_log(message):
+    """添加日志"""
+    timestamp = time.strftime('%H:%M:%S')
+    log_entry = f'[{timestamp}] {message}'
+    with task_lock:
+        task_status['logs'].append(log_entry)
+        task_status['message'] = message
+        # 保留最新的200条日志
+        if len(task_status['logs']) > 200:
+            task_status['logs'] = task_status['logs'][-200:]
+    print(log_entry)  # 同时打印到控制台
+    if log_listener is not None:
+        log_listener(message)
+
+
+def set_task_error(message):
+    """记录任务没有完整完成的原因（出错提前结束，或有条目保存失败）
+
+    任务自己捕获了异常时 task_status['error'] 仍会被设置，关注列表和批量运行据此判断失败；已有错误时保留第一条
+    """
+    with task_lock:
+        if task_status['error'] is None:
+            task_status['error'] = message
+
+
+def sanitize_filename(name):
+    """清理文件名中的非法字符"""
+    return (name.replace("/", "&").replace("|", "&").replace("\\", "&")
+            .replace("<", "《").replace(">", "》").replace(":", "：")
+            .replace('"', "'").replace("?", "？").replace("*", "·")
+            .replace("\n", "").replace("\r", "").replace("\t", " ").strip())
+
+
+def filter_lofter_image_urls(img_urls):
+    """过滤 Lofter 图片 URL：移除缩略图和 HTML 转义的重复链接，同一图片的各种变体只保留一个原图链接"""
+    return unique_image_urls(img_url for img_url in img_urls if "&amp;" not in img_url)
+
+
+def save_image(img_url, img_path, referer, job_images=None):
+    """保存一张图片到 img_path，返回是否新下载
+
+    图片内容存入保存目录的 .blobs/（按内容哈希去重），img_path 是指向它的硬链接；
+    同一图片已下载过时不再请求网络。job_images（blob_store.JobImages）记录本次任务
+    已保存的图片，任务内重复出现的图片不再查询索引
+    """
+    import requests
+    import useragentutil
+
+    store = blob_store.store_for(config.get('save_path', './dir'))
+    key = image_key(img_url)
+    if job_images is not None:
+        blob_path = job_images.get(key)
+        if blob_path is not None and os.path.exists(blob_path):
+            store.link(blob_path, img_path)
+            index_saved_file(img_path)
+            return False
+
+    def download():
+        headers = useragentutil.get_headers()
+        headers["Referer"] = referer
+        response = requests.get(img_url, headers=headers, timeout=30)
+        response.raise_for_status()
+        return response.content
+
+    blob_path, downloaded = store.materialize(img_url, img_path, download)
+    if job_images is not None:
+        job_images.add(key, blob_path, downloaded)
+    index_saved_file(img_path)
+    if config.get('thumb_pregenerate', True):
+        thumbnails.cache_for(config.get('save_path', './dir')).pregenerate(img_path)
+    return downloaded
+
+
+def index_saved_file(path):
+    """文件保存后更新文件索引（/api/files）"""
+    if not index_files:
+        return
+    file_index.index_for(config.get('save_path', './dir')).record(path)
+
+
+def resolve_archive_path(rel_path):
+    """把保存目录下的相对路径解析为绝对路径；越出保存目录或指向隐藏文件 / 目录时返回 None"""
+    from werkzeug.security import safe_join
+
+    base_path = os.path.abspath(config.get('save_path', config.get('file_path', './dir')))
+    path = safe_join(base_path, rel_path)
+    if path is None or any(part.startswith('.') for part in rel_path.replace('\\', '/').split('/') if part):
+        return None
+    return path
+
+
+# 流水线结束标记
+_PIPELINE_DONE = object()
+
+
+def pipeline_put(q, item, stop_event):
+    """向有界队列放入元素，队列满时阻塞形成背压；stop_event 被设置时放弃并返回 False"""
+    while not stop_event.is_set():
+        try:
+            q.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def start_pipeline_producer(iterable, q, stop_event, name):
+    """在后台线程中消费 iterable 并写入有界队列，结束后写入结束标记
+
+    返回的状态字典中 count 为已入队的元素数量，可用于估算进度
+    """
+    state = {'count': 0}
+
+    def produce():
+        try:
+            for item in iterable:
+                if not pipeline_put(q, item, stop_event):
+                    return
+                state['count'] += 1
+        except Exception as e:
+            add_log(f"   ⚠️ {name} 出错: {str(e)}")
+        finally:
+            pipeline_put(q, _PIPELINE_DONE, stop_event)
+
+    thread = threading.Thread(target=produce, name=name, daemon=True)
+    thread.start()
+    state['thread'] = thread
+    return state
+
+
+def iter_pipeline_queue(q):
+    """从有界队列中逐个取出元素，直到遇到结束标记"""
+    while True:
+        item = q.get()
+        if item is _PIPELINE_DONE:
+            return
+        yield item
+
+
+class RateLimiter:
+    """线程安全的限速器：保证同一站点相邻两次请求至少间隔 min_interval 秒"""
+
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_time = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_time - now
+            self._next_time = max(now, self._next_time) + self.min_interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+# Lofter DWR 翻页限速器（所有任务共享）
+lofter_limiter = RateLimiter(0.5)
+# Lofter 博客页抓取限速器（所有任务共享，与翻页分开计时）
+lofter_post_limiter = RateLimiter(0.2)
+
+
+def _checkpoint_path(name):
+    digest = hashlib.md5(name.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(CHECKPOINT_DIR, f"{digest}.json")
+
+
+def load_checkpoint(name):
+    """读取断点，不存在或损坏时返回 None"""
+    path = _checkpoint_path(name)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        return state if state.get('name') == name else None
+    except Exception as e:
+        print(f"读取断点失败: {e}")
+        return None
+
+
+def save_checkpoint(name, state):
+    """原子写入断点（先写临时文件再替换）"""
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    path = _checkpoint_path(name)
+    tmp_path = path + '.tmp'
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({**state, 'name': name, 'updated': int(time.time())}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"保存断点失败: {e}")
+
+
+def clear_checkpoint(name):
+    """任务完整结束后删除断点"""
+    path = _checkpoint_path(name)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+# 后台导出队列：爬取时只保存 TXT 和源文件，PDF / EPUB 由导出线程渲染
+export_queue = ExportQueue(EXPORT_QUEUE_FILE, EXPORT_SOURCE_DIR, log=add_log,
+                           on_file=index_saved_file)
+
+
@@ -0,0 +1,96 @@
+# coding:utf-8
+"""
+CPU 密集型任务的进程池
+
+html2text 转换、lxml 页面解析、DWR 字符串解码都是纯 Python / CPU 密集的工作，
+放在爬取线程里会和网络 I/O 争抢 GIL。这里提供按需创建的进程池，
+爬取线程只负责提交任务和等待结果。进程池不可用时（例如受限环境无法创建子进程）
+自动退回到当前线程内执行。
+"""
+
+import os
+import threading
+from concurrent.futures import Future
+
+import converters
+
+
+class LazyProcessPool:
+    """首次提交任务时才创建的进程池，initializer 在每个工作进程启动时执行一次"""
+
+    def __init__(self, initializer=None, name='cpu'):
+        self.initializer = initializer
+        self.name = name
+        self.max_workers = 0
+        self._pool = None
+        self._lock = threading.Lock()
+        self._disabled = False
+
+    def configure(self, max_workers):
+        """设置进程数（0 为自动：CPU 核数 - 1）；已创建的进程池在下次 shutdown 后生效"""
+        self.max_workers = int(max_workers or 0)
+
+    def worker_count(self):
+        if self.max_workers > 0:
+            return self.max_workers
+        return max(1, (os.cpu_count() or 2) - 1)
+
+    def get_pool(self):
+        """返回进程池，首次调用时创建"""
+        with self._lock:
+            if self._pool is None and not self._disabled:
+                # multiprocessing 在第一次需要进程池时才导入，不拖慢服务启动
+                from concurrent.futures import ProcessPoolExecutor
+                try:
+                    self._pool = ProcessPoolExecutor(max_workers=self.worker_count(),
+                                                     initializer=self.initializer)
+                except Exception as e:
+                    print(f"{self.name} 进程池创建失败，改为在线程内执行: {e}")
+                    self._disabled = True
+            return self._pool
+
+    def _run_inline(self, fn, args, kwargs):
+        if self.initializer is not None:
+            self.initializer()
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def submit(self, fn, *args, **kwargs):
+        """把 fn(*args, **kwargs) 提交到进程池，返回 Future；fn 必须是模块级函数"""
+        pool = self.get_pool()
+        if pool is None:
+            return self._run_inline(fn, args, kwargs)
+        try:
+            return pool.submit(fn, *args, **kwargs)
+        except Exception as e:
+            # 进程池损坏（例如工作进程被杀）时退回线程内执行
+            print(f"{self.name} 进程池不可用，改为在线程内执行: {e}")
+            with self._lock:
+                self._disabled = True
+                self._pool = None
+            return self._run_inline(fn, args, kwargs)
+
+    def run(self, fn, *args, **kwargs):
+        """提交到进程池并等待结果"""
+        return self.submit(fn, *args, **kwargs).result()
+
+    def shutdown(self, wait=True):
+        """关闭进程池（程序退出或修改进程数时调用）"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+
+# 解析 / 文本转换用的默认进程池
+_default_pool = LazyProcessPool(converters.init_worker, 'cpu')
+
+configure = _default_pool.configure
+get_pool = _default_pool.get_pool
+submit = _default_pool.submit
+run = _default_pool.run
+shutdown = _default_pool.shutdown
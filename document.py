@@ -0,0 +1,75 @@
+# coding:utf-8
+"""
+导出用的中间文档模型
+
+每篇作品 / 文章在爬取后只整理一次成 Document，TXT、HTML、PDF、EPUB
+各格式的写出函数（见 exporters.py）都从它生成，源文件也是它的序列化结果。
+"""
+
+
+class Chapter:
+    """一章：标题（单章作品为 None）和段落列表"""
+    __slots__ = ('title', 'paragraphs')
+
+    def __init__(self, title, paragraphs):
+        self.title = title
+        self.paragraphs = paragraphs
+
+    def to_dict(self):
+        return {'title': self.title, 'paragraphs': self.paragraphs}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get('title'), data.get('paragraphs', []))
+
+
+class Document:
+    """一篇作品
+
+    kind: 来源（'ao3' / 'lofter'），决定 TXT / HTML 使用的模板
+    chaptered: 是否按章节排版（AO3 多章节作品）
+    extra: 来源相关的附加信息，如 Lofter 的 author_ip、public_time
+    """
+    __slots__ = ('kind', 'title', 'author', 'url', 'metadata', 'chapters', 'chaptered', 'extra')
+
+    def __init__(self, kind, title, author, url, chapters, metadata=None, chaptered=False, **extra):
+        self.kind = kind
+        self.title = title
+        self.author = author
+        self.url = url
+        self.chapters = chapters
+        self.metadata = metadata or []
+        self.chaptered = chaptered
+        self.extra = extra
+
+    def paragraphs(self):
+        """按顺序产出所有章节的段落"""
+        for chapter in self.chapters:
+            yield from chapter.paragraphs
+
+    def header(self):
+        """源文件第一行：除章节以外的作品信息"""
+        return {
+            'kind': self.kind,
+            'title': self.title,
+            'author': self.author,
+            'url': self.url,
+            'metadata': self.metadata,
+            'chaptered': self.chaptered,
+            **self.extra,
+        }
+
+    @classmethod
+    def from_source(cls, header, chapters):
+        """由源文件的 header 和章节字典列表还原"""
+        header = dict(header)
+        return cls(
+            kind=header.pop('kind', 'ao3'),
+            title=header.pop('title', ''),
+            author=header.pop('author', ''),
+            url=header.pop('url', ''),
+            chapters=[Chapter.from_dict(chapter) for chapter in chapters],
+            metadata=header.pop('metadata', None),
+            chaptered=header.pop('chaptered', False),
+            **header
+        )
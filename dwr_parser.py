@@ -0,0 +1,187 @@
+# coding:utf-8
+"""
+DWR 响应解析
+
+Lofter 的 DWR 接口返回的是一段 JavaScript：先声明变量（var s0=[];var s1={};），
+再逐条赋值（s1.title="...";s0[0]=s1;），最后调用
+dwr.engine._remoteHandleCallback('batchId','0',s0)。
+
+parse_dwr 只遍历一次整段响应，把每条 sN.field=value 赋值收集到对应对象中，
+之后按需把字段值解码成 Python 类型（字符串、数字、布尔、None、对其他对象的引用），
+代替以往针对每个字段分别 re.search 再 unicode_escape 的做法。
+"""
+
+import re
+
+# 单条赋值语句：sN=..., sN.field=..., sN[i]=...
+# 值要么是字符串字面量，要么是到分号为止的简单记号（数字、true/false/null、sN、[]、{}、new Date(n)）
+_STATEMENT = re.compile(r'(s\d+)(?:\.(\w+)|\[(\d+)\])?=("[^"\\]*(?:\\.[^"\\]*)*"|[^;"]*);')
+
+# 回调：dwr.engine._remoteHandleCallback('batchId','callId',data);
+_CALLBACK_PREFIX = 'dwr.engine._remoteHandleCallback('
+_CALLBACK = re.compile(r"dwr\.engine\._remoteHandleCallback\('[^']*','[^']*',(.*?)\);", re.S)
+
+_ESCAPE = re.compile(r'\\(u[0-9a-fA-F]{4}|x[0-9a-fA-F]{2}|.)', re.S)
+_SURROGATE = re.compile('[\ud800-\udfff]')
+_SIMPLE_ESCAPES = {'n': '\n', 'r': '\r', 't': '\t', 'b': '\b', 'f': '\f', 'v': '\v', '0': '\0'}
+_LITERALS = {'true': True, 'false': False, 'null': None, 'undefined': None}
+
+
+def _unescape_match(match):
+    esc = match.group(1)
+    if len(esc) > 1:
+        return chr(int(esc[1:], 16))
+    return _SIMPLE_ESCAPES.get(esc, esc)
+
+
+def decode_js_string(raw):
+    """解码 JS 字符串字面量内容（不含两端引号），正确合并 emoji 等代理对"""
+    if '\\' not in raw:
+        return raw
+    if '\\/' not in raw:
+        # 常见情况交给 C 实现的 unicode_escape 解码；非 ASCII 字符先转义再还原
+        try:
+            text = raw.encode('latin-1', 'backslashreplace').decode('unicode_escape')
+        except UnicodeDecodeError:
+            text = _ESCAPE.sub(_unescape_match, raw)
+    else:
+        text = _ESCAPE.sub(_unescape_match, raw)
+    if _SURROGATE.search(text):
+        text = text.encode('utf-16', 'surrogatepass').decode('utf-16', 'replace')
+    return text
+
+
+def _is_ref(token):
+    return token[:1] == 's' and token[1:].isdigit()
+
+
+def decode_token(token):
+    """把赋值右侧的原始记号解码为 Python 值；对其他变量的引用原样返回（如 's12'）"""
+    first = token[:1]
+    if first == '"':
+        return decode_js_string(token[1:-1])
+    if token in _LITERALS:
+        return _LITERALS[token]
+    if token.startswith('new Date('):
+        return int(token[9:-1])
+    try:
+        return int(token)
+    except ValueError:
+        pass
+    try:
+        return float(token)
+    except ValueError:
+        return token
+
+
+class DwrResponse:
+    """一次 DWR 响应的解析结果
+
+    objects 中保存每个变量的原始赋值（字段 -> 原始记号），解码在取用时进行，
+    这样只用到的字段才会付出 unicode 解码的开销。
+    """
+    __slots__ = ('objects', '_callback')
+
+    def __init__(self, objects, callback):
+        self.objects = objects
+        self._callback = callback
+
+    def resolve(self, name, _memo=None):
+        """把变量完整解码为 dict / list，引用递归展开（循环引用只展开一次）"""
+        memo = {} if _memo is None else _memo
+        if name in memo:
+            return memo[name]
+        raw = self.objects.get(name)
+        if isinstance(raw, dict):
+            value = memo[name] = {}
+            for key, token in raw.items():
+                value[key] = self.resolve(token, memo) if _is_ref(token) else decode_token(token)
+        elif isinstance(raw, list):
+            value = memo[name] = []
+            for token in raw:
+                if token is None:
+                    value.append(None)
+                else:
+                    value.append(self.resolve(token, memo) if _is_ref(token) else decode_token(token))
+        else:
+            value = None if raw is None else decode_token(raw)
+        return value
+
+    @property
+    def result(self):
+        """回调返回值（通常是结果列表），已完整解码"""
+        if self._callback is None:
+            return None
+        raw = self._callback.strip()
+        if raw.startswith('[') and raw.endswith(']'):
+            parts = [part.strip() for part in raw[1:-1].split(',') if part.strip()]
+            return [self.resolve(part) if _is_ref(part) else decode_token(part) for part in parts]
+        return self.resolve(raw) if _is_ref(raw) else decode_token(raw)
+
+    def records(self, anchor, fields=None):
+        """按出现顺序返回所有带 anchor 字段的对象，每条为一个解码后的 dict
+
+        对象直接（及二级）引用的子对象字段会被展平进记录，例如帖子引用的
+        blogInfo 中的 blogNickName / blogPageUrl；对象自身的同名字段优先。
+        同一个 blogInfo 被多条帖子复用时，每条记录都能拿到作者信息。
+        fields 不为空时只解码这些字段，其余字段不出现在结果中。
+        """
+        objects = self.objects
+        wanted = set(fields) if fields else None
+        records = []
+        for obj in objects.values():
+            if type(obj) is not dict or anchor not in obj:
+                continue
+            record = {}
+            pending = [obj]
+            seen = set()
+            depth = 0
+            while pending and depth < 3:
+                next_pending = []
+                for raw in pending:
+                    if id(raw) in seen:
+                        continue
+                    seen.add(id(raw))
+                    for key, token in raw.items():
+                        if _is_ref(token):
+                            child = objects.get(token)
+                            if type(child) is dict and anchor not in child:
+                                next_pending.append(child)
+                            continue
+                        if key in record or (wanted is not None and key not in wanted):
+                            continue
+                        record[key] = decode_token(token)
+                pending = next_pending
+                depth += 1
+            records.append(record)
+        return records
+
+
+def parse_dwr(text):
+    """单次遍历 DWR 响应文本，返回 DwrResponse"""
+    objects = {}
+    for name, field, index, token in _STATEMENT.findall(text):
+        if field:
+            target = objects.get(name)
+            if type(target) is not dict:
+                target = objects[name] = {}
+            target[field] = token
+        elif index:
+            target = objects.get(name)
+            if type(target) is not list:
+                target = objects[name] = []
+            i = int(index)
+            if i >= len(target):
+                target.extend([None] * (i + 1 - len(target)))
+            target[i] = token
+        elif token == '{}':
+            objects[name] = {}
+        elif token == '[]':
+            objects[name] = []
+        else:
+            objects[name] = token
+
+    # 回调位于响应末尾，直接从最后一次出现处匹配，避免再扫描全文
+    callback_pos = text.rfind(_CALLBACK_PREFIX)
+    callback = _CALLBACK.match(text, callback_pos) if callback_pos >= 0 else None
+    return DwrResponse(objects, callback.group(1) if callback else None)
@@ -0,0 +1,209 @@
+# coding:utf-8
+"""
+流式 EPUB 写出
+
+直接用 zipfile 写 EPUB 容器：先写 mimetype 和样式表，每章的 XHTML 在生成的同时
+逐段写入压缩流，目录（content.opf / toc.ncx / nav.xhtml）在最后根据记录的
+章节文件名和标题写出。内存占用只与当前正在写的一段有关，与全书篇幅无关。
+先写到同目录下的临时文件，完整写出后再替换目标文件，中途出错不会留下残缺的 EPUB。
+"""
+
+import io
+import os
+import time
+import uuid
+import zipfile
+from html import escape
+
+CONTAINER_XML = '''<?xml version="1.0" encoding="utf-8"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles>
+    <rootfile full-path="EPUB/content.opf" media-type="application/oebps-package+xml"/>
+  </rootfiles>
+</container>
+'''
+
+DEFAULT_STYLE = '''
+body { font-family: "Noto Serif SC", "Source Han Serif", serif; line-height: 1.8; margin: 2em; }
+h1 { text-align: center; margin-bottom: 1em; }
+h2 { border-bottom: 1px solid #ccc; padding-bottom: 0.5em; margin-top: 2em; }
+p { text-indent: 2em; margin-bottom: 0.5em; }
+.meta { font-size: 0.9em; color: #666; margin-bottom: 2em; padding: 1em; background: #f5f5f5; border-radius: 5px; }
+.meta-item { margin-bottom: 0.3em; }
+'''
+
+
+class TocEntry:
+    """目录项：标题、文件名和下级目录项"""
+    __slots__ = ('title', 'href', 'children')
+
+    def __init__(self, title, href, children=None):
+        self.title = title
+        self.href = href
+        self.children = children or []
+
+
+class EpubWriter:
+    """逐章写入的 EPUB 文件
+
+    用法：
+        with EpubWriter(path, title, author) as book:
+            with book.page('chapter_1.xhtml', '第一章') as out:
+                out.write('<h2>第一章</h2>')
+                for para in paragraphs:
+                    out.write(f'<p>{escape(para)}</p>')
+    """
+
+    def __init__(self, filepath, title, author, language='zh', style=DEFAULT_STYLE):
+        self.title = title
+        self.author = author
+        self.language = language
+        self.identifier = f"urn:uuid:{uuid.uuid4()}"
+        self.toc = []
+        self._spine = []
+        self.filepath = filepath
+        self._tmp_path = filepath + '.tmp'
+        self._zip = zipfile.ZipFile(self._tmp_path, 'w', compression=zipfile.ZIP_DEFLATED)
+        try:
+            # mimetype 必须是第一个文件且不压缩
+            self._zip.writestr(zipfile.ZipInfo('mimetype'), 'application/epub+zip', compress_type=zipfile.ZIP_STORED)
+            self._zip.writestr('META-INF/container.xml', CONTAINER_XML)
+            self._zip.writestr('EPUB/style/main.css', style)
+        except BaseException:
+            self.abort()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+    def page(self, file_name, title, toc_parent=None):
+        """开始写一个页面，返回可写入 XHTML 正文片段的文本流（with 结束时补上页尾）
+
+        toc_parent 为上级 TocEntry 时该页作为其下级目录项，为 False 时不加入目录
+        """
+        entry = TocEntry(title, file_name)
+        if toc_parent is None:
+            self.toc.append(entry)
+        elif toc_parent is not False:
+            toc_parent.children.append(entry)
+        self._spine.append(file_name)
+        return _PageStream(self._zip, f"EPUB/{file_name}", title, self.language, entry)
+
+    def close(self):
+        """写出目录和包文件并关闭，再替换目标文件"""
+        try:
+            self._zip.writestr('EPUB/nav.xhtml', self._nav_xhtml())
+            self._zip.writestr('EPUB/toc.ncx', self._toc_ncx())
+            self._zip.writestr('EPUB/content.opf', self._content_opf())
+            self._zip.close()
+        except BaseException:
+            self.abort()
+            raise
+        os.replace(self._tmp_path, self.filepath)
+
+    def abort(self):
+        """放弃写出：关闭并删除临时文件，目标文件保持原样"""
+        try:
+            self._zip.close()
+        finally:
+            if os.path.exists(self._tmp_path):
+                os.remove(self._tmp_path)
+
+    def _content_opf(self):
+        modified = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+        parts = [
+            '<?xml version="1.0" encoding="utf-8"?>\n',
+            '<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="id">\n',
+            '<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">\n',
+            f'<dc:identifier id="id">{escape(self.identifier)}</dc:identifier>\n',
+            f'<dc:title>{escape(self.title)}</dc:title>\n',
+            f'<dc:language>{escape(self.language)}</dc:language>\n',
+            f'<dc:creator id="creator">{escape(self.author)}</dc:creator>\n',
+            f'<meta property="dcterms:modified">{modified}</meta>\n',
+            '</metadata>\n<manifest>\n',
+            '<item id="style" href="style/main.css" media-type="text/css"/>\n',
+            '<item id="ncx" href="toc.ncx" media-type="application/x-dtbncx+xml"/>\n',
+            '<item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>\n',
+        ]
+        for idx, file_name in enumerate(self._spine):
+            parts.append(f'<item id="page_{idx}" href="{escape(file_name)}" media-type="application/xhtml+xml"/>\n')
+        parts.append('</manifest>\n<spine toc="ncx">\n<itemref idref="nav"/>\n')
+        for idx in range(len(self._spine)):
+            parts.append(f'<itemref idref="page_{idx}"/>\n')
+        parts.append('</spine>\n</package>\n')
+        return ''.join(parts)
+
+    def _nav_xhtml(self):
+        parts = [
+            '<?xml version="1.0" encoding="utf-8"?>\n<!DOCTYPE html>\n',
+            f'<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops" '
+            f'lang="{self.language}" xml:lang="{self.language}">\n',
+            f'<head><title>{escape(self.title)}</title></head>\n<body>\n',
+            f'<nav epub:type="toc" id="id"><h2>{escape(self.title)}</h2>\n',
+        ]
+        self._nav_list(self.toc, parts)
+        parts.append('</nav>\n</body>\n</html>\n')
+        return ''.join(parts)
+
+    def _nav_list(self, entries, parts):
+        parts.append('<ol>\n')
+        for entry in entries:
+            parts.append(f'<li><a href="{escape(entry.href)}">{escape(entry.title)}</a>')
+            if entry.children:
+                parts.append('\n')
+                self._nav_list(entry.children, parts)
+            parts.append('</li>\n')
+        parts.append('</ol>\n')
+
+    def _toc_ncx(self):
+        parts = [
+            '<?xml version="1.0" encoding="utf-8"?>\n',
+            '<ncx xmlns="http://www.daisy.org/z3986/2005/ncx/" version="2005-1">\n',
+            f'<head><meta name="dtb:uid" content="{escape(self.identifier)}"/></head>\n',
+            f'<docTitle><text>{escape(self.title)}</text></docTitle>\n<navMap>\n',
+        ]
+        self._nav_points(self.toc, parts, [0])
+        parts.append('</navMap>\n</ncx>\n')
+        return ''.join(parts)
+
+    def _nav_points(self, entries, parts, counter):
+        for entry in entries:
+            counter[0] += 1
+            parts.append(f'<navPoint id="np_{counter[0]}" playOrder="{counter[0]}">'
+                         f'<navLabel><text>{escape(entry.title)}</text></navLabel>'
+                         f'<content src="{escape(entry.href)}"/>\n')
+            self._nav_points(entry.children, parts, counter)
+            parts.append('</navPoint>\n')
+
+
+class _PageStream:
+    """单个 XHTML 页面的写入流：直接写进 zip 中的压缩流"""
+
+    def __init__(self, zip_file, name, title, language, entry):
+        self._raw = zip_file.open(name, 'w')
+        self._out = io.TextIOWrapper(self._raw, encoding='utf-8')
+        self.entry = entry
+        self._out.write(
+            '<?xml version="1.0" encoding="utf-8"?>\n<!DOCTYPE html>\n'
+            f'<html xmlns="http://www.w3.org/1999/xhtml" lang="{language}" xml:lang="{language}">\n'
+            f'<head><title>{escape(title)}</title>'
+            '<link rel="stylesheet" type="text/css" href="style/main.css"/></head>\n<body>'
+        )
+
+    def write(self, text):
+        self._out.write(text)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._out.write('</body>\n</html>\n')
+        self._out.close()
+        return False
@@ -0,0 +1,111 @@
+# coding:utf-8
+"""
+导出文件清单（按目录）
+
+每个保存目录下的 .export_manifest.json 记录该目录中 TXT / HTML / PDF / EPUB 文件
+对应的源文档哈希和原文链接：
+- 同一原文链接再次保存时写回原来的文件，不再生成 (1)、(2) 副本
+- 文件存在且哈希一致时跳过写入 / 渲染，只重新生成内容变化了的作品
+
+批量运行时多个进程可能共用同一目录：修改清单时持有跨进程文件锁，并先读入其他进程写入的内容。
+"""
+
+import json
+import os
+import threading
+
+import file_lock
+
+MANIFEST_NAME = '.export_manifest.json'
+
+_lock = threading.RLock()
+# 目录 -> 清单内容，避免每次查询都读文件；文件被其他进程改写后重新读取
+_manifests = {}
+_stamps = {}
+
+
+def _manifest_path(dir_path):
+    return os.path.join(dir_path, MANIFEST_NAME)
+
+
+def _load(dir_path):
+    """返回目录清单（调用方持有锁）"""
+    key = os.path.abspath(dir_path)
+    path = _manifest_path(dir_path)
+    stamp = file_lock.stamp(path)
+    manifest = _manifests.get(key)
+    if manifest is None or stamp != _stamps.get(key):
+        manifest = {'files': {}, 'urls': {}}
+        if stamp is not None:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    manifest.update(json.load(f))
+            except Exception as e:
+                print(f"加载导出清单失败: {e}")
+        _manifests[key] = manifest
+        _stamps[key] = stamp
+    return manifest
+
+
+def _save(dir_path, manifest):
+    """写回清单（调用方持有锁和文件锁）"""
+    try:
+        _stamps[os.path.abspath(dir_path)] = file_lock.write_json(_manifest_path(dir_path), manifest)
+    except Exception as e:
+        print(f"保存导出清单失败: {e}")
+
+
+def claim_path(dir_path, file_name, url):
+    """为原文链接选择 TXT 保存路径
+
+    该链接之前保存过时返回原来的路径（原地覆盖）；否则选一个不与其他作品重名的文件名并登记
+    """
+    with _lock, file_lock.locked(_manifest_path(dir_path)):
+        manifest = _load(dir_path)
+        known = manifest['urls'].get(url)
+        if known:
+            return os.path.join(dir_path, known)
+
+        path = os.path.join(dir_path, file_name)
+        name_part, ext = os.path.splitext(path)
+        counter = 1
+        while os.path.exists(path) or os.path.basename(path) in manifest['files']:
+            path = f"{name_part}({counter}){ext}"
+            counter += 1
+        manifest['urls'][url] = os.path.basename(path)
+        manifest['files'][os.path.basename(path)] = {'hash': None, 'url': url}
+        _save(dir_path, manifest)
+        return path
+
+
+def is_current(path, digest):
+    """文件存在且登记的哈希与 digest 一致"""
+    if not os.path.exists(path):
+        return False
+    with _lock:
+        entry = _load(os.path.dirname(path))['files'].get(os.path.basename(path))
+    return bool(entry) and entry.get('hash') == digest
+
+
+def record(path, digest, url=None):
+    """文件写入 / 渲染成功后登记哈希"""
+    dir_path = os.path.dirname(path)
+    with _lock, file_lock.locked(_manifest_path(dir_path)):
+        manifest = _load(dir_path)
+        entry = manifest['files'].setdefault(os.path.basename(path), {})
+        entry['hash'] = digest
+        if url:
+            entry['url'] = url
+        _save(dir_path, manifest)
+
+
+def saved_entry(dir_path, url):
+    """原文链接已保存过且文件仍在时返回 (路径, 哈希)，否则返回 None"""
+    with _lock:
+        manifest = _load(dir_path)
+        name = manifest['urls'].get(url)
+        entry = manifest['files'].get(name) if name else None
+    if not entry or not entry.get('hash'):
+        return None
+    path = os.path.join(dir_path, name)
+    return (path, entry['hash']) if os.path.exists(path) else None
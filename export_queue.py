@@ -0,0 +1,434 @@
+# coding:utf-8
+"""
+持久化的导出队列
+
+爬取任务保存 TXT 和源文件后把需要的导出格式加入队列即可继续下一篇；
+后台导出线程读取源文件渲染 PDF / EPUB。队列保存在 JSON 文件中，
+程序重启后未完成的导出会继续执行。
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+
+import export_manifest
+import exporters
+from pdf_render import PdfBatch, merge_pdfs, pdf_pool, render_pdf
+
+EXPORT_FORMATS = ('pdf', 'epub')
+# PDF 后端：xhtml2pdf 按 HTML / CSS 排版；reportlab 直接用 platypus 排版，长文快得多
+PDF_BACKENDS = ('xhtml2pdf', 'reportlab')
+DEFAULT_PDF_BACKEND = 'xhtml2pdf'
+# 只保留最近的这么多条已结束的导出记录
+EXPORT_HISTORY_LIMIT = 500
+
+
+def source_path_for(source_dir, txt_path):
+    """TXT 文件对应的源文件路径"""
+    key = hashlib.md5(os.path.abspath(txt_path).encode('utf-8')).hexdigest()
+    return os.path.join(source_dir, f"{key}.jsonl")
+
+
+def normalize_pdf_backend(backend):
+    return backend if backend in PDF_BACKENDS else DEFAULT_PDF_BACKEND
+
+
+def format_digest(doc_digest, fmt, pdf_backend=DEFAULT_PDF_BACKEND):
+    """导出文件的哈希；PDF 换了后端也算过期（默认后端不计入，兼容已有清单）"""
+    options = {}
+    if fmt == 'pdf' and pdf_backend != DEFAULT_PDF_BACKEND:
+        options['pdf_backend'] = pdf_backend
+    return exporters.artifact_digest(doc_digest, fmt, **options)
+
+
+class ExportQueue:
+    """导出作业队列：每个作业对应一篇已保存的文章和若干导出格式"""
+
+    def __init__(self, queue_file, source_dir, log=print, on_file=None):
+        self.queue_file = queue_file
+        self.source_dir = source_dir
+        self.log = log
+        # 导出文件写出后的回调（更新文件索引）
+        self.on_file = on_file
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        # 关闭服务时设置：导出线程不再领取新作业
+        self._stopping = threading.Event()
+        self._thread = None
+        self._jobs = self._load()
+        self._pdf_jobs = PdfBatch(on_done=self._pdf_done)
+
+    # ---- 持久化 ----
+
+    def _load(self):
+        jobs = {}
+        if os.path.exists(self.queue_file):
+            try:
+                with open(self.queue_file, 'r', encoding='utf-8') as f:
+                    for job in json.load(f).get('jobs', []):
+                        # 上次退出时正在渲染的作业重新执行
+                        if job['status'] == 'running':
+                            job['status'] = 'pending'
+                        jobs[job['id']] = job
+            except Exception as e:
+                print(f"加载导出队列失败: {e}")
+        return jobs
+
+    def _save(self):
+        """写入队列文件（调用方持有锁）"""
+        finished = [job for job in self._jobs.values() if job['status'] in ('done', 'failed')]
+        for job in finished[:max(0, len(finished) - EXPORT_HISTORY_LIMIT)]:
+            del self._jobs[job['id']]
+        tmp_path = self.queue_file + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'jobs': list(self._jobs.values())}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.queue_file)
+        except Exception as e:
+            print(f"保存导出队列失败: {e}")
+
+    # ---- 入队 / 查询 ----
+
+    def save_source(self, txt_path, doc):
+        """爬取任务保存 TXT 后调用：把 Document 写入源文件，返回源文件路径"""
+        source_path = source_path_for(self.source_dir, txt_path)
+        exporters.write_source(source_path, doc)
+        return source_path
+
+    def stale_formats(self, txt_path, formats, doc_digest, pdf_backend=DEFAULT_PDF_BACKEND):
+        """formats 中导出文件不存在或内容已过期（哈希不一致）的格式"""
+        base_path = os.path.splitext(txt_path)[0]
+        pdf_backend = normalize_pdf_backend(pdf_backend)
+        return [fmt for fmt in formats
+                if not export_manifest.is_current(f"{base_path}.{fmt}", format_digest(doc_digest, fmt, pdf_backend))]
+
+    def enqueue(self, txt_path, formats, title='', force=False, pdf_backend=DEFAULT_PDF_BACKEND):
+        """为已保存源文件的 TXT 加入导出作业，返回作业 ID；没有可导出的格式时返回 None
+
+        force 为 False 时，导出文件已是最新（哈希一致）的格式会被跳过
+        """
+        formats = [fmt for fmt in formats if fmt in EXPORT_FORMATS]
+        if not formats:
+            return None
+        now = time.time()
+        job = {
+            'id': uuid.uuid4().hex[:12],
+            'title': title,
+            'txt_path': os.path.abspath(txt_path),
+            'source': source_path_for(self.source_dir, txt_path),
+            'formats': formats,
+            'force': force,
+            'pdf_backend': normalize_pdf_backend(pdf_backend),
+            'status': 'pending',
+            'results': {},
+            'created': now,
+            'updated': now,
+        }
+        with self._lock:
+            self._jobs[job['id']] = job
+            self._save()
+        self.start()
+        self._wake.set()
+        return job['id']
+
+    def enqueue_anthology(self, out_base, txt_paths, formats, title, author='', force=False,
+                          pdf_backend=DEFAULT_PDF_BACKEND):
+        """把多篇已保存源文件的作品合并导出为一本合集，返回作业 ID
+
+        out_base 是不带扩展名的输出路径；作品按 txt_paths 的顺序排列
+        """
+        formats = [fmt for fmt in formats if fmt in EXPORT_FORMATS]
+        if not formats or not txt_paths:
+            return None
+        now = time.time()
+        job = {
+            'id': uuid.uuid4().hex[:12],
+            'kind': 'anthology',
+            'title': title,
+            'author': author,
+            'out_base': os.path.abspath(out_base),
+            'works': [os.path.abspath(path) for path in txt_paths],
+            'formats': formats,
+            'force': force,
+            'pdf_backend': normalize_pdf_backend(pdf_backend),
+            'status': 'pending',
+            'results': {},
+            'created': now,
+            'updated': now,
+        }
+        with self._lock:
+            self._jobs[job['id']] = job
+            self._save()
+        self.start()
+        self._wake.set()
+        return job['id']
+
+    def requeue(self, job_id, formats=None, pdf_backend=None):
+        """重新导出已有作业（不需要重新爬取），返回是否成功加入"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job['status'] in ('pending', 'running'):
+                return False
+            if formats:
+                job['formats'] = [fmt for fmt in formats if fmt in EXPORT_FORMATS]
+            if pdf_backend:
+                job['pdf_backend'] = normalize_pdf_backend(pdf_backend)
+            # 手动重新导出时总是重新渲染
+            job['force'] = True
+            job['status'] = 'pending'
+            job['results'] = {}
+            job['updated'] = time.time()
+            self._save()
+        self.start()
+        self._wake.set()
+        return True
+
+    def use_file(self, queue_file):
+        """改用另一个队列文件（命令行批量运行时每个进程使用自己的文件，不与其他进程同时读写同一个队列）"""
+        with self._lock:
+            self.queue_file = queue_file
+            self._jobs = self._load()
+
+    def wait_idle(self, poll=0.5):
+        """等待所有作业（包括已提交的 PDF 渲染）完成，命令行批量运行结束前调用"""
+        while True:
+            with self._lock:
+                busy = any(job['status'] in ('pending', 'running') for job in self._jobs.values())
+            if not busy and self._pdf_jobs.pending() == 0:
+                return
+            time.sleep(poll)
+
+    def has_source(self, txt_path):
+        return os.path.exists(source_path_for(self.source_dir, txt_path))
+
+    def status(self, limit=50):
+        """返回各状态的作业数量和最近的作业列表"""
+        with self._lock:
+            jobs = sorted(self._jobs.values(), key=lambda job: job['updated'], reverse=True)
+            counts = {}
+            for job in jobs:
+                counts[job['status']] = counts.get(job['status'], 0) + 1
+            return {'counts': counts, 'jobs': [dict(job) for job in jobs[:limit]]}
+
+    # ---- 后台导出线程 ----
+
+    def start(self):
+        """启动导出线程（已启动时不做任何事）"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='export-worker', daemon=True)
+            self._thread.start()
+
+    def drain(self, timeout=None):
+        """停止领取新作业，等待正在执行的作业（包括已提交的 PDF 渲染）完成，返回是否在超时前完成；
+        未开始的作业留在队列文件中，下次启动时继续"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self._stopping.set()
+        self._wake.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+            if thread.is_alive():
+                return False
+        self._pdf_jobs.wait(None if deadline is None else max(0, deadline - time.monotonic()))
+        return self._pdf_jobs.pending() == 0
+
+    def _next_pending(self):
+        with self._lock:
+            for job in sorted(self._jobs.values(), key=lambda job: job['created']):
+                if job['status'] == 'pending':
+                    job['status'] = 'running'
+                    job['updated'] = time.time()
+                    self._save()
+                    return dict(job)
+        return None
+
+    def _run(self):
+        while not self._stopping.is_set():
+            job = self._next_pending()
+            if job is None:
+                self._wake.wait(timeout=5)
+                self._wake.clear()
+                continue
+            try:
+                self._process(job)
+            except Exception as e:
+                for fmt in job['formats']:
+                    if fmt not in self._jobs.get(job['id'], {}).get('results', {}):
+                        self._finish_format(job['id'], fmt, False, '', str(e))
+
+    def _process(self, job):
+        if job.get('kind') == 'anthology':
+            return self._process_anthology(job)
+        base_path = os.path.splitext(job['txt_path'])[0]
+        doc_digest = exporters.source_digest(job['source'])
+        pdf_backend = job.get('pdf_backend', DEFAULT_PDF_BACKEND)
+        for fmt in job['formats']:
+            out_path = f"{base_path}.{fmt}"
+            digest = format_digest(doc_digest, fmt, pdf_backend)
+            if not job.get('force') and export_manifest.is_current(out_path, digest):
+                self._finish_format(job['id'], fmt, True, out_path, '', skipped=True)
+                continue
+            if fmt == 'pdf' and pdf_backend == 'reportlab':
+                from pdf_direct import render_source_pdf
+
+                # 工作进程直接读取源文件排版，不经过 HTML
+                while self._pdf_jobs.pending() >= pdf_pool.worker_count() * 2:
+                    time.sleep(0.2)
+                self._pdf_jobs.submit_call(render_source_pdf, (job['source'], out_path), out_path,
+                                           label=(job['id'], fmt, digest))
+            elif fmt == 'pdf':
+                doc = exporters.read_source(job['source'])
+                html_content = exporters.render_html(doc)
+                if doc.kind == 'ao3':
+                    # 同时保存HTML文件（方便调试和自定义）
+                    with open(f"{base_path}.html", 'w', encoding='utf-8') as f:
+                        f.write(html_content)
+                    self._file_saved(f"{base_path}.html")
+                # PDF 渲染进程都在忙时先等一等，避免积压大量 HTML 在内存中
+                while self._pdf_jobs.pending() >= pdf_pool.worker_count() * 2:
+                    time.sleep(0.2)
+                self._pdf_jobs.submit(html_content, out_path, label=(job['id'], fmt, digest))
+            elif fmt == 'epub':
+                # EPUB 逐章读取源文件并流式写入，不把整本书读进内存
+                ok = exporters.write_epub(exporters.read_source(job['source'], lazy=True), out_path)
+                if ok:
+                    export_manifest.record(out_path, digest)
+                self._finish_format(job['id'], fmt, ok, out_path, '' if ok else 'EPUB生成失败')
+
+    def _process_anthology(self, job):
+        works = [(txt_path, source_path_for(self.source_dir, txt_path)) for txt_path in job['works']]
+        works = [(txt_path, source) for txt_path, source in works if os.path.exists(source)]
+        # 合集哈希：各篇源文件哈希按顺序组合，任一篇变化或顺序变化都会重新生成
+        combined = hashlib.sha256()
+        for _, source in works:
+            combined.update(exporters.source_digest(source).encode('ascii'))
+        anthology_digest = combined.hexdigest()
+
+        for fmt in job['formats']:
+            out_path = f"{job['out_base']}.{fmt}"
+            digest = exporters.artifact_digest(anthology_digest, fmt, anthology=True,
+                                               **({'pdf_backend': job.get('pdf_backend', DEFAULT_PDF_BACKEND)}
+                                                  if fmt == 'pdf' else {}))
+            if not job.get('force') and export_manifest.is_current(out_path, digest):
+                self._finish_format(job['id'], fmt, True, out_path, '', skipped=True)
+                continue
+            os.makedirs(os.path.dirname(out_path), exist_ok=True)
+            if fmt == 'epub':
+                # 逐篇、逐章读取源文件写入同一个 EPUB 容器
+                docs = (exporters.read_source(source, lazy=True) for _, source in works)
+                ok = exporters.write_anthology_epub(job['title'], job.get('author', ''), docs, out_path)
+                message = f"共 {len(works)} 篇" if ok else '合集EPUB生成失败'
+            else:
+                ok, message = self._anthology_pdf(works, out_path, job.get('pdf_backend', DEFAULT_PDF_BACKEND))
+            if ok:
+                export_manifest.record(out_path, digest)
+            self._finish_format(job['id'], fmt, ok, out_path, message)
+
+    def _anthology_pdf(self, works, out_path, pdf_backend):
+        """渲染并合并合集 PDF，返回 (是否成功, 提示信息)"""
+        tmp_dir = tempfile.mkdtemp(prefix='.anthology_', dir=os.path.dirname(out_path))
+        failed = []
+        try:
+            merged, volumes = merge_pdfs(self._anthology_parts(works, tmp_dir, failed, pdf_backend), out_path)
+        except Exception as e:
+            return False, str(e)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        if not merged:
+            return False, '没有可合并的作品'
+        # 第 1 卷就是 out_path（由 _finish_format 登记），其余分卷在这里加入文件索引
+        for path in volumes[1:]:
+            self._file_saved(path)
+        message = f"共 {merged} 篇"
+        if len(volumes) > 1:
+            message += f"，页数较多，分为 {len(volumes)} 卷"
+        if failed:
+            message += f"，{len(failed)} 篇渲染失败已跳过"
+        return True, message
+
+    def _anthology_parts(self, works, tmp_dir, failed, pdf_backend):
+        """按作品顺序产出 (标题, PDF 路径)
+
+        单篇 PDF 已导出且是最新的直接复用；其余提交到 PDF 进程池渲染到临时目录，
+        同时在渲染的不超过进程数 2 倍，合并完的临时文件随即删除
+        """
+        window = deque()
+        limit = pdf_pool.worker_count() * 2
+
+        def take():
+            title, pdf_path, future = window.popleft()
+            if future is not None:
+                try:
+                    ok, _ = future.result()
+                except Exception as e:
+                    ok = False
+                    self.log(f"   ⚠️ 合集PDF中的作品渲染失败: {title}: {e}")
+                if not ok:
+                    failed.append(title)
+                    return
+            yield title, pdf_path
+            if future is not None and os.path.exists(pdf_path):
+                os.remove(pdf_path)
+
+        for idx, (txt_path, source) in enumerate(works):
+            own_pdf = f"{os.path.splitext(txt_path)[0]}.pdf"
+            if export_manifest.is_current(own_pdf, format_digest(exporters.source_digest(source), 'pdf', pdf_backend)):
+                window.append((exporters.read_source(source, lazy=True).title or '无标题', own_pdf, None))
+            elif pdf_backend == 'reportlab':
+                from pdf_direct import render_source_pdf
+
+                pdf_path = os.path.join(tmp_dir, f"{idx}.pdf")
+                window.append((exporters.read_source(source, lazy=True).title or '无标题', pdf_path,
+                               pdf_pool.submit(render_source_pdf, source, pdf_path)))
+            else:
+                doc = exporters.read_source(source)
+                pdf_path = os.path.join(tmp_dir, f"{idx}.pdf")
+                window.append((doc.title or '无标题', pdf_path,
+                               pdf_pool.submit(render_pdf, exporters.render_html(doc), pdf_path)))
+            while len(window) >= limit:
+                yield from take()
+        while window:
+            yield from take()
+
+    def _pdf_done(self, label, pdf_path, ok, message):
+        job_id, fmt, digest = label
+        if ok:
+            export_manifest.record(pdf_path, digest)
+        self._finish_format(job_id, fmt, ok, pdf_path, message)
+
+    def _file_saved(self, path):
+        if self.on_file is not None:
+            try:
+                self.on_file(path)
+            except Exception:
+                pass
+
+    def _finish_format(self, job_id, fmt, ok, path, message, skipped=False):
+        if ok and not skipped and path:
+            self._file_saved(path)
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job['results'][fmt] = {'ok': ok, 'path': path, 'message': message, 'skipped': skipped}
+            job['updated'] = time.time()
+            if len(job['results']) >= len(job['formats']):
+                failed = [f for f, result in job['results'].items() if not result['ok']]
+                job['status'] = 'failed' if failed else 'done'
+            self._save()
+            title = job['title'] or os.path.basename(job.get('txt_path') or job.get('out_base', ''))
+        name = os.path.basename(path) if path else fmt.upper()
+        if skipped:
+            self.log(f"   ⏭️ {fmt.upper()}内容未变化，跳过: {name}")
+        elif ok:
+            self.log(f"   📄 已导出{fmt.upper()}: {name}" + (f"（{message}）" if message else ""))
+        else:
+            self.log(f"   ⚠️ {fmt.upper()}导出失败: {title}: {message}")
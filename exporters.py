@@ -0,0 +1,509 @@
+# coding:utf-8
+"""
+导出格式渲染
+
+所有格式都从同一个 Document（见 document.py）生成，正文按段落列表拼接（join），
+耗时与篇幅成线性关系。爬取时只写 TXT 和源文件（JSON Lines：第一行是作品信息，
+其后每行一章），PDF / EPUB 由导出队列在后台读取源文件后渲染，
+也可以随时重新导出而无需重新爬取。
+"""
+
+import hashlib
+import json
+import os
+from html import escape
+
+from document import Chapter, Document
+from epub_writer import EpubWriter
+
+# 模板版本：修改 TXT / HTML / EPUB 排版后加一，使已导出的文件在下次运行时重新生成
+EXPORT_TEMPLATE_VERSION = 1
+# TXT 中作品信息与正文之间的分隔线
+AO3_TXT_RULE = "=" * 60
+LOFTER_TXT_RULE = "=" * 50
+
+
+def _source_lines(doc):
+    """源文件的每一行（作品信息 + 每章一行），写文件和计算哈希共用"""
+    yield json.dumps(doc.header(), ensure_ascii=False) + '\n'
+    for chapter in doc.chapters:
+        yield json.dumps(chapter.to_dict(), ensure_ascii=False) + '\n'
+
+
+def write_source(path, doc):
+    """写入源文件"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.writelines(_source_lines(doc))
+    os.replace(tmp_path, path)
+
+
+def document_digest(doc):
+    """文档内容哈希：与其源文件内容的哈希相同"""
+    digest = hashlib.sha256()
+    for line in _source_lines(doc):
+        digest.update(line.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def source_digest(path):
+    """源文件内容哈希（分块读取）"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def artifact_digest(doc_digest, fmt, **options):
+    """导出文件的哈希：源文档哈希 + 格式 + 模板版本 + 导出选项"""
+    key = json.dumps([doc_digest, fmt, EXPORT_TEMPLATE_VERSION, options], sort_keys=True)
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def read_source(path, lazy=False):
+    """读取源文件，返回 Document
+
+    lazy 为 True 时章节不一次读入内存，doc.chapters 是逐行读取的生成器（只能遍历一次）
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        header = json.loads(f.readline())
+        if lazy:
+            chapters = []
+        else:
+            chapters = [json.loads(line) for line in f if line.strip()]
+    doc = Document.from_source(header, chapters)
+    if lazy:
+        doc.chapters = _iter_source_chapters(path)
+    return doc
+
+
+def _iter_source_chapters(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        f.readline()
+        for line in f:
+            if line.strip():
+                yield Chapter.from_dict(json.loads(line))
+
+
+def render_txt(doc):
+    """生成 TXT 全文"""
+    if doc.kind == 'lofter':
+        return ''.join([
+            f"{doc.title or '无标题'} by {doc.author}[{doc.extra.get('author_ip', '')}]\n",
+            f"发表时间：{doc.extra.get('public_time', '')}\n原文链接：{doc.url}\n",
+            LOFTER_TXT_RULE, "\n\n",
+            "\n".join(doc.paragraphs()),
+        ])
+
+    parts = [f"{doc.title}\nby {doc.author}\n", f"原文链接: {doc.url}\n", "\n", AO3_TXT_RULE, "\n"]
+    if doc.metadata:
+        parts += ["\n".join(doc.metadata), "\n\n", AO3_TXT_RULE, "\n"]
+    if doc.chaptered:
+        blocks = []
+        for chapter in doc.chapters:
+            blocks.append(f"\n\n{AO3_TXT_RULE}\n{chapter.title}\n{AO3_TXT_RULE}\n")
+            blocks.append('\n\n'.join(chapter.paragraphs))
+        parts.append("\n\n".join(blocks))
+    else:
+        parts.append("\n\n".join(doc.paragraphs()))
+    return ''.join(parts)
+
+
+def render_html(doc):
+    """按来源选择模板，生成 PDF 用的 HTML"""
+    if doc.kind == 'lofter':
+        return build_lofter_html(doc)
+    return build_ao3_html(doc)
+
+
+def _is_body_paragraph(para):
+    """过滤空段落和 TXT 格式的分隔符"""
+    stripped = para.strip()
+    return bool(stripped) and not stripped.startswith('=' * 10)
+
+
+def build_lofter_html(doc):
+    """生成 Lofter 文章 PDF 用的 HTML"""
+    import datetime
+    
+    title = doc.title or "无标题"
+    author = doc.author
+    author_ip = doc.extra.get('author_ip', '')
+    public_time = doc.extra.get('public_time', '')
+    url = doc.url
+    
+    # 处理内容中的换行
+    content_html = '<br/>'.join(doc.paragraphs()).replace('\n', '<br/>')
+    current_date = datetime.datetime.now().strftime("%Y-%m-%d")
+    
+    html_content = f'''<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+    <meta charset="UTF-8">
+    <title>{title} - {author}</title>
+    <style>
+        @page {{ 
+            size: A4; 
+            margin: 2.5cm 2cm; 
+            @bottom-center {{
+                content: counter(page);
+                font-size: 10pt;
+                color: #666;
+            }}
+        }}
+        
+        body {{ font-family: STSong-Light, SimSun, serif; font-size: 12pt; line-height: 1.8; color: #333; }}
+        
+        /* 封面样式 */
+        .cover {{
+            text-align: center;
+            padding-top: 20%;
+            page-break-after: always;
+            height: 100%;
+        }}
+        
+        .cover-title {{
+            font-size: 28pt;
+            font-weight: bold;
+            margin-bottom: 30px;
+            color: #2c3e50;
+        }}
+        
+        .cover-author {{
+            font-size: 16pt;
+            margin-bottom: 60px;
+            color: #555;
+        }}
+        
+        .cover-meta {{
+            font-size: 11pt;
+            color: #7f8c8d;
+            margin-top: 100px;
+            border-top: 1px solid #ddd;
+            padding-top: 30px;
+            width: 60%;
+            margin-left: auto;
+            margin-right: auto;
+        }}
+        
+        /* 正文内容 */
+        .content-title {{
+            font-size: 18pt;
+            font-weight: bold;
+            text-align: center;
+            margin-bottom: 10px;
+            padding-top: 30px;
+        }}
+        
+        .content-meta {{
+            font-size: 10pt;
+            color: #999;
+            text-align: center;
+            margin-bottom: 40px;
+            border-bottom: 1px solid #eee;
+            padding-bottom: 20px;
+        }}
+        
+        .content {{ text-align: justify; }}
+        .content p {{ text-indent: 2em; margin-bottom: 10px; }}
+        
+        a {{ color: #3498db; text-decoration: none; }}
+    </style>
+</head>
+<body>
+    <!-- 封面 -->
+    <div class="cover">
+        <div class="cover-title">{title or "无标题"}</div>
+        <div class="cover-author">By {author}</div>
+        
+        <div class="cover-meta">
+            <div>Published: {public_time}</div>
+            <div>Source: Lofter</div>
+            <div style="margin-top: 20px; font-size: 10pt;">
+                Generated on {current_date}
+            </div>
+        </div>
+    </div>
+
+    <!-- 正文 -->
+    <div class="content-title">{title or "无标题"}</div>
+    <div class="content-meta">
+        作者: {author} [{author_ip}] &nbsp;|&nbsp; 时间: {public_time}<br/>
+        原文: {url}
+    </div>
+    
+    <div class="content">
+        <p>{content_html}</p>
+    </div>
+</body>
+</html>'''
+    return html_content
+
+
+def build_ao3_html(doc):
+    """生成 AO3 作品 PDF 用的美化 HTML - 书籍风格"""
+    import datetime
+    current_date = datetime.datetime.now().strftime("%Y-%m-%d")
+    title = doc.title
+    author = doc.author
+    work_url = doc.url
+    
+    # 处理元数据
+    meta_items = []
+    fandom = ""
+    rating = ""
+    
+    for meta in doc.metadata:
+        meta = meta.strip()
+        if not meta: continue
+        
+        # 提取关键信息用于封面
+        if meta.startswith("Fandom:"):
+            fandom = meta.split(":", 1)[1].strip()
+        elif meta.startswith("Rating:"):
+            rating = meta.split(":", 1)[1].strip()
+        
+        if ':' in meta:
+            key, value = meta.split(':', 1)
+            meta_items.append(f'<div class="meta-item"><span class="meta-label">{key.strip()}:</span> <span class="meta-value">{value.strip()}</span></div>\n')
+        else:
+            meta_items.append(f'<div class="meta-item">{meta}</div>\n')
+    meta_html = ''.join(meta_items)
+    
+    # 处理正文内容
+    content_items = []
+    if doc.chaptered:
+        # 多章节
+        for i, chapter in enumerate(doc.chapters):
+            # 章节之间添加分页符
+            if i > 0:
+                content_items.append('<div class="page-break"></div>\n')
+            content_items.append(f'<div class="chapter">\n<h2 class="chapter-title">{chapter.title}</h2>\n')
+            content_items.extend(f'<p>{para}</p>\n' for para in chapter.paragraphs if para.strip())
+            content_items.append('</div>\n')
+    else:
+        # 单章节
+        content_items.append('<div class="chapter">\n')
+        content_items.extend(f'<p>{para}</p>\n' for para in doc.paragraphs() if _is_body_paragraph(para))
+        content_items.append('</div>\n')
+    content_html = ''.join(content_items)
+    
+    html_template = f'''<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+    <meta charset="UTF-8">
+    <title>{title} - {author}</title>
+    <style>
+        @page {{
+            size: A4;
+            margin: 2.5cm 2cm;
+            @bottom-center {{
+                content: counter(page);
+                font-size: 10pt;
+                color: #666;
+            }}
+        }}
+        
+        body {{
+            font-family: STSong-Light, SimSun, serif;
+            font-size: 12pt;
+            line-height: 1.8;
+            color: #222;
+            background: #fff;
+        }}
+        
+        /* 封面样式 */
+        .cover {{
+            text-align: center;
+            padding-top: 15%;
+            page-break-after: always;
+            height: 100%;
+        }}
+        
+        .cover-title {{
+            font-size: 32pt;
+            font-weight: bold;
+            margin-bottom: 30px;
+            color: #2c3e50;
+            line-height: 1.3;
+        }}
+        
+        .cover-author {{
+            font-size: 18pt;
+            margin-bottom: 60px;
+            color: #555;
+        }}
+        
+        .cover-meta {{
+            font-size: 12pt;
+            color: #7f8c8d;
+            margin-top: 100px;
+            border-top: 1px solid #ddd;
+            padding-top: 30px;
+            width: 60%;
+            margin-left: auto;
+            margin-right: auto;
+        }}
+        
+        .cover-fandom {{
+            font-style: italic;
+            margin-bottom: 10px;
+        }}
+        
+        /* 元数据页 */
+        .metadata-page {{
+            page-break-after: always;
+            padding: 2cm 0;
+        }}
+        
+        .metadata-title {{
+            font-size: 18pt;
+            border-bottom: 2px solid #8B4513;
+            padding-bottom: 10px;
+            margin-bottom: 30px;
+            color: #8B4513;
+        }}
+        
+        .metadata-content {{
+            background-color: #fafafa;
+            padding: 20px;
+            border: 1px solid #eee;
+            border-radius: 5px;
+        }}
+        
+        .meta-item {{
+            margin-bottom: 8px;
+            font-size: 11pt;
+        }}
+        
+        .meta-label {{
+            font-weight: bold;
+            color: #555;
+        }}
+        
+        /* 正文样式 */
+        .content {{
+            text-align: justify;
+        }}
+        
+        .chapter-title {{
+            font-size: 18pt;
+            font-weight: bold;
+            text-align: center;
+            margin: 40px 0 30px 0;
+            color: #2c3e50;
+        }}
+        
+        p {{
+            text-indent: 2em;
+            margin-bottom: 12px;
+            line-height: 1.8;
+        }}
+        
+        .page-break {{
+            page-break-after: always;
+        }}
+        
+        a {{ color: #3498db; text-decoration: none; }}
+    </style>
+</head>
+<body>
+    <!-- 封面页 -->
+    <div class="cover">
+        <div class="cover-title">{title}</div>
+        <div class="cover-author">By {author}</div>
+        
+        <div class="cover-meta">
+            {f'<div class="cover-fandom">{fandom}</div>' if fandom else ''}
+            <div>Rating: {rating or 'Not Rated'}</div>
+            <div style="margin-top: 20px; font-size: 10pt;">
+                Generated by Lofter Spider<br/>
+                {current_date}
+            </div>
+        </div>
+    </div>
+    
+    <!-- 元数据页 -->
+    <div class="metadata-page">
+        <div class="metadata-title">Work Details</div>
+        <div class="metadata-content">
+            {meta_html}
+            <div class="meta-item" style="margin-top: 20px; border-top: 1px dashed #ccc; padding-top: 10px;">
+                <span class="meta-label">Original URL:</span> 
+                <span class="meta-value">{work_url}</span>
+            </div>
+        </div>
+    </div>
+    
+    <!-- 正文内容 -->
+    <div class="content">
+        {content_html}
+    </div>
+</body>
+</html>'''
+    return html_template
+
+
+def _write_info_page(book, doc, file_name, page_title, toc_parent=None):
+    """作品信息页：标题、作者和元数据"""
+    title = doc.title or '无标题'
+    page = book.page(file_name, page_title, toc_parent)
+    with page as out:
+        out.write(f'<h1>{escape(title)}</h1><p style="text-align:center;">by {escape(doc.author)}</p>')
+        out.write('<div class="meta">')
+        for meta in doc.metadata:
+            if meta.strip():
+                out.write(f'<div class="meta-item">{escape(meta)}</div>')
+        out.write('</div>')
+    return page.entry
+
+
+def _write_body_pages(book, doc, prefix='', toc_parent=None):
+    """正文页：多章节作品每章一页，单章节作品一页"""
+    if doc.chaptered:
+        for idx, chapter in enumerate(doc.chapters):
+            with book.page(f'{prefix}chapter_{idx+1}.xhtml', chapter.title, toc_parent) as out:
+                out.write(f'<h2>{escape(chapter.title)}</h2>')
+                for para in chapter.paragraphs:
+                    if para.strip():
+                        out.write(f'<p>{escape(para)}</p>')
+    else:
+        with book.page(f'{prefix}content.xhtml', '正文', toc_parent) as out:
+            out.write(f'<h1>{escape(doc.title or "无标题")}</h1>')
+            for para in doc.paragraphs():
+                if _is_body_paragraph(para):
+                    out.write(f'<p>{escape(para)}</p>')
+
+
+def write_epub(doc, filepath):
+    """生成 EPUB 电子书：逐章流式写入，doc.chapters 可以是只遍历一次的生成器"""
+    try:
+        with EpubWriter(filepath, doc.title or '无标题', doc.author) as book:
+            # 封面/元数据页
+            if doc.metadata:
+                _write_info_page(book, doc, 'cover.xhtml', '作品信息')
+            _write_body_pages(book, doc)
+        return True
+    except Exception as e:
+        print(f"EPUB生成失败: {e}")
+        return False
+
+
+def write_anthology_epub(title, author, docs, filepath):
+    """把多篇作品合并成一本 EPUB：每篇一个作品信息页作为一级目录，章节作为其下级目录
+
+    docs 可以是逐篇读取源文件的生成器（每篇的章节也是生成器），
+    内存中同时只有一章的内容；容器、样式表和目录文件只写一次
+    """
+    try:
+        with EpubWriter(filepath, title, author) as book:
+            for idx, doc in enumerate(docs):
+                prefix = f'work_{idx+1}_'
+                entry = _write_info_page(book, doc, f'{prefix}info.xhtml', doc.title or '无标题')
+                _write_body_pages(book, doc, prefix, toc_parent=entry)
+        return True
+    except Exception as e:
+        print(f"合集EPUB生成失败: {e}")
+        return False
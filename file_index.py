@@ -0,0 +1,229 @@
+# coding:utf-8
+"""
+已下载文件索引
+
+/api/files 不再每次请求都 os.walk 整个保存目录：文件信息（相对路径、所在文件夹、类型、
+大小、修改时间）保存在保存目录下的 .file_index.sqlite 中，
+- 爬取任务和导出队列保存文件后调用 record() 立即更新
+- 后台线程定期用 os.scandir 对账：目录修改时间没变的目录不重新列出文件，
+  只递归检查记录的子目录；变化了的目录比较文件的大小和修改时间
+查询在 SQLite 中完成分页、排序和筛选。
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+INDEX_NAME = '.file_index.sqlite'
+IMAGE_EXTS = ('.jpg', '.png', '.gif', '.jpeg')
+SORT_COLUMNS = {'mtime': 'mtime', 'size': 'size', 'name': 'name'}
+# 后台对账间隔（秒）
+RECONCILE_INTERVAL = 300
+
+
+def file_type(name):
+    return 'image' if name.lower().endswith(IMAGE_EXTS) else 'text'
+
+
+def is_listed(name):
+    """与原来的列表规则一致：跳过隐藏文件和 JSON 状态文件"""
+    return not name.endswith('.json') and not name.startswith('.')
+
+
+class FileIndex:
+    """一个保存目录的文件索引"""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._ready = threading.Event()
+        self._db = sqlite3.connect(os.path.join(self.root, INDEX_NAME), check_same_thread=False)
+        self._db.executescript('''
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                dir TEXT NOT NULL,
+                folder TEXT NOT NULL,
+                name TEXT NOT NULL,
+                type TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS files_dir ON files (dir);
+            CREATE INDEX IF NOT EXISTS files_mtime ON files (mtime);
+            CREATE INDEX IF NOT EXISTS files_folder ON files (folder);
+            CREATE TABLE IF NOT EXISTS dirs (
+                path TEXT PRIMARY KEY,
+                mtime REAL NOT NULL,
+                subdirs TEXT NOT NULL
+            );
+        ''')
+        self._db.commit()
+
+    # ---- 写入 ----
+
+    def _row(self, rel_path, size, mtime):
+        rel_dir = os.path.dirname(rel_path)
+        return (rel_path, rel_dir, os.path.basename(rel_dir), os.path.basename(rel_path),
+                file_type(rel_path), size, mtime)
+
+    def record(self, path):
+        """文件保存后调用：更新该文件的索引（文件不在保存目录内或不需要列出时忽略）"""
+        path = os.path.abspath(path)
+        rel_path = os.path.relpath(path, self.root)
+        if rel_path.startswith('..') or not is_listed(os.path.basename(path)):
+            return
+        if any(part.startswith('.') for part in rel_path.split(os.sep)[:-1]):
+            return
+        try:
+            st = os.stat(path)
+        except OSError:
+            self.remove(path)
+            return
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)',
+                             self._row(rel_path, st.st_size, st.st_mtime))
+            self._db.commit()
+
+    def remove(self, path):
+        rel_path = os.path.relpath(os.path.abspath(path), self.root)
+        with self._lock:
+            self._db.execute('DELETE FROM files WHERE path = ?', (rel_path,))
+            self._db.commit()
+
+    # ---- 对账 ----
+
+    def reconcile(self, full=False):
+        """用 os.scandir 对账；full 为 False 时修改时间没变的目录只检查其子目录"""
+        with self._lock:
+            known_dirs = {path: (mtime, json.loads(subdirs))
+                          for path, mtime, subdirs in self._db.execute('SELECT path, mtime, subdirs FROM dirs')}
+        seen_dirs = set()
+        pending = ['']
+        while pending:
+            rel_dir = pending.pop()
+            seen_dirs.add(rel_dir)
+            abs_dir = os.path.join(self.root, rel_dir)
+            try:
+                dir_mtime = os.stat(abs_dir).st_mtime
+            except OSError:
+                continue
+            known = known_dirs.get(rel_dir)
+            if not full and known and known[0] == dir_mtime:
+                pending.extend(known[1])
+                continue
+            subdirs = self._scan_dir(rel_dir, abs_dir)
+            with self._lock:
+                self._db.execute('INSERT OR REPLACE INTO dirs VALUES (?, ?, ?)',
+                                 (rel_dir, dir_mtime, json.dumps(subdirs, ensure_ascii=False)))
+                self._db.commit()
+            pending.extend(subdirs)
+
+        # 已删除的目录
+        gone = [path for path in known_dirs if path not in seen_dirs]
+        if gone:
+            with self._lock:
+                for rel_dir in gone:
+                    self._db.execute('DELETE FROM dirs WHERE path = ?', (rel_dir,))
+                    self._db.execute('DELETE FROM files WHERE dir = ?', (rel_dir,))
+                self._db.commit()
+        self._ready.set()
+
+    def _scan_dir(self, rel_dir, abs_dir):
+        """列出一个目录：更新变化的文件、删除消失的文件，返回子目录（相对路径）"""
+        subdirs = []
+        current = {}
+        try:
+            with os.scandir(abs_dir) as entries:
+                for entry in entries:
+                    if entry.name.startswith('.'):
+                        continue
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(os.path.join(rel_dir, entry.name))
+                        elif entry.is_file() and is_listed(entry.name):
+                            st = entry.stat()
+                            current[os.path.join(rel_dir, entry.name)] = (st.st_size, st.st_mtime)
+                    except OSError:
+                        continue
+        except OSError:
+            return subdirs
+
+        with self._lock:
+            indexed = {path: (size, mtime) for path, size, mtime in
+                       self._db.execute('SELECT path, size, mtime FROM files WHERE dir = ?', (rel_dir,))}
+            changed = [self._row(path, *stat) for path, stat in current.items() if indexed.get(path) != stat]
+            removed = [(path,) for path in indexed if path not in current]
+            if changed:
+                self._db.executemany('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)', changed)
+            if removed:
+                self._db.executemany('DELETE FROM files WHERE path = ?', removed)
+            self._db.commit()
+        return subdirs
+
+    def start(self, interval=RECONCILE_INTERVAL):
+        """启动后台对账线程：先完整对账一次，之后定期快速对账"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, args=(interval,), name='file-index', daemon=True)
+            self._thread.start()
+
+    def _run(self, interval):
+        full = True
+        while True:
+            try:
+                self.reconcile(full=full)
+                full = False
+            except Exception as e:
+                print(f"文件索引对账失败: {e}")
+            # 对账失败时也不让查询一直等待
+            self._ready.set()
+            time.sleep(interval)
+
+    # ---- 查询 ----
+
+    def query(self, page=1, per_page=200, sort='mtime', order='desc', kind=None, folder=None, keyword=None):
+        """分页查询，返回 (文件列表, 总数)；第一次对账完成前等待（最多与原来一次遍历相当）"""
+        self._ready.wait()
+        where = []
+        args = []
+        if kind:
+            where.append('type = ?')
+            args.append(kind)
+        if folder:
+            where.append('folder = ?')
+            args.append(folder)
+        if keyword:
+            where.append('name LIKE ?')
+            args.append(f"%{keyword}%")
+        clause = f" WHERE {' AND '.join(where)}" if where else ''
+        column = SORT_COLUMNS.get(sort, 'mtime')
+        direction = 'ASC' if order == 'asc' else 'DESC'
+        with self._lock:
+            total = self._db.execute(f'SELECT COUNT(*) FROM files{clause}', args).fetchone()[0]
+            rows = self._db.execute(
+                f'SELECT path, folder, name, type, size, mtime FROM files{clause} '
+                f'ORDER BY {column} {direction}, path LIMIT ? OFFSET ?',
+                args + [per_page, (page - 1) * per_page]).fetchall()
+        files = [{'name': name, 'path': path, 'folder': folder, 'type': ftype, 'size': size, 'mtime': mtime}
+                 for path, folder, name, ftype, size, mtime in rows]
+        return files, total
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def index_for(save_root):
+    """保存目录对应的 FileIndex（按绝对路径缓存），首次使用时启动后台对账"""
+    root = os.path.abspath(save_root)
+    with _indexes_lock:
+        index = _indexes.get(root)
+        if index is None:
+            index = _indexes[root] = FileIndex(root)
+    index.start()
+    return index
@@ -0,0 +1,61 @@
+# coding:utf-8
+"""
+多进程共用的 JSON 状态文件
+
+批量运行（batch.py --jobs N）时多个子进程共用同一个保存目录，导出清单、同步标记等
+文件会被同时读-改-写。写入前先取得 <文件>.lock 上的独占锁，再从磁盘重新读取最新内容、
+在其上修改并写回，不会互相覆盖；临时文件名带进程号，各进程的原子替换互不干扰。
+"""
+
+import contextlib
+import json
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+@contextlib.contextmanager
+def locked(path):
+    """持有 path 对应 .lock 文件上的跨进程独占锁（同一进程内的线程仍由调用方的锁互斥）"""
+    with open(path + '.lock', 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    # LK_LOCK 重试约 10 秒后仍拿不到会抛出 OSError，继续等待
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def stamp(path):
+    """文件的修改时间和大小，用于判断其他进程是否写过；文件不存在时返回 None"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def write_json(path, data):
+    """原子写入 JSON（临时文件带进程号），返回写入后的 stamp"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    return stamp(path)
@@ -0,0 +1,52 @@
+# coding:utf-8
+"""
+图片链接规范化
+
+Lofter 的同一张图片会以多种形式出现：不同编号的 imglf 域名（imglf3.lf127.net、
+imglf4.lf127.net、imglf5.nosdn0.126.net ...）、http / https、带 ?imageView&thumbnail=
+的缩略图参数、HTML 中转义成 &amp; 的链接等。这里把它们统一成原图链接和一个规范化的键，
+任务内去重和图片存储（blob_store）的索引都以这个键为准。
+"""
+
+import re
+from html import unescape
+from urllib.parse import urlsplit, urlunsplit
+
+# imglf 图片的身份由 /img/ 之后的路径决定，域名只是不同的镜像
+_IMGLF_HOST = re.compile(r'^imglf\d*\.[a-z0-9.]+$', re.I)
+# 头像等小尺寸缩略图（如 16x16、64y64）
+_THUMBNAIL_SIZE = re.compile(r"[1649]{2}[x,y][1649]{2}")
+
+
+def canonical_image_url(url):
+    """原图链接：反转义、去掉缩放 / 裁剪参数和片段"""
+    parts = urlsplit(unescape(url.strip()))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, '', ''))
+
+
+def image_key(url):
+    """图片的规范化键：imglf 图片为 'imglf:' + 路径（与镜像域名和参数无关），其他图片为原图链接"""
+    parts = urlsplit(unescape(url.strip()))
+    if _IMGLF_HOST.match(parts.netloc) and parts.path:
+        return f"imglf:{parts.path}"
+    return urlunsplit(('https' if parts.scheme.lower() in ('http', 'https') else parts.scheme.lower(),
+                       parts.netloc.lower(), parts.path, '', ''))
+
+
+def is_thumbnail(url):
+    return bool(_THUMBNAIL_SIZE.search(url))
+
+
+def unique_image_urls(img_urls, skip_thumbnails=True):
+    """过滤缩略图，按规范化键去重（保持首次出现的顺序），返回原图链接列表"""
+    seen = set()
+    result = []
+    for img_url in img_urls:
+        if skip_thumbnails and is_thumbnail(img_url):
+            continue
+        key = image_key(img_url)
+        if key in seen:
+            continue
+        seen.add(key)
+        result.append(canonical_image_url(img_url))
+    return result
@@ -0,0 +1,1117 @@
+# coding:utf-8
+"""
+Lofter 爬取任务：单篇图片 / 文章、作者图片 / 文章、喜欢 / 推荐 / Tag
+"""
+
+import os
+import time
+import threading
+import queue
+import re
+import requests
+from dwr_parser import parse_dwr
+from converters import ARCHIVE_POST_FIELDS, dwr_page_meta, dwr_page_posts, parse_fav_page
+import cpu_pool
+from document import Document, Chapter
+from exporters import render_txt, document_digest
+import export_manifest
+import blob_store
+import sync_marks
+from core import (config, task_status, add_log, _PIPELINE_DONE, add_to_history, clear_checkpoint,
+                  export_queue, filter_lofter_image_urls, index_saved_file, iter_pipeline_queue,
+                  load_checkpoint, lofter_limiter, lofter_post_limiter, sanitize_filename, save_checkpoint,
+                  save_image, set_task_error, start_pipeline_producer)
+
+# 喜欢/推荐/Tag 流水线：待解析页队列、待保存博客队列上限与保存线程数
+LST_PAGE_QUEUE_SIZE = 2
+LST_BLOG_QUEUE_SIZE = 50
+LST_SAVE_WORKERS = 4
+
+# 作者归档（ArchiveBean）每页条数；归档记录中文字博客的 type
+ARCHIVE_QUERY_NUM = 50
+ARCHIVE_TYPE_TEXT = '1'
+# 作者文章流水线：待抓取文章队列上限与抓取线程数
+AUTHOR_TXT_QUEUE_SIZE = 100
+AUTHOR_TXT_WORKERS = 4
+
+
+def fetch_author_info(author_url, cookies):
+    """从作者主页 /view 获取 (author_id, 作者名, 作者域名)"""
+    import useragentutil
+    from lxml.html import etree
+
+    author_view_html = requests.get(author_url + "view", headers=useragentutil.get_headers(),
+                                    cookies=cookies).content.decode("utf-8")
+    author_page_parse = etree.HTML(author_view_html)
+    author_id = author_page_parse.xpath("//body//iframe[@id='control_frame']/@src")[0].split("blogId=")[1]
+    author_name = author_page_parse.xpath("//title//text()")[0]
+    author_ip = re.search(r"http[s]*://(.*).lofter.com/", author_url).group(1)
+    return author_id, author_name, author_ip
+
+
+def iter_archive_pages(author_url, author_id, cookies, before=0, query_num=ARCHIVE_QUERY_NUM):
+    """按时间倒序翻作者归档页（ArchiveBean.getArchivePostByTime）
+
+    每页产出 (归档记录列表, 下一页游标)，最后一页的游标为 None；before 为 0 时从最新一篇开始，
+    否则从该时间戳之前继续（用于断点续爬）
+    """
+    archive_url = author_url + "dwr/call/plaincall/ArchiveBean.getArchivePostByTime.dwr"
+    data = {
+        'callCount': '1',
+        'scriptSessionId': '${scriptSessionId}187',
+        'c0-scriptName': 'ArchiveBean',
+        'c0-methodName': 'getArchivePostByTime',
+        'c0-id': '0',
+        'c0-param0': f'string:{author_id}',
+        'c0-param1': 'string:',
+        'c0-param2': f'number:{before}',
+        'c0-param3': f'number:{query_num}',
+        'batchId': '0',
+    }
+    header = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+        'Content-Type': 'text/plain',
+        'Referer': author_url,
+        'Host': 'www.lofter.com',
+    }
+    while True:
+        lofter_limiter.wait()
+        response = requests.post(archive_url, data=data, headers=header, cookies=cookies)
+        # 每条归档记录以 permalink 字段为标志
+        records = parse_dwr(response.content.decode("utf-8")).records("permalink", ARCHIVE_POST_FIELDS)
+
+        next_cursor = None
+        if len(records) >= query_num:
+            try:
+                next_cursor = int(records[-1]["time"])
+            except Exception:
+                pass
+        yield records, next_cursor
+        if next_cursor is None:
+            return
+        data['c0-param2'] = f'number:{next_cursor}'
+
+
+def run_single_img_task(params):
+    """运行单篇图片爬取任务 - 真正调用 l8_blogs_img.py"""
+    import useragentutil
+    from lxml.html import etree
+
+    urls = params.get('urls', [])
+    if not urls:
+        add_log('❌ 没有提供链接')
+        return
+
+    add_log(f"🚀 开始单篇图片爬取，共 {len(urls)} 个链接")
+    
+    login_key = config['login_key']
+    login_auth = config['login_auth']
+    
+    # 确保目录存在
+    save_root = config.get('save_path', './dir')
+    dir_path = os.path.join(save_root, "img/this")
+    if not os.path.exists(dir_path):
+        os.makedirs(dir_path)
+    
+    all_imgs_info = []
+    
+    # 解析每个博客
+    for idx, blog_url in enumerate(urls):
+        blog_url = blog_url.strip()
+        if not blog_url:
+            continue
+            
+        task_status['progress'] = int((idx / len(urls)) * 50)
+        add_log(f"📖 [{idx+1}/{len(urls)}] 解析博客: {blog_url}")
+        
+        try:
+            # 获取博客页面
+            content = requests.get(blog_url, headers=useragentutil.get_headers(),
+                                   cookies={login_key: login_auth}).content.decode("utf-8")
+            
+            # 获取作者信息
+            author_view_url = blog_url.split("/post")[0] + "/view"
+            author_view_html = requests.get(author_view_url, headers=useragentutil.get_headers(),
+                                            cookies={login_key: login_auth}).content.decode("utf-8")
+            author_view_parse = etree.HTML(author_view_html)
+            
+            try:
+                author_name = author_view_parse.xpath("//h1/a/text()")[0]
+            except Exception:
+                author_name = "未知作者"
+            
+            author_ip = re.search(r"http(s)*://(.*).lofter.com/", blog_url).group(2)
+            
+            # 获取发表时间
+            re_date = re.search(r"\d{4}[.\\\/-]\d{2}[.\\\/-]\d{2}", content)
+            if re_date:
+                public_time = re_date.group(0).replace("\\", "-").replace(".", "-").replace("/", "-")
+            else:
+                public_time = time.strftime("%Y-%m-%d")
+            
+            # 匹配图片链接
+            imgs_url = re.findall(r'"(http[s]{0,1}://imglf\d{0,1}.lf\d*.[0-9]{0,3}.net.*?)"', content)
+
+            # 过滤图片
+            filtered_imgs = filter_lofter_image_urls(imgs_url)
+            
+            add_log(f"   找到 {len(filtered_imgs)} 张图片")
+            
+            # 整理图片信息
+            for img_idx, img_url in enumerate(filtered_imgs):
+                is_gif = "gif" in img_url
+                is_png = "png" in img_url
+                if is_gif:
+                    img_type = "gif"
+                elif is_png:
+                    img_type = "png"
+                else:
+                    img_type = "jpg"
+                
+                author_name_safe = sanitize_filename(author_name)
+
+                pic_name = f"{author_name_safe}[{author_ip}] {public_time}({img_idx+1}).{img_type}"
+                all_imgs_info.append({
+                    "img_url": img_url,
+                    "pic_name": pic_name,
+                    "referer": blog_url.split("post")[0]
+                })
+                
+        except Exception as e:
+            add_log(f"   ⚠️ 解析失败: {str(e)}")
+            continue
+    
+    add_log(f"📷 共获取到 {len(all_imgs_info)} 张图片，开始下载...")
+    
+    # 下载图片
+    job_images = blob_store.JobImages()
+    for idx, img_info in enumerate(all_imgs_info):
+        task_status['progress'] = 50 + int((idx / len(all_imgs_info)) * 50)
+        
+        pic_url = img_info["img_url"]
+        pic_name = img_info["pic_name"]
+        img_path = os.path.join(dir_path, pic_name)
+        
+        try:
+            if save_image(pic_url, img_path, img_info.get("referer", ""), job_images):
+                add_log(f"   💾 [{idx+1}/{len(all_imgs_info)}] 已保存: {pic_name}")
+            else:
+                add_log(f"   ♻️ [{idx+1}/{len(all_imgs_info)}] 已有相同图片，直接链接: {pic_name}")
+
+        except Exception as e:
+            add_log(f"   ⚠️ 下载失败: {pic_name} - {str(e)}")
+
+        if idx % 5 == 0:
+            time.sleep(0.5)  # 防止请求过快
+
+    # 记录到下载历史（按博客URL去重）
+    if all_imgs_info:
+        add_to_history('image', urls[0], f'{len(all_imgs_info)}张图片', '批量下载', dir_path, 'lofter')
+
+    add_log(f"✅ 图片保存完成！共保存 {len(all_imgs_info)} 张图片到 {dir_path}")
+    if job_images.summary():
+        add_log(f"   {job_images.summary()}")
+
+
+def run_single_txt_task(params):
+    """运行单篇文章爬取任务 - 真正调用 l10_blogs_txt.py"""
+    import useragentutil
+    from lxml.html import etree
+    from converters import extract_lofter_article
+
+    urls = params.get('urls', [])
+    if not urls:
+        add_log('❌ 没有提供链接')
+        return
+
+    add_log(f"🚀 开始单篇文章爬取，共 {len(urls)} 个链接")
+    
+    login_key = config['login_key']
+    login_auth = config['login_auth']
+    
+    # 确保目录存在
+    save_root = config.get('save_path', './dir')
+    dir_path = os.path.join(save_root, "article/this")
+    if not os.path.exists(dir_path):
+        os.makedirs(dir_path)
+    
+    saved_count = 0
+    
+    for idx, blog_url in enumerate(urls):
+        blog_url = blog_url.strip()
+        if not blog_url:
+            continue
+            
+        task_status['progress'] = int((idx / len(urls)) * 100)
+        add_log(f"📖 [{idx+1}/{len(urls)}] 解析博客: {blog_url}")
+        
+        try:
+            # 获取博客页面
+            blog_html = requests.get(blog_url, headers=useragentutil.get_headers(),
+                                     cookies={login_key: login_auth}).content.decode("utf-8")
+            
+            # 获取作者信息
+            author_view_url = blog_url.split("/post")[0] + "/view"
+            author_view_html = requests.get(author_view_url, headers=useragentutil.get_headers(),
+                                            cookies={login_key: login_auth}).content.decode("utf-8")
+            author_view_parse = etree.HTML(author_view_html)
+            
+            try:
+                author_name = author_view_parse.xpath("//h1/a/text()")[0]
+            except Exception:
+                author_name = "未知作者"
+            
+            author_ip = re.search(r"http(s)*://(.*).lofter.com/", blog_url).group(2)
+            
+            # 获取发表时间
+            re_date = re.search(r"\d{4}[.\\\/-]\d{2}[.\\\/-]\d{2}", blog_html)
+            if re_date:
+                public_time = re_date.group(0).replace("\\", "-").replace(".", "-").replace("/", "-")
+            else:
+                public_time = time.strftime("%Y-%m-%d")
+            
+            # 标题和正文提取（lxml 解析 + html2text 兜底）放到进程池执行
+            title, content_text = cpu_pool.run(extract_lofter_article, blog_html)
+
+            # 构建文章
+            article_head = f"{title if title else '无标题'} by {author_name}[{author_ip}]\n发表时间：{public_time}\n原文链接：{blog_url}"
+            article = article_head + "\n\n" + "="*50 + "\n\n" + content_text
+            
+            # 生成文件名
+            if title:
+                file_name = f"{title} by {author_name}.txt"
+            else:
+                file_name = f"{author_name} {public_time}.txt"
+            
+            # 清理文件名中的非法字符
+            file_name = sanitize_filename(file_name)
+            
+            # 保存文件
+            file_path = os.path.join(dir_path, file_name)
+            with open(file_path, "w", encoding="utf-8") as f:
+                f.write(article)
+            index_saved_file(file_path)
+            
+            saved_count += 1
+            add_log(f"   💾 已保存: {file_name}")
+            add_to_history('article', blog_url, title or f'{author_name} {public_time}', author_name, file_path, 'lofter')
+
+        except Exception as e:
+            add_log(f"   ⚠️ 保存失败: {str(e)}")
+            continue
+
+        time.sleep(0.5)  # 防止请求过快
+
+    add_log(f"✅ 文章保存完成！共保存 {saved_count} 篇文章到 {dir_path}")
+
+
+def run_author_img_task(params):
+    """运行作者图片爬取任务"""
+    add_log(f"🚀 开始爬取作者图片")
+    author_url = params.get('author_url', '')
+    incremental = params.get('incremental', True)  # 翻到上次已存档的内容即停止
+    
+    if not author_url:
+        add_log('❌ 请提供作者主页链接')
+        set_task_error('请提供作者主页链接')
+        return
+    
+    if not author_url.endswith('/'):
+        author_url += '/'
+    
+    add_log(f"📍 作者主页: {author_url}")
+    
+    try:
+        import useragentutil
+        
+        cookies = {config['login_key']: config['login_auth']}
+        lofter_limiter.min_interval = float(config.get('lofter_page_interval', 0.5))
+        
+        # 获取作者信息
+        try:
+            author_id, author_name, author_ip = fetch_author_info(author_url, cookies)
+            add_log(f"👤 作者: {author_name} ({author_ip})")
+        except Exception as e:
+            add_log(f"❌ 无法获取作者信息: {str(e)}")
+            set_task_error(f"无法获取作者信息: {str(e)}")
+            return
+        
+        # 获取归档页（增量同步时翻到上次已存档的博客即停止）
+        save_root = config.get('save_path', './dir')
+        sync = sync_marks.SyncRun(sync_marks.marks_for(save_root), f"author_img:{author_ip}", incremental=incremental)
+        add_log(f"📚 正在获取归档页...")
+        all_blog_info = []
+        for page_num, (new_blogs_info, _) in enumerate(iter_archive_pages(author_url, author_id, cookies), 1):
+            add_log(f"   第 {page_num} 页: {len(new_blogs_info)} 条")
+            task_status['progress'] = min(30, page_num * 5)
+            fresh = [info for info in new_blogs_info if not sync.is_archived(info.get("id"), info.get("time"))]
+            for info in fresh:
+                sync.observe(info.get("id"), info.get("time"))
+            all_blog_info += fresh
+            if len(fresh) < len(new_blogs_info):
+                add_log(f"   🔖 已翻到上次同步的位置，停止翻页")
+                break
+        
+        add_log(f"📊 共获取 {len(all_blog_info)} 条博客记录")
+        
+        # 解析博客信息，获取图片博客
+        img_blogs = []
+        for blog_info in all_blog_info:
+            try:
+                if blog_info.get("imgurl"):
+                    blog_url = author_url + "post/" + blog_info["permalink"]
+                    timestamp = blog_info["time"]
+                    dt_time = time.strftime("%Y-%m-%d", time.localtime(int(int(timestamp) / 1000)))
+                    img_blogs.append({"url": blog_url, "time": dt_time})
+            except Exception:
+                continue
+        
+        add_log(f"🖼️ 共找到 {len(img_blogs)} 篇图片博客")
+        
+        if not img_blogs:
+            sync.commit()
+            add_log("✅ 没有新的图片博客" if sync.active else "⚠️ 没有找到图片博客")
+            return
+        
+        # 创建保存目录
+        author_name_safe = sanitize_filename(author_name)
+        dir_path = os.path.join(save_root, f"img/{author_name_safe}[{author_ip}]")
+        if not os.path.exists(dir_path):
+            os.makedirs(dir_path)
+        
+        # 下载图片
+        total_saved = 0
+        failed_blogs = 0
+        job_images = blob_store.JobImages()
+        for idx, blog in enumerate(img_blogs):
+            task_status['progress'] = 30 + int((idx / len(img_blogs)) * 70)
+            
+            try:
+                blog_html = requests.get(blog["url"], headers=useragentutil.get_headers(),
+                                         cookies=cookies).content.decode("utf-8")
+                
+                imgs_url = re.findall(r'"(http[s]{0,1}://imglf\d{0,1}.lf\d*.[0-9]{0,3}.net.*?)"', blog_html)
+
+                # 过滤
+                filtered_imgs = filter_lofter_image_urls(imgs_url)
+                
+                for img_idx, img_url in enumerate(filtered_imgs):
+                    is_gif = "gif" in img_url
+                    is_png = "png" in img_url
+                    img_type = "gif" if is_gif else ("png" if is_png else "jpg")
+                    
+                    pic_name = f"{author_name_safe}[{author_ip}] {blog['time']}({img_idx+1}).{img_type}"
+                    img_path = os.path.join(dir_path, pic_name)
+                    
+                    save_image(img_url, img_path, author_url, job_images)
+                    total_saved += 1
+                
+                if idx % 10 == 0:
+                    add_log(f"   📥 进度: {idx+1}/{len(img_blogs)} 博客, 已保存 {total_saved} 张图片")
+                    
+            except Exception as e:
+                add_log(f"   ⚠️ 处理博客失败: {blog['url']} - {str(e)}")
+                failed_blogs += 1
+                continue
+            
+            time.sleep(0.3)
+        
+        # 全部处理完且没有失败才更新同步标记，中途停止或有失败的下次仍完整翻到上次的位置
+        if failed_blogs:
+            add_log(f"⚠️ {failed_blogs} 篇博客处理失败，未更新同步标记，下次运行将重试")
+            set_task_error(f"{failed_blogs} 篇博客处理失败")
+        elif task_status['running']:
+            sync.commit()
+        
+        # 记录到下载历史
+        if total_saved > 0:
+            add_to_history('image', author_url, f'{author_name} {total_saved}张图片', author_name, dir_path, 'lofter')
+
+        add_log(f"✅ 完成！共保存 {total_saved} 张图片到 {dir_path}")
+        if job_images.summary():
+            add_log(f"   {job_images.summary()}")
+        
+    except Exception as e:
+        import traceback
+        add_log(f"❌ 爬取失败: {str(e)}")
+        set_task_error(f"爬取失败: {str(e)}")
+        add_log(traceback.format_exc())
+
+
+def run_author_txt_task(params):
+    """运行作者文章爬取任务：翻归档页找出文字博客，多线程抓取正文并保存为 TXT（可选 PDF / EPUB）"""
+    import useragentutil
+    from converters import extract_lofter_article
+
+    author_url = params.get('author_url', '')
+    export_pdf = params.get('export_pdf', False)  # 是否导出PDF
+    export_epub = params.get('export_epub', False)  # 是否导出EPUB
+    pdf_backend = params.get('pdf_backend') or config.get('pdf_backend', 'xhtml2pdf')  # PDF 后端
+    skip_existing = params.get('skip_existing', True)  # 已保存过的文章不再请求
+    incremental = params.get('incremental', True)  # 翻到上次已存档的内容即停止
+    resume = params.get('resume', True)  # 是否从断点继续
+
+    if not author_url:
+        add_log('❌ 请提供作者主页链接')
+        set_task_error('请提供作者主页链接')
+        return
+    if not author_url.endswith('/'):
+        author_url += '/'
+
+    add_log(f"🚀 开始爬取作者文章")
+    add_log(f"📍 作者主页: {author_url}")
+
+    cookies = {config['login_key']: config['login_auth']}
+    lofter_limiter.min_interval = float(config.get('lofter_page_interval', 0.5))
+    lofter_post_limiter.min_interval = float(config.get('lofter_post_interval', 0.2))
+    formats = [fmt for fmt, wanted in (('pdf', export_pdf), ('epub', export_epub)) if wanted]
+
+    try:
+        try:
+            author_id, author_name, author_ip = fetch_author_info(author_url, cookies)
+            add_log(f"👤 作者: {author_name} ({author_ip})")
+        except Exception as e:
+            add_log(f"❌ 无法获取作者信息: {str(e)}")
+            set_task_error(f"无法获取作者信息: {str(e)}")
+            return
+
+        save_root = config.get('save_path', './dir')
+        dir_path = os.path.join(save_root, f"article/{sanitize_filename(author_name)}[{author_ip}]")
+        os.makedirs(dir_path, exist_ok=True)
+
+        def iter_text_posts():
+            """翻页阶段：逐页取归档记录，产出其中的文字博客，并登记本页用于断点"""
+            page_no = 0
+            for records, next_cursor in iter_archive_pages(author_url, author_id, cookies, before=stats['before']):
+                if not task_status['running']:
+                    break
+                page_no += 1
+                fresh = [record for record in records if not sync.is_archived(record.get("id"), record.get("time"))]
+                posts = []
+                for record in fresh:
+                    sync.observe(record.get("id"), record.get("time"))
+                    if str(record.get("type")) != ARCHIVE_TYPE_TEXT:
+                        continue
+                    try:
+                        public_time = time.strftime("%Y-%m-%d", time.localtime(int(record["time"]) / 1000))
+                    except Exception:
+                        public_time = time.strftime("%Y-%m-%d")
+                    posts.append({"url": author_url + "post/" + record["permalink"],
+                                  "public_time": public_time, "page_no": page_no})
+                stats['found'] += len(posts)
+                add_log(f"   第 {page_no} 页: {len(records)} 条记录，其中文章 {len(posts)} 篇")
+
+                with checkpoint_lock:
+                    pending_pages[page_no] = [len(posts), {
+                        'url': author_url,
+                        'before': next_cursor,
+                        'found': stats['found'],
+                        'sync': sync.state(),
+                    }]
+                if not posts:
+                    page_item_done(page_no, 0)
+                yield from posts
+
+                if len(fresh) < len(records):
+                    add_log(f"   🔖 已翻到上次同步的位置，停止翻页")
+                    stats['complete'] = True
+                    break
+                if next_cursor is None:
+                    stats['complete'] = True
+
+        def page_item_done(page_no, count=1):
+            """某页的一篇文章处理完毕；当某页及之前所有页都处理完时推进断点"""
+            with checkpoint_lock:
+                pending_pages[page_no][0] -= count
+                while pending_pages:
+                    first_page = min(pending_pages)
+                    if pending_pages[first_page][0] > 0:
+                        break
+                    save_checkpoint(checkpoint_name, pending_pages.pop(first_page)[1])
+
+        def enqueue_exports(txt_path, doc_digest, title):
+            """把过期的 PDF / EPUB 交给后台导出队列（已是最新的格式不再渲染）"""
+            if formats:
+                export_queue.enqueue(txt_path, export_queue.stale_formats(txt_path, formats, doc_digest, pdf_backend),
+                                     title=title, pdf_backend=pdf_backend)
+
+        def save_post(post):
+            """抓取一篇文章并保存，返回 saved / unchanged / skipped"""
+            if skip_existing:
+                saved = export_manifest.saved_entry(dir_path, post["url"])
+                if saved:
+                    # 已保存过：不再请求原文，只补上缺少的导出格式
+                    txt_path, doc_digest = saved
+                    if export_queue.has_source(txt_path):
+                        enqueue_exports(txt_path, doc_digest, os.path.splitext(os.path.basename(txt_path))[0])
+                    return 'skipped'
+
+            lofter_post_limiter.wait()
+            blog_html = requests.get(post["url"], headers=useragentutil.get_headers(),
+                                     cookies=cookies, timeout=30).content.decode("utf-8")
+            # 标题和正文提取放到进程池执行，抓取线程继续请求下一篇
+            title, content_text = cpu_pool.run(extract_lofter_article, blog_html)
+
+            file_name = sanitize_filename(f"{title}.txt" if title else f"{post['public_time']}.txt")
+            doc = Document('lofter', title, author_name, post["url"], [Chapter(None, [content_text])],
+                           author_ip=author_ip, public_time=post["public_time"])
+            doc_digest = document_digest(doc)
+
+            # 同一篇文章写回原来的文件，内容未变化时跳过（多个抓取线程之间由清单加锁选名）
+            txt_path = export_manifest.claim_path(dir_path, file_name, post["url"])
+            unchanged = export_manifest.is_current(txt_path, doc_digest)
+            if not unchanged:
+                with open(txt_path, "w", encoding="utf-8") as f:
+                    f.write(render_txt(doc))
+                export_manifest.record(txt_path, doc_digest, post["url"])
+                index_saved_file(txt_path)
+                add_to_history('article', post["url"], title or '无标题', author_name, txt_path, 'lofter')
+
+            if not unchanged or not export_queue.has_source(txt_path):
+                export_queue.save_source(txt_path, doc)
+            enqueue_exports(txt_path, doc_digest, title or '无标题')
+            return 'unchanged' if unchanged else 'saved'
+
+        def fetch_worker():
+            """抓取线程：从文章队列取出并保存，直到收到结束标记"""
+            while True:
+                post = post_queue.get()
+                if post is _PIPELINE_DONE:
+                    # 把结束标记传给其余抓取线程
+                    post_queue.put(_PIPELINE_DONE)
+                    return
+                # 任务被停止后不再处理，未处理的文章所在页不推进断点
+                if stop_event.is_set() or not task_status['running']:
+                    continue
+                try:
+                    result = save_post(post)
+                except Exception as e:
+                    result = 'failed'
+                    add_log(f"   ⚠️ 保存失败: {post['url']} - {str(e)}")
+                # 保存失败的文章所在页不推进断点，下次从这一页重试
+                if result != 'failed':
+                    page_item_done(post["page_no"])
+                with counter_lock:
+                    counts[result] += 1
+                    done = sum(counts.values())
+                task_status['progress'] = min(99, int(done / max(1, stats['found']) * 100))
+                if done % 20 == 1:
+                    add_log(f"   进度: 已处理 {done}/{stats['found']} 篇, 新保存 {counts['saved']} 篇")
+
+        # 两段流水线：翻页线程按页产出文字博客 → 多个抓取线程并发请求原文并保存，
+        # 中间用有界队列形成背压，首页返回后即开始抓取
+        stats = {'before': 0, 'found': 0, 'complete': False}
+        pending_pages = {}
+        checkpoint_lock = threading.Lock()
+        checkpoint_name = f"author_txt_{author_url}"
+
+        # 断点续爬：从上次已全部处理的页之后继续翻页
+        checkpoint = load_checkpoint(checkpoint_name) if resume else None
+        if checkpoint and checkpoint.get('before'):
+            stats['before'] = checkpoint['before']
+            stats['found'] = checkpoint['found']
+            add_log(f"⏩ 从断点继续：已处理 {stats['found']} 篇")
+        else:
+            checkpoint = None
+
+        # 增量同步：上次完整同步之后的博客才需要处理，本次见到的内容随断点保存
+        sync = sync_marks.SyncRun(sync_marks.marks_for(save_root), f"author_txt:{author_ip}",
+                                  incremental=incremental, state=checkpoint and checkpoint.get('sync'))
+
+        counts = {'saved': 0, 'unchanged': 0, 'skipped': 0, 'failed': 0}
+        counter_lock = threading.Lock()
+        stop_event = threading.Event()
+        post_queue = queue.Queue(maxsize=AUTHOR_TXT_QUEUE_SIZE)
+
+        start_pipeline_producer(iter_text_posts(), post_queue, stop_event, 'author-txt-pager')
+        workers = [threading.Thread(target=fetch_worker, name=f'author-txt-{i}', daemon=True)
+                   for i in range(AUTHOR_TXT_WORKERS)]
+        for t in workers:
+            t.start()
+        try:
+            for t in workers:
+                t.join()
+        finally:
+            stop_event.set()
+
+        if counts['failed']:
+            add_log(f"⚠️ {counts['failed']} 篇保存失败，断点停在失败的页，下次运行将重试")
+            set_task_error(f"{counts['failed']} 篇保存失败")
+        elif stats['complete'] and task_status['running']:
+            clear_checkpoint(checkpoint_name)
+            sync.commit()
+        else:
+            add_log("⏸️ 任务未完成，已保存断点，下次运行将继续")
+
+        if stats['found'] == 0:
+            add_log("✅ 没有新的文章博客" if sync.active else "⚠️ 没有找到文章博客")
+            return
+
+        add_log(f"✅ 完成！共 {stats['found']} 篇文章 → {dir_path}")
+        add_log(f"   📝 新保存: {counts['saved']} 篇")
+        if counts['unchanged']:
+            add_log(f"   ⏭️ 内容未变化、未重新保存: {counts['unchanged']} 篇")
+        if counts['skipped']:
+            add_log(f"   ⏭️ 已保存过、跳过: {counts['skipped']} 篇")
+        if counts['failed']:
+            add_log(f"   ⚠️ 保存失败: {counts['failed']} 篇")
+        if formats:
+            add_log(f"   📄 {' / '.join(fmt.upper() for fmt in formats)} 在后台导出队列中生成，进度见导出状态")
+
+    except Exception as e:
+        import traceback
+        add_log(f"❌ 爬取失败: {str(e)}")
+        set_task_error(f"爬取失败: {str(e)}")
+        add_log(traceback.format_exc())
+
+
+def run_like_share_tag_task(params):
+    """运行喜欢/推荐/Tag爬取任务"""
+    from lxml.html import etree
+    
+    url = params.get('url', '')
+    mode = params.get('mode', 'like2')  # like1, like2, share, tag
+    save_mode = params.get('save_mode', {"article": 1, "text": 1, "long article": 1, "img": 1})
+    export_pdf = params.get('export_pdf', False)  # 是否导出PDF
+    pdf_backend = params.get('pdf_backend') or config.get('pdf_backend', 'xhtml2pdf')  # PDF 后端
+    max_items = int(params.get('max_items') or 0)  # 最多获取条数，0 为不限
+    incremental = params.get('incremental', True)  # 翻到上次已存档的内容即停止
+    resume = params.get('resume', True)  # 是否从断点继续
+    
+    if not url:
+        add_log('❌ 请提供链接地址')
+        set_task_error('请提供链接地址')
+        return
+    
+    add_log(f"🚀 开始 {mode} 模式爬取任务")
+    add_log(f"📍 URL: {url}")
+    
+    login_key = config['login_key']
+    login_auth = config['login_auth']
+    lofter_limiter.min_interval = float(config.get('lofter_page_interval', 0.5))
+    
+    try:
+        # 获取登录session
+        add_log("🔐 正在建立登录会话...")
+        
+        headers = {
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+            "Host": "www.lofter.com",
+        }
+        
+        session = requests.session()
+        session.headers = headers
+        session.cookies.set(login_key, login_auth)
+        
+        # 根据模式确定请求URL和参数
+        if mode == "like2":
+            requests_url = "http://www.lofter.com/dwr/call/plaincall/PostBean.getFavTrackItem.dwr"
+            headers["Referer"] = "http://www.lofter.com/like"
+        elif mode == "like1":
+            requests_url = "https://www.lofter.com/dwr/call/plaincall/BlogBean.queryLikePosts.dwr"
+            userName = re.search(r"http[s]{0,1}://(.*?).lofter.com/", url).group(1)
+            headers["Referer"] = "https://www.lofter.com/favblog/" + userName
+        elif mode == "share":
+            requests_url = "https://www.lofter.com/dwr/call/plaincall/BlogBean.querySharePosts.dwr"
+            userName = re.search(r"http[s]{0,1}://(.*?).lofter.com/", url).group(1)
+            headers["Referer"] = "https://www.lofter.com/shareblog/" + userName
+        elif mode == "tag":
+            requests_url = "http://www.lofter.com/dwr/call/plaincall/TagBean.search.dwr"
+            headers["Referer"] = url
+        else:
+            add_log(f"❌ 不支持的模式: {mode}")
+            set_task_error(f"不支持的模式: {mode}")
+            return
+        
+        session.headers = headers
+        
+        # 获取用户ID (like1, share 模式需要)
+        userId = ""
+        if mode in ["like1", "share"]:
+            add_log("📖 获取用户信息...")
+            host = re.search(r"https://(.*?)/", url).group(1)
+            session.headers["Host"] = host
+            user_page = session.get(url).content.decode("utf-8")
+            user_page_parse = etree.HTML(user_page)
+            try:
+                userId = user_page_parse.xpath("//body/iframe[@id='control_frame']/@src")[0].split("blogId=")[1]
+                add_log(f"   用户ID: {userId}")
+            except Exception:
+                add_log("❌ 无法获取用户ID，请检查链接是否正确")
+                set_task_error("无法获取用户ID，请检查链接是否正确")
+                return
+            session.headers["Host"] = "www.lofter.com"
+        
+        # 构建初始请求参数
+        base_data = {
+            'callCount': '1',
+            'httpSessionId': '',
+            'scriptSessionId': '${scriptSessionId}187',
+            'c0-id': '0',
+            "batchId": "472351"
+        }
+        
+        get_num = 100
+        got_num = 0
+        
+        if mode in ["like1", "share"]:
+            sync_source = f"{mode}:{userName}"
+            data_params = {
+                'c0-scriptName': 'BlogBean',
+                "c0-methodName": "queryLikePosts" if mode == "like1" else "querySharePosts",
+                'c0-param0': 'number:' + str(userId),
+                'c0-param1': 'number:' + str(get_num),
+                'c0-param2': 'number:' + str(got_num),
+                'c0-param3': 'string:'
+            }
+        elif mode == "like2":
+            sync_source = "like2"
+            data_params = {
+                "c0-scriptName": "PostBean",
+                "c0-methodName": "getFavTrackItem",
+                "c0-param0": "number:" + str(get_num),
+                "c0-param1": "number:" + str(got_num),
+            }
+        elif mode == "tag":
+            url_search = re.search(r"http[s]{0,1}://www.lofter.com/tag/(.*?)/(.*)", url)
+            if url_search:
+                tag_name = url_search.group(1)
+                tag_type = url_search.group(2) if url_search.group(2) else "new"
+            else:
+                url_search = re.search(r"http[s]{0,1}://www.lofter.com/tag/(.*)", url)
+                tag_name = url_search.group(1) if url_search else ""
+                tag_type = "new"
+            sync_source = f"tag:{tag_name}/{tag_type}"
+            
+            data_params = {
+                'c0-scriptName': 'TagBean',
+                'c0-methodName': 'search',
+                'c0-param0': 'string:' + tag_name,
+                'c0-param1': 'number:0',
+                'c0-param2': 'string:',
+                'c0-param3': 'string:' + tag_type,
+                'c0-param4': 'boolean:false',
+                'c0-param5': 'number:0',
+                'c0-param6': 'number:' + str(get_num),
+                'c0-param7': 'number:' + str(got_num),
+                'c0-param8': 'number:' + str(int(time.time() * 1000)),
+                'batchId': '870178'
+            }
+        
+        data = {**base_data, **data_params}
+        
+        # 创建保存目录 - 按作者分类
+        save_root = config.get('save_path', './dir')
+        base_dir = os.path.join(save_root, f"{mode}_save")
+        img_base_dir = os.path.join(base_dir, "img")
+        txt_base_dir = os.path.join(base_dir, "txt")
+        os.makedirs(img_base_dir, exist_ok=True)
+        os.makedirs(txt_base_dir, exist_ok=True)
+        
+        def iter_fav_pages():
+            """翻页获取 DWR 数据，每页产出 (页号, 帖子数, 解析结果的 Future, 已存档的帖子 ID)
+
+            整页解析（字符串解码 + html2text 转换）提交到进程池，翻页线程只做
+            计数、取时间戳和帖子 ID 这样的轻量扫描，不等解析完成就继续请求下一页；
+            增量同步时本页出现上次已存档的帖子就不再翻页
+            """
+            nonlocal got_num
+            add_log("📥 开始获取数据...")
+            page_no = 0
+            while True:
+                if not task_status['running']:
+                    break
+                lofter_limiter.wait()
+                add_log(f"   请求 {got_num}-{got_num + get_num}...")
+                
+                response = session.post(requests_url, data=data)
+                content = response.content.decode("utf-8")
+                
+                # 每条帖子记录以 activityTags 字段为标志
+                page_count, last_timestamp = dwr_page_meta(content)
+                if max_items and page_count > max_items - stats['fetched']:
+                    page_count = max_items - stats['fetched']
+                    stats['limited'] = True
+                got_num += get_num
+                
+                add_log(f"   实际返回 {page_count} 条")
+                
+                if page_count <= 0:
+                    add_log("   已到达最后一页")
+                    stats['complete'] = True
+                    break
+                
+                stats['fetched'] += page_count
+                page_future = cpu_pool.submit(parse_fav_page, content, page_count)
+                
+                posts = dwr_page_posts(content)[:page_count]
+                archived = {post_id for post_id, publish_time in posts if sync.is_archived(post_id, publish_time)}
+                for post_id, publish_time in posts:
+                    if post_id not in archived:
+                        sync.observe(post_id, publish_time)
+                
+                # 更新请求参数（下一页），并登记本页用于断点
+                has_next = True
+                if mode in ["like1", "share"]:
+                    data["c0-param1"] = 'number:' + str(get_num)
+                    data["c0-param2"] = 'number:' + str(got_num)
+                elif mode == "like2":
+                    data["c0-param0"] = 'number:' + str(get_num)
+                    data["c0-param1"] = 'number:' + str(got_num)
+                elif mode == "tag":
+                    if last_timestamp is not None:
+                        data["c0-param6"] = 'number:' + str(get_num)
+                        data["c0-param7"] = 'number:' + str(got_num)
+                        data["c0-param8"] = 'number:' + str(last_timestamp)
+                    else:
+                        has_next = False
+                
+                page_no += 1
+                with checkpoint_lock:
+                    pending_pages[page_no] = [page_count, {
+                        'mode': mode,
+                        'url': url,
+                        'got_num': got_num,
+                        'fetched': stats['fetched'],
+                        'data': dict(data),
+                        'sync': sync.state(),
+                    }]
+                
+                yield page_no, page_count, page_future, archived
+                
+                if archived:
+                    add_log(f"   🔖 已翻到上次同步的位置（本页 {len(archived)} 条已存档），停止翻页")
+                    stats['complete'] = True
+                    break
+                if max_items and stats['fetched'] >= max_items:
+                    add_log(f"   已达到 {max_items} 条上限")
+                    stats['complete'] = True
+                    stats['limited'] = True
+                    break
+                if not has_next:
+                    stats['complete'] = True
+                    break
+        
+        def page_item_done(page_no):
+            """某页的一条记录处理完毕；当某页及之前所有页都处理完时推进断点"""
+            with checkpoint_lock:
+                pending_pages[page_no][0] -= 1
+                while pending_pages:
+                    first_page = min(pending_pages)
+                    if pending_pages[first_page][0] > 0:
+                        break
+                    save_checkpoint(checkpoint_name, pending_pages.pop(first_page)[1])
+        
+        def iter_blogs(page_queue):
+            """解析阶段：按页序等待进程池的解析结果，逐条产出博客信息"""
+            nonlocal failed_blogs
+            for page_no, page_count, page_future, archived in iter_pipeline_queue(page_queue):
+                try:
+                    page = page_future.result()[:page_count]
+                except Exception as e:
+                    # 整页按失败处理，不推进断点，下次从这一页重试
+                    add_log(f"   ⚠️ 第 {page_no} 页解析失败: {str(e)}")
+                    with counter_lock:
+                        failed_blogs += page_count
+                    continue
+                # 解析出的条数少于预计时，补齐空位以便断点正常推进
+                page += [None] * (page_count - len(page))
+                for blog in page:
+                    if blog and blog['post_id'] not in archived:
+                        blog['page_no'] = page_no
+                        stats['parsed'] += 1
+                        yield blog
+                    else:
+                        page_item_done(page_no)
+        
+        def save_blog(blog):
+            """保存阶段：下载图片、写入文章"""
+            nonlocal saved_img, saved_txt, unchanged_txt
+            
+            # 生成作者目录名
+            author_safe = sanitize_filename(blog["author_name"])
+            author_folder = f"{author_safe}[{blog['author_ip']}]"
+            img_errors = []
+            
+            # 保存图片 - 按作者分类
+            if blog["has_img"] and save_mode.get("img"):
+                # 创建作者专属图片目录
+                author_img_dir = os.path.join(img_base_dir, author_folder)
+                os.makedirs(author_img_dir, exist_ok=True)
+                
+                for img_idx, img_url in enumerate(blog["img_urls"]):
+                    try:
+                        # 确定图片类型
+                        img_type = "gif" if "gif" in img_url else ("png" if "png" in img_url else "jpg")
+                        
+                        pic_name = f"{blog['public_time']}({img_idx+1}).{img_type}"
+                        img_path = os.path.join(author_img_dir, pic_name)
+                        
+                        save_image(img_url, img_path, blog["url"].split("post")[0], job_images)
+                        
+                        with counter_lock:
+                            saved_img += 1
+                    except Exception as e:
+                        # 其余图片和文章照常保存，最后整篇按失败处理
+                        img_errors.append(e)
+                        continue
+            
+            # 保存文章/文本 - 按作者分类
+            if (blog["title"] and save_mode.get("article")) or (not blog["title"] and save_mode.get("text")):
+                # 创建作者专属文章目录
+                author_txt_dir = os.path.join(txt_base_dir, author_folder)
+                os.makedirs(author_txt_dir, exist_ok=True)
+                
+                if blog["title"]:
+                    title_safe = sanitize_filename(blog["title"])
+                    file_name = f"{title_safe}.txt"
+                else:
+                    file_name = f"{blog['public_time']}.txt"
+                
+                doc = Document('lofter', blog['title'], blog['author_name'], blog['url'],
+                               [Chapter(None, [blog['content']])],
+                               author_ip=blog['author_ip'], public_time=blog['public_time'])
+                doc_digest = document_digest(doc)
+                
+                # 同一篇文章写回原来的文件，内容未变化时跳过（多个保存线程之间由清单加锁选名）
+                txt_path = export_manifest.claim_path(author_txt_dir, file_name, blog['url'])
+                unchanged = export_manifest.is_current(txt_path, doc_digest)
+                if not unchanged:
+                    with open(txt_path, "w", encoding="utf-8") as f:
+                        f.write(render_txt(doc))
+                    export_manifest.record(txt_path, doc_digest, blog['url'])
+                    index_saved_file(txt_path)
+                
+                # 保存源文件，PDF 交给后台导出队列渲染（已是最新的不再渲染）
+                if not unchanged or not export_queue.has_source(txt_path):
+                    export_queue.save_source(txt_path, doc)
+                if export_pdf:
+                    export_queue.enqueue(txt_path, export_queue.stale_formats(txt_path, ['pdf'], doc_digest, pdf_backend),
+                                         title=blog['title'] or '无标题', pdf_backend=pdf_backend)
+                
+                if unchanged:
+                    with counter_lock:
+                        unchanged_txt += 1
+                else:
+                    with counter_lock:
+                        saved_txt += 1
+                    add_to_history('article', blog['url'], blog['title'] or '无标题', blog['author_name'], txt_path, 'lofter')
+            
+            # 记录图片博客到历史（仅当没有文章记录时）
+            if blog["has_img"] and save_mode.get("img") and not ((blog["title"] and save_mode.get("article")) or (not blog["title"] and save_mode.get("text"))):
+                add_to_history('image', blog['url'], f'{blog["author_name"]} {len(blog["img_urls"])}张图片', blog['author_name'], author_img_dir, 'lofter')
+            
+            if img_errors:
+                raise RuntimeError(f"{len(img_errors)} 张图片下载失败: {img_errors[0]}")
+        
+        def save_worker():
+            """保存线程：从博客队列取出并保存，直到收到结束标记"""
+            nonlocal processed_blogs, failed_blogs
+            while True:
+                blog = blog_queue.get()
+                if blog is _PIPELINE_DONE:
+                    # 把结束标记传给其余保存线程
+                    blog_queue.put(_PIPELINE_DONE)
+                    return
+                # 任务被停止后不再处理，未处理的博客所在页不推进断点
+                if stop_event.is_set() or not task_status['running']:
+                    continue
+                try:
+                    save_blog(blog)
+                except Exception as e:
+                    add_log(f"   ⚠️ 保存失败: {blog['url']} - {str(e)}")
+                    with counter_lock:
+                        failed_blogs += 1
+                else:
+                    # 保存失败的博客所在页不推进断点，下次从这一页重试
+                    page_item_done(blog['page_no'])
+                with counter_lock:
+                    processed_blogs += 1
+                    done = processed_blogs
+                task_status['progress'] = min(99, int(done / max(1, stats['parsed']) * 100))
+                if done % 20 == 1:
+                    add_log(f"   进度: 已处理 {done}/{stats['parsed']} 条, 已保存图片 {saved_img} 张, 文章 {saved_txt} 篇")
+                time.sleep(0.1)
+        
+        # 三段流水线：翻页 → 解析 → 保存，各阶段之间用有界队列连接形成背压，
+        # 内存占用与总条数无关，且首页返回后即开始保存
+        stats = {'fetched': 0, 'parsed': 0, 'complete': False, 'limited': False}
+        pending_pages = {}
+        checkpoint_lock = threading.Lock()
+        checkpoint_name = f"{mode}_{url}"
+        
+        # 断点续爬：从上次已全部保存的位置继续翻页
+        checkpoint = load_checkpoint(checkpoint_name) if resume else None
+        if checkpoint:
+            data.update(checkpoint['data'])
+            got_num = checkpoint['got_num']
+            stats['fetched'] = checkpoint['fetched']
+            add_log(f"⏩ 从断点继续：已处理 {stats['fetched']} 条")
+        
+        # 增量同步：Tag 只有按最新排序时按时间排列，排行榜排序每次完整翻页
+        sync_ordered = mode != "tag" or tag_type == "new"
+        sync = sync_marks.SyncRun(sync_marks.marks_for(save_root), sync_source, by_time=(mode == "tag"),
+                                  incremental=incremental and sync_ordered,
+                                  state=checkpoint.get('sync') if checkpoint else None)
+        if sync.active:
+            add_log("🔖 增量同步：翻到上次已存档的内容即停止")
+        
+        saved_img = 0
+        job_images = blob_store.JobImages()
+        saved_txt = 0
+        unchanged_txt = 0
+        processed_blogs = 0
+        failed_blogs = 0
+        counter_lock = threading.Lock()
+        stop_event = threading.Event()
+        page_queue = queue.Queue(maxsize=LST_PAGE_QUEUE_SIZE)
+        blog_queue = queue.Queue(maxsize=LST_BLOG_QUEUE_SIZE)
+        
+        start_pipeline_producer(iter_fav_pages(), page_queue, stop_event, 'lst-fetcher')
+        start_pipeline_producer(iter_blogs(page_queue), blog_queue, stop_event, 'lst-parser')
+        
+        savers = [threading.Thread(target=save_worker, name=f'lst-saver-{i}', daemon=True)
+                  for i in range(LST_SAVE_WORKERS)]
+        for t in savers:
+            t.start()
+        try:
+            for t in savers:
+                t.join()
+        finally:
+            stop_event.set()
+        
+        add_log(f"📊 累计获取 {stats['fetched']} 条博客信息，本次有效 {stats['parsed']} 条")
+        
+        if failed_blogs:
+            add_log(f"⚠️ {failed_blogs} 条保存失败，断点停在失败的页，下次运行将重试")
+            set_task_error(f"{failed_blogs} 条保存失败")
+        elif stats['complete'] and task_status['running']:
+            clear_checkpoint(checkpoint_name)
+            # 受最大条数限制提前结束时不更新标记，避免把没有翻到的内容当作已存档
+            if sync_ordered and not stats['limited']:
+                sync.commit()
+        else:
+            add_log("⏸️ 任务未完成，已保存断点，下次运行将继续")
+        
+        if stats['fetched'] == 0:
+            add_log("⚠️ 没有获取到任何数据，请检查登录信息和链接")
+            return
+        
+        add_log(f"✅ 保存完成！（文件按作者分类存放）")
+        add_log(f"   📷 图片: {saved_img} 张 → {img_base_dir}/作者名/")
+        if job_images.summary():
+            add_log(f"   {job_images.summary()}")
+        add_log(f"   📝 文章: {saved_txt} 篇 → {txt_base_dir}/作者名/")
+        if unchanged_txt:
+            add_log(f"   ⏭️ 内容未变化、未重新保存: {unchanged_txt} 篇")
+        if failed_blogs:
+            add_log(f"   ⚠️ 保存失败: {failed_blogs} 条")
+        if export_pdf:
+            add_log(f"   📄 PDF 在后台导出队列中生成，进度见导出状态")
+        
+    except Exception as e:
+        import traceback
+        add_log(f"❌ 爬取失败: {str(e)}")
+        set_task_error(f"爬取失败: {str(e)}")
+        add_log(traceback.format_exc())
+
@@ -0,0 +1,170 @@
+# coding:utf-8
+"""
+直接用 ReportLab platypus 排版的 PDF 后端
+
+与 xhtml2pdf 后端（exporters.render_html + pdf_render.render_pdf）使用相同的封面、
+作品信息页和章节结构，但跳过 HTML 解析和 CSS 布局，直接由段落生成版面，
+长篇中文作品的导出速度明显更快。在 PDF 进程池中执行，参数是源文件路径，
+由工作进程自己读取源文件，不需要在进程间传递整篇 HTML。
+"""
+
+import datetime
+from xml.sax.saxutils import escape
+
+import exporters
+
+FONT_NAME = 'STSong-Light'
+PAGE_MARGIN_X_CM = 2
+PAGE_MARGIN_Y_CM = 2.5
+
+_styles = None
+
+
+def _get_styles():
+    """注册中文字体并创建段落样式（每个进程只做一次）"""
+    global _styles
+    if _styles is not None:
+        return _styles
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY
+    from reportlab.lib.styles import ParagraphStyle
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+    try:
+        pdfmetrics.registerFont(UnicodeCIDFont(FONT_NAME))
+    except Exception:
+        pass
+
+    # wordWrap='CJK' 允许在任意汉字之间换行
+    base = ParagraphStyle('base', fontName=FONT_NAME, fontSize=12, leading=21.6,
+                          textColor=colors.HexColor('#222222'), wordWrap='CJK')
+    _styles = {
+        'cover_title': ParagraphStyle('cover_title', base, fontSize=30, leading=39, alignment=TA_CENTER,
+                                      textColor=colors.HexColor('#2c3e50'), spaceAfter=30),
+        'cover_author': ParagraphStyle('cover_author', base, fontSize=17, leading=24, alignment=TA_CENTER,
+                                       textColor=colors.HexColor('#555555'), spaceAfter=80),
+        'cover_meta': ParagraphStyle('cover_meta', base, fontSize=11, leading=18, alignment=TA_CENTER,
+                                     textColor=colors.HexColor('#7f8c8d')),
+        'meta_title': ParagraphStyle('meta_title', base, fontSize=18, leading=24,
+                                     textColor=colors.HexColor('#8B4513'), spaceAfter=24),
+        'meta_item': ParagraphStyle('meta_item', base, fontSize=11, leading=17, spaceAfter=8,
+                                    backColor=colors.HexColor('#fafafa')),
+        'content_title': ParagraphStyle('content_title', base, fontSize=18, leading=26, alignment=TA_CENTER,
+                                        spaceBefore=30, spaceAfter=10),
+        'content_meta': ParagraphStyle('content_meta', base, fontSize=10, leading=15, alignment=TA_CENTER,
+                                       textColor=colors.HexColor('#999999'), spaceAfter=40),
+        'chapter_title': ParagraphStyle('chapter_title', base, fontSize=18, leading=26, alignment=TA_CENTER,
+                                        textColor=colors.HexColor('#2c3e50'), spaceBefore=40, spaceAfter=30),
+        'body': ParagraphStyle('body', base, alignment=TA_JUSTIFY, firstLineIndent=24, spaceAfter=12),
+    }
+    return _styles
+
+
+def _cover(doc, styles, extra_lines):
+    from reportlab.platypus import PageBreak, Paragraph, Spacer
+
+    story = [Spacer(1, 150),
+             Paragraph(escape(doc.title or '无标题'), styles['cover_title']),
+             Paragraph(f"By {escape(doc.author)}", styles['cover_author'])]
+    story.extend(Paragraph(line, styles['cover_meta']) for line in extra_lines)
+    story.append(PageBreak())
+    return story
+
+
+def build_ao3_story(doc):
+    """AO3 作品：封面、作品信息页、正文（多章节作品每章另起一页）"""
+    from reportlab.platypus import PageBreak, Paragraph
+
+    styles = _get_styles()
+    fandom = ''
+    rating = ''
+    meta_items = []
+    for meta in doc.metadata:
+        meta = meta.strip()
+        if not meta:
+            continue
+        if meta.startswith("Fandom:"):
+            fandom = meta.split(":", 1)[1].strip()
+        elif meta.startswith("Rating:"):
+            rating = meta.split(":", 1)[1].strip()
+        if ':' in meta:
+            key, value = meta.split(':', 1)
+            meta_items.append(f"<b>{escape(key.strip())}:</b> {escape(value.strip())}")
+        else:
+            meta_items.append(escape(meta))
+
+    cover_lines = [f"<i>{escape(fandom)}</i>"] if fandom else []
+    cover_lines += [f"Rating: {escape(rating or 'Not Rated')}",
+                    f"Generated by Lofter Spider<br/>{datetime.datetime.now():%Y-%m-%d}"]
+    story = _cover(doc, styles, cover_lines)
+
+    story.append(Paragraph("Work Details", styles['meta_title']))
+    story.extend(Paragraph(item, styles['meta_item']) for item in meta_items)
+    story.append(Paragraph(f"<b>Original URL:</b> {escape(doc.url)}", styles['meta_item']))
+    story.append(PageBreak())
+
+    if doc.chaptered:
+        for idx, chapter in enumerate(doc.chapters):
+            if idx > 0:
+                story.append(PageBreak())
+            story.append(Paragraph(escape(chapter.title or ''), styles['chapter_title']))
+            story.extend(Paragraph(escape(para), styles['body']) for para in chapter.paragraphs if para.strip())
+    else:
+        story.extend(Paragraph(escape(para), styles['body'])
+                     for para in doc.paragraphs() if exporters._is_body_paragraph(para))
+    return story
+
+
+def build_lofter_story(doc):
+    """Lofter 文章：封面、标题和发表信息、正文"""
+    from reportlab.platypus import Paragraph
+
+    styles = _get_styles()
+    public_time = doc.extra.get('public_time', '')
+    story = _cover(doc, styles, [
+        f"Published: {escape(public_time)}",
+        "Source: Lofter",
+        f"Generated on {datetime.datetime.now():%Y-%m-%d}",
+    ])
+    story.append(Paragraph(escape(doc.title or '无标题'), styles['content_title']))
+    story.append(Paragraph(
+        f"作者: {escape(doc.author)} [{escape(doc.extra.get('author_ip', ''))}] &nbsp;|&nbsp; "
+        f"时间: {escape(public_time)}<br/>原文: {escape(doc.url)}", styles['content_meta']))
+    for para in doc.paragraphs():
+        for line in para.split('\n'):
+            if line.strip():
+                story.append(Paragraph(escape(line), styles['body']))
+    return story
+
+
+def _draw_page_number(canvas, document):
+    from reportlab.lib.colors import HexColor
+    from reportlab.lib.units import cm
+
+    canvas.saveState()
+    canvas.setFont(FONT_NAME, 10)
+    canvas.setFillColor(HexColor('#666666'))
+    canvas.drawCentredString(document.pagesize[0] / 2, PAGE_MARGIN_Y_CM * cm / 2, str(canvas.getPageNumber()))
+    canvas.restoreState()
+
+
+def render_document_pdf(doc, pdf_path):
+    """把 Document 排版为 PDF 文件，返回 (是否成功, 提示信息)"""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import cm
+    from reportlab.platypus import SimpleDocTemplate
+
+    story = build_lofter_story(doc) if doc.kind == 'lofter' else build_ao3_story(doc)
+    template = SimpleDocTemplate(
+        pdf_path, pagesize=A4,
+        leftMargin=PAGE_MARGIN_X_CM * cm, rightMargin=PAGE_MARGIN_X_CM * cm,
+        topMargin=PAGE_MARGIN_Y_CM * cm, bottomMargin=PAGE_MARGIN_Y_CM * cm,
+        title=doc.title or '无标题', author=doc.author,
+    )
+    template.build(story, onFirstPage=_draw_page_number, onLaterPages=_draw_page_number)
+    return True, ""
+
+
+def render_source_pdf(source_path, pdf_path):
+    """读取源文件并排版为 PDF（在 PDF 进程池中执行）"""
+    return render_document_pdf(exporters.read_source(source_path), pdf_path)
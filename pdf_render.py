@@ -0,0 +1,161 @@
+# coding:utf-8
+"""
+PDF 渲染进程池
+
+xhtml2pdf 是纯 Python 实现，一篇长文渲染可能要十几秒。渲染任务提交到独立的
+进程池中异步执行，每个工作进程启动时只注册一次 STSong-Light 中文字体，
+爬取线程提交后立即继续，每篇的渲染结果通过回调逐条返回。
+"""
+
+import os
+import threading
+
+from cpu_pool import LazyProcessPool
+
+# 合并 PDF 时每个文件（卷）的页数上限：pypdf 在写出前把合并的页面都留在内存中，
+# 超过上限后下一篇起写入新的一卷，内存占用只与一卷的大小有关
+MERGE_MAX_PAGES = 2000
+
+_font_registered = False
+
+
+def init_pdf_worker():
+    """PDF 工作进程启动时调用：导入 xhtml2pdf 并注册中文 CID 字体 (ReportLab 内置，支持简体中文)"""
+    global _font_registered
+    if _font_registered:
+        return
+    from xhtml2pdf import pisa  # noqa: F401
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+    try:
+        pdfmetrics.registerFont(UnicodeCIDFont('STSong-Light'))
+    except Exception:
+        pass
+    _font_registered = True
+
+
+def render_pdf(html_content, pdf_path):
+    """把 HTML 渲染为 PDF 文件，返回 (是否成功, 提示信息)"""
+    init_pdf_worker()
+    from xhtml2pdf import pisa
+
+    with open(pdf_path, 'wb') as pdf_file:
+        pisa_status = pisa.CreatePDF(html_content.encode('utf-8'), dest=pdf_file, encoding='utf-8')
+    if pisa_status.err:
+        return True, "PDF生成有警告，但文件已创建"
+    return True, ""
+
+
+pdf_pool = LazyProcessPool(init_pdf_worker, 'pdf')
+
+
+class PdfBatch:
+    """一个任务内提交的 PDF 渲染作业
+
+    submit 立即返回；每个作业完成后调用 on_done(label, pdf_path, ok, message)，
+    任务结束前调用 wait() 等待剩余作业并得到 (成功数, 失败数)
+    """
+
+    def __init__(self, on_done=None):
+        self.on_done = on_done
+        self.submitted = 0
+        self.succeeded = 0
+        self.failed = 0
+        self._cond = threading.Condition()
+
+    def submit(self, html_content, pdf_path, label=None):
+        return self.submit_call(render_pdf, (html_content, pdf_path), pdf_path, label)
+
+    def submit_call(self, fn, args, pdf_path, label=None):
+        """提交任意渲染函数 fn(*args)（返回 (是否成功, 提示信息)），如 pdf_direct.render_source_pdf"""
+        with self._cond:
+            self.submitted += 1
+        future = pdf_pool.submit(fn, *args)
+        future.add_done_callback(lambda f: self._finish(f, label, pdf_path))
+        return future
+
+    def _finish(self, future, label, pdf_path):
+        try:
+            ok, message = future.result()
+        except Exception as e:
+            ok, message = False, str(e)
+        if self.on_done is not None:
+            try:
+                self.on_done(label, pdf_path, ok, message)
+            except Exception:
+                pass
+        with self._cond:
+            if ok:
+                self.succeeded += 1
+            else:
+                self.failed += 1
+            self._cond.notify_all()
+
+    def pending(self):
+        with self._cond:
+            return self.submitted - self.succeeded - self.failed
+
+    def wait(self, timeout=None):
+        with self._cond:
+            self._cond.wait_for(lambda: self.succeeded + self.failed >= self.submitted, timeout)
+            return self.succeeded, self.failed
+
+
+def volume_path(pdf_path, number):
+    """合并结果第 number 卷的路径：第 1 卷就是 pdf_path，之后为「文件名 卷N.pdf」"""
+    if number == 1:
+        return pdf_path
+    base, ext = os.path.splitext(pdf_path)
+    return f"{base} 卷{number}{ext}"
+
+
+def merge_pdfs(parts, pdf_path, max_pages=MERGE_MAX_PAGES):
+    """按顺序把若干 PDF 合并，每个部分在书签中占一项，返回 (合并的部分数, 各卷路径)
+
+    parts 是 (书签标题, PDF 路径) 的可迭代对象，可以边渲染边产出；
+    每个部分合并后就不再需要原文件。一卷达到 max_pages 页后，下一个部分起写入新的一卷
+    （一个部分不会被拆到两卷中）。各卷先写到临时文件，全部成功后才替换目标文件，
+    并删除上次合并留下的多余分卷
+    """
+    from pypdf import PdfWriter
+
+    tmp_paths = []
+    writer = None
+    count = 0
+
+    def flush():
+        tmp_path = volume_path(pdf_path, len(tmp_paths) + 1) + '.tmp'
+        tmp_paths.append(tmp_path)
+        with open(tmp_path, 'wb') as f:
+            writer.write(f)
+        writer.close()
+
+    try:
+        for title, part_path in parts:
+            if writer is not None and len(writer.pages) >= max_pages:
+                flush()
+                writer = None
+            if writer is None:
+                writer = PdfWriter()
+            page_index = len(writer.pages)
+            writer.append(part_path, import_outline=False)
+            if len(writer.pages) > page_index:
+                writer.add_outline_item(title, page_index)
+            count += 1
+        if writer is not None:
+            flush()
+    except BaseException:
+        for tmp_path in tmp_paths:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        raise
+
+    volumes = [volume_path(pdf_path, number) for number in range(1, len(tmp_paths) + 1)]
+    for tmp_path, path in zip(tmp_paths, volumes):
+        os.replace(tmp_path, path)
+    # 没有可合并的部分时保留原有文件
+    number = len(volumes) + 1 if volumes else None
+    while number and os.path.exists(volume_path(pdf_path, number)):
+        os.remove(volume_path(pdf_path, number))
+        number += 1
+    return count, volumes
@@ -268,7 +268,9 @@ window.startLstTask = async function() {
             img: document.getElementById('saveImg').checked ? 1 : 0
         },
         start_time: document.getElementById('startTime').value,
-        export_pdf: document.getElementById('lstExportPdf').checked
+        export_pdf: document.getElementById('lstExportPdf').checked,
+        incremental: document.getElementById('lstIncremental').checked,
+        max_items: parseInt(document.getElementById('lstMaxItems').value) || 0
     });
 };
 
@@ -279,14 +281,21 @@ window.startAuthorImgTask = async function() {
     await startTask('author_img', {
         author_url: url,
         start_time: document.getElementById('imgStartTime').value,
-        end_time: document.getElementById('imgEndTime').value
+        end_time: document.getElementById('imgEndTime').value,
+        incremental: document.getElementById('authorImgIncremental').checked
     });
 };
 
 window.startAuthorTxtTask = async function() {
     const url = document.getElementById('authorTxtUrl').value.trim();
     if (!url) return showNotification('请输入作者主页链接', 'error');
-    await startTask('author_txt', { author_url: url });
+    await startTask('author_txt', {
+        author_url: url,
+        skip_existing: document.getElementById('authorTxtSkipExisting').checked,
+        incremental: document.getElementById('authorTxtIncremental').checked,
+        export_pdf: document.getElementById('authorTxtExportPdf').checked,
+        export_epub: document.getElementById('authorTxtExportEpub').checked
+    });
 };
 
 window.startSingleTask = async function() {
@@ -306,10 +315,13 @@ window.startAo3Task = async function() {
     await startTask('ao3', {
         urls,
         mode: AppState.currentAo3Mode,
+        skip_existing: document.getElementById('ao3SkipExisting').checked,
         download_chapters: document.getElementById('ao3DownloadChapters').checked,
         save_metadata: document.getElementById('ao3SaveMetadata').checked,
         export_pdf: document.getElementById('ao3ExportPdf').checked,
         export_epub: document.getElementById('ao3ExportEpub').checked,
+        anthology: document.getElementById('ao3Anthology').checked || document.getElementById('ao3AnthologyPdf').checked,
+        anthology_pdf: document.getElementById('ao3AnthologyPdf').checked,
         max_pages: parseInt(document.getElementById('ao3MaxPages').value) || 5
     });
 };
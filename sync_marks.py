@@ -0,0 +1,141 @@
+# coding:utf-8
+"""
+增量同步的高水位标记（按来源）
+
+每个来源（我的喜欢 / 推荐、某个 Tag 的某种排序、某位作者的归档）记录上次完整同步时
+见到的最新发表时间和最近的帖子 ID，保存在保存目录下的 .sync_marks.json 中。
+再次爬取时翻到已存档的内容就停止翻页，日常刷新只需请求一两页。
+
+标记只在一次同步完整结束（翻到上次的标记或列表末尾）后才更新；中途停止时本次见到的内容
+随断点保存，续爬结束后再一并写入，不会在上次标记和本次停止位置之间留下空档。
+批量运行时多个进程可能共用同一保存目录：更新标记时持有跨进程文件锁，在磁盘上的最新内容上合并。
+"""
+
+import json
+import os
+import threading
+import time
+
+import file_lock
+
+MARKS_NAME = '.sync_marks.json'
+# 每个来源保留的最近帖子 ID 数
+MAX_SEEN_IDS = 200
+
+
+class SyncMarks:
+    """一个保存目录下所有来源的高水位标记"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._marks = {}
+        self._stamp = None
+        self._reload()
+
+    def _reload(self):
+        """文件被其他进程改写过时重新读取（调用方持有锁）"""
+        stamp = file_lock.stamp(self.path)
+        if stamp == self._stamp:
+            return
+        self._marks = {}
+        self._stamp = stamp
+        if stamp is not None:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._marks = json.load(f)
+            except Exception as e:
+                print(f"加载同步标记失败: {e}")
+
+    def get(self, source):
+        """来源的标记 {'newest': 时间戳或 None, 'ids': [...], 'updated': ...}，没有时返回 None"""
+        with self._lock:
+            self._reload()
+            mark = self._marks.get(source)
+            return dict(mark) if mark else None
+
+    def merge(self, source, newest, ids):
+        """把一次完整同步见到的内容并入标记"""
+        with self._lock, file_lock.locked(self.path):
+            self._reload()
+            mark = self._marks.get(source) or {'newest': None, 'ids': []}
+            if newest is not None and (mark['newest'] is None or newest > mark['newest']):
+                mark['newest'] = newest
+            merged = list(dict.fromkeys(list(ids) + mark['ids']))
+            mark['ids'] = merged[:MAX_SEEN_IDS]
+            mark['updated'] = int(time.time())
+            self._marks[source] = mark
+            self._save()
+
+    def _save(self):
+        try:
+            self._stamp = file_lock.write_json(self.path, self._marks)
+        except Exception as e:
+            print(f"保存同步标记失败: {e}")
+
+
+class SyncRun:
+    """一次爬取的增量状态：判断帖子是否已存档，并收集本次见到的最新内容
+
+    by_time 为 True 的来源按发表时间倒序排列，发表时间不晚于标记的帖子都视为已存档；
+    喜欢 / 推荐按操作时间排列，只能按帖子 ID 判断。incremental 为 False 时完整翻页，结束后仍更新标记。
+    """
+
+    def __init__(self, marks, source, by_time=True, incremental=True, state=None):
+        self.marks = marks
+        self.source = source
+        mark = marks.get(source) if incremental else None
+        self._known_ids = set(mark['ids']) if mark else set()
+        self._known_newest = mark['newest'] if mark and by_time else None
+        self.active = bool(mark)
+        # 本次见到的内容（断点续爬时从断点恢复）
+        self.newest = state.get('newest') if state else None
+        self.ids = list(state.get('ids', [])) if state else []
+        self._lock = threading.Lock()
+
+    def is_archived(self, post_id, timestamp=None):
+        """帖子在上次完整同步时已经存档"""
+        if post_id is not None and str(post_id) in self._known_ids:
+            return True
+        if self._known_newest is None or timestamp is None:
+            return False
+        try:
+            return int(timestamp) <= self._known_newest
+        except (TypeError, ValueError):
+            return False
+
+    def observe(self, post_id, timestamp=None):
+        """记录本次见到的帖子"""
+        with self._lock:
+            if post_id is not None and len(self.ids) < MAX_SEEN_IDS:
+                self.ids.append(str(post_id))
+            try:
+                timestamp = int(timestamp)
+            except (TypeError, ValueError):
+                return
+            if self.newest is None or timestamp > self.newest:
+                self.newest = timestamp
+
+    def state(self):
+        """写入断点的状态"""
+        with self._lock:
+            return {'newest': self.newest, 'ids': list(self.ids)}
+
+    def commit(self):
+        """同步完整结束后更新来源的标记"""
+        self.marks.merge(self.source, self.newest, self.state()['ids'])
+
+
+_marks = {}
+_marks_lock = threading.Lock()
+
+
+def marks_for(save_root):
+    """保存目录对应的 SyncMarks（按绝对路径缓存）"""
+    path = os.path.abspath(os.path.join(save_root, MARKS_NAME))
+    with _marks_lock:
+        marks = _marks.get(path)
+        if marks is None:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            marks = _marks[path] = SyncMarks(path)
+        return marks
@@ -0,0 +1,145 @@
+# coding:utf-8
+"""
+任务调度：在后台线程中运行爬取 / 打包任务，关闭服务时等待任务结束；关注列表的定时刷新也经由这里启动任务
+
+Lofter 和 AO3 任务模块（以及它们依赖的 requests、lxml）在第一次运行对应任务时才导入。
+"""
+
+import os
+import time
+import threading
+import zip_stream
+from watch_scheduler import WatchScheduler
+from core import (config, task_lock, task_status, add_log, load_config, sanitize_filename,
+                  index_saved_file, resolve_archive_path, export_queue, WATCH_FILE)
+
+# 当前爬取任务线程；关闭服务时不再接受新任务并等待它结束
+task_thread = None
+accepting_tasks = True
+# 打包任务生成的 ZIP 保存子目录
+ZIP_EXPORT_DIR = 'zip'
+# Lofter 任务类型 -> lofter_tasks 中的函数名（需要登录）
+LOFTER_TASKS = {
+    'single_img': 'run_single_img_task',
+    'single_txt': 'run_single_txt_task',
+    'author_img': 'run_author_img_task',
+    'author_txt': 'run_author_txt_task',
+    'like_share_tag': 'run_like_share_tag_task',
+}
+
+
+def drain_jobs(timeout):
+    """关闭服务前调用：不再接受新任务，等待当前爬取任务和导出作业完成（最多 timeout 秒）"""
+    global accepting_tasks
+    accepting_tasks = False
+    watch_list.stop()
+    deadline = time.monotonic() + timeout
+    thread = task_thread
+    if thread is not None and thread.is_alive():
+        add_log('⏳ 服务正在关闭，等待当前任务完成…')
+        thread.join(timeout)
+        if thread.is_alive():
+            print("等待任务超时，未完成的翻页进度已保存在断点中")
+    if not export_queue.drain(max(0, deadline - time.monotonic())):
+        print("等待导出超时，未完成的导出作业下次启动时继续")
+
+
+def start_task(task_type, params):
+    """在后台线程中运行任务"""
+    global task_thread
+    task_thread = threading.Thread(target=run_spider_task, args=(task_type, params), daemon=True)
+    task_thread.start()
+
+
+def try_start_task(task_type, params):
+    """没有任务在运行时启动任务并返回 True；检查和占用在同一把锁内完成，手动任务和定时刷新不会同时启动"""
+    with task_lock:
+        if task_status['running']:
+            return False
+        task_status['running'] = True
+    start_task(task_type, params)
+    return True
+
+
+def run_watch_task(task_type, params):
+    """关注列表调度线程调用：启动任务并等待结束，返回 (是否启动, 错误信息)
+
+    任务自己捕获的错误和条目保存失败由任务通过 set_task_error 记录，同样作为错误信息返回
+    """
+    if not accepting_tasks or not try_start_task(task_type, params):
+        return False, None
+    task_thread.join()
+    return True, task_status['error']
+
+
+# 关注列表：由 web_app 启动调度线程
+watch_list = WatchScheduler(WATCH_FILE, run_watch_task, log=add_log)
+
+
+def run_spider_task(task_type, params):
+    """运行爬虫任务"""
+    with task_lock:
+        task_status['running'] = True
+        task_status['current_task'] = task_type
+        task_status['progress'] = 0
+        task_status['logs'] = []
+        task_status['error'] = None
+    
+    try:
+        load_config()  # 重新加载配置
+        
+        # AO3 和打包不需要登录，其他任务需要
+        if task_type == 'ao3':
+            from ao3_tasks import run_ao3_task
+            run_ao3_task(params)
+        elif task_type == 'zip':
+            run_zip_task(params)
+        elif task_type not in LOFTER_TASKS:
+            add_log(f'❌ 未知的任务类型: {task_type}')
+        elif not config['login_auth']:
+            raise Exception("请先在设置中配置登录授权码！")
+        else:
+            import lofter_tasks
+            getattr(lofter_tasks, LOFTER_TASKS[task_type])(params)
+            
+    except Exception as e:
+        import traceback
+        error_msg = str(e)
+        with task_lock:
+            task_status['error'] = error_msg
+        add_log(f'❌ 任务出错: {error_msg}')
+        add_log(traceback.format_exc())
+    finally:
+        with task_lock:
+            task_status['running'] = False
+            task_status['progress'] = 100
+        add_log('✅ 任务结束')
+
+
+def run_zip_task(params):
+    """把保存目录中的一个文件夹打包成 ZIP 文件（边读边写，不暂存整个压缩包）"""
+    rel_path = params.get('path', '').strip('/\\')
+    src_path = resolve_archive_path(rel_path) if rel_path else None
+    save_root = os.path.abspath(config.get('save_path', './dir'))
+    if rel_path and (src_path is None or not os.path.isdir(src_path)):
+        add_log(f"❌ 文件夹不存在: {rel_path}")
+        return
+    src_path = src_path or save_root
+    
+    name = os.path.basename(src_path.rstrip(os.sep)) or 'archive'
+    dest_dir = os.path.join(save_root, ZIP_EXPORT_DIR)
+    os.makedirs(dest_dir, exist_ok=True)
+    dest_path = os.path.join(dest_dir, f"{sanitize_filename(name)} {time.strftime('%Y%m%d-%H%M%S')}.zip")
+    
+    # 先数一遍文件用于显示进度（只遍历目录，不读文件）；跳过 zip 目录本身，避免把之前的压缩包再打包进去
+    total = sum(1 for _ in zip_stream.iter_tree(src_path, skip_dir=dest_dir))
+    add_log(f"📦 开始打包: {rel_path or '全部文件'}（{total} 个文件）")
+    
+    def on_file(count, arcname):
+        task_status['progress'] = min(99, int(count / max(1, total) * 100))
+        if count % 500 == 0:
+            add_log(f"   已打包 {count}/{total} 个文件")
+    
+    count = zip_stream.write_zip(zip_stream.iter_tree(src_path, skip_dir=dest_dir), dest_path, on_file=on_file)
+    index_saved_file(dest_path)
+    add_log(f"✅ 打包完成：{count} 个文件 → {dest_path}（{os.path.getsize(dest_path) / 1024 / 1024:.1f} MB）")
@@ -0,0 +1,146 @@
+# coding:utf-8
+import os
+import time
+import zipfile
+
+import pytest
+from pypdf import PdfReader, PdfWriter
+
+from document import Chapter, Document
+from export_queue import DEFAULT_PDF_BACKEND, ExportQueue, source_path_for
+from pdf_render import merge_pdfs, volume_path
+
+
+def make_queue(tmp_path):
+    return ExportQueue(str(tmp_path / 'queue.json'), str(tmp_path / 'sources'), log=lambda message: None)
+
+
+def save_work(queue, txt_path, title, ending='结尾'):
+    doc = Document('ao3', title, '作者', f'https://x/{title}',
+                   [Chapter('第一章', [f'{title}的正文']), Chapter('第二章', [ending])], chaptered=True)
+    queue.save_source(txt_path, doc)
+
+
+def wait_finished(queue, job_id, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = next(job for job in queue.status()['jobs'] if job['id'] == job_id)
+        if job['status'] in ('done', 'failed'):
+            return job
+        time.sleep(0.05)
+    raise AssertionError('导出作业超时')
+
+
+def save_works(queue, tmp_path):
+    paths = []
+    for title in ('Alpha', 'Beta'):
+        txt_path = str(tmp_path / f'{title}.txt')
+        save_work(queue, txt_path, title)
+        paths.append(txt_path)
+    return paths
+
+
+def test_anthology_merges_works_in_order(tmp_path):
+    queue = make_queue(tmp_path)
+    paths = save_works(queue, tmp_path)
+    assert queue.enqueue_anthology(str(tmp_path / 'all'), [], ['epub'], '合集') is None
+
+    # 按给定顺序（而不是文件名顺序）合并
+    out_base = str(tmp_path / 'out' / 'all')
+    job = wait_finished(queue, queue.enqueue_anthology(out_base, paths[::-1], ['epub', 'pdf'], '合集', '作者'))
+    assert job['status'] == 'done'
+    assert job['results']['epub']['message'] == job['results']['pdf']['message'] == '共 2 篇'
+
+    with zipfile.ZipFile(out_base + '.epub') as zf:
+        nav = zf.read('EPUB/nav.xhtml').decode('utf-8')
+    assert nav.index('Beta') < nav.index('Alpha')
+    assert nav.count('第一章') == 2
+
+    reader = PdfReader(out_base + '.pdf')
+    assert [item.title for item in reader.outline] == ['Beta', 'Alpha']
+    # 每篇的书签指向它的第一页
+    starts = [reader.get_destination_page_number(item) for item in reader.outline]
+    assert starts[0] == 0 < starts[1] < len(reader.pages)
+    beta_text = ''.join(page.extract_text() for page in reader.pages[:starts[1]])
+    assert 'Beta的正文' in beta_text and 'Alpha' not in beta_text
+    assert not [name for name in os.listdir(tmp_path / 'out') if name.startswith('.anthology_')]
+
+    # 源文件未变化：跳过；任一篇变化后重新生成
+    again = wait_finished(queue, queue.enqueue_anthology(out_base, paths[::-1], ['epub'], '合集'))
+    assert again['results']['epub']['skipped']
+    save_work(queue, paths[0], 'Alpha', ending='新的结尾')
+    changed = wait_finished(queue, queue.enqueue_anthology(out_base, paths[::-1], ['epub'], '合集'))
+    assert not changed['results']['epub']['skipped']
+
+
+def test_anthology_parts_reuse_current_pdfs(tmp_path):
+    queue = make_queue(tmp_path)
+    alpha, beta = save_works(queue, tmp_path)
+    assert wait_finished(queue, queue.enqueue(alpha, ['pdf']))['status'] == 'done'
+
+    works = [(path, source_path_for(queue.source_dir, path)) for path in (alpha, beta)]
+    tmp_dir = tmp_path / 'parts'
+    tmp_dir.mkdir()
+    failed = []
+    parts = queue._anthology_parts(works, str(tmp_dir), failed, DEFAULT_PDF_BACKEND)
+
+    # 已是最新的单篇 PDF 直接复用，其余渲染到临时目录
+    assert next(parts) == ('Alpha', str(tmp_path / 'Alpha.pdf'))
+    title, part_path = next(parts)
+    assert title == 'Beta' and os.path.dirname(part_path) == str(tmp_dir)
+    assert os.path.getsize(part_path) > 0
+    assert next(parts, None) is None
+    # 合并过的临时文件随即删除，复用的单篇 PDF 保留
+    assert not os.path.exists(part_path)
+    assert os.path.exists(tmp_path / 'Alpha.pdf')
+    assert failed == []
+
+
+def blank_pdfs(tmp_path, count, pages=2):
+    parts = []
+    for i in range(1, count + 1):
+        writer = PdfWriter()
+        for _ in range(pages):
+            writer.add_blank_page(200, 200)
+        path = str(tmp_path / f'p{i}.pdf')
+        with open(path, 'wb') as f:
+            writer.write(f)
+        parts.append((f'p{i}', path))
+    return parts
+
+
+def outline_titles(path):
+    return [item.title for item in PdfReader(path).outline]
+
+
+def test_merge_splits_into_volumes(tmp_path):
+    parts = blank_pdfs(tmp_path, 5)
+    out_path = str(tmp_path / '合集.pdf')
+    count, volumes = merge_pdfs(parts, out_path, max_pages=3)
+    assert count == 5
+    assert volumes == [out_path, volume_path(out_path, 2), volume_path(out_path, 3)]
+    assert os.path.basename(volumes[1]) == '合集 卷2.pdf'
+    assert [outline_titles(path) for path in volumes] == [['p1', 'p2'], ['p3', 'p4'], ['p5']]
+
+    # 页数足够时合并为一个文件，上次留下的分卷被删除
+    count, volumes = merge_pdfs(parts, out_path)
+    assert (count, volumes) == (5, [out_path])
+    assert outline_titles(out_path) == ['p1', 'p2', 'p3', 'p4', 'p5']
+    assert not os.path.exists(volume_path(out_path, 2))
+
+
+def test_merge_failure_keeps_previous_file(tmp_path):
+    parts = blank_pdfs(tmp_path, 3)
+    out_path = str(tmp_path / '合集.pdf')
+    merge_pdfs(parts[:1], out_path)
+
+    def failing_parts():
+        yield from parts
+        raise RuntimeError('渲染失败')
+
+    with pytest.raises(RuntimeError):
+        merge_pdfs(failing_parts(), out_path, max_pages=2)
+    assert outline_titles(out_path) == ['p1']
+    assert merge_pdfs([], out_path) == (0, [])
+    assert outline_titles(out_path) == ['p1']
+    assert sorted(os.listdir(tmp_path)) == ['p1.pdf', 'p2.pdf', 'p3.pdf', '合集.pdf']
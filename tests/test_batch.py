@@ -0,0 +1,73 @@
+# coding:utf-8
+import json
+import os
+import subprocess
+import sys
+import time
+
+import batch
+from export_queue import ExportQueue
+
+BATCH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'batch.py')
+
+
+def run_batch(cwd, jobs_text, *args):
+    """在 cwd 中运行 batch.py（状态文件都写在 cwd 下），从标准输入读任务，返回 (返回码, 事件列表)"""
+    proc = subprocess.run([sys.executable, BATCH, '-', *args], cwd=str(cwd), input=jobs_text,
+                          capture_output=True, text=True, encoding='utf-8', timeout=120)
+    events = [json.loads(line) for line in proc.stdout.splitlines()]
+    return proc.returncode, events, proc.stderr
+
+
+def test_runs_jobs_in_subprocesses(tmp_path):
+    save_root = tmp_path / 'dir'
+    (save_root / 'works').mkdir(parents=True)
+    (save_root / 'works' / 'a.txt').write_text('正文', encoding='utf-8')
+    (tmp_path / 'loarchive_config.json').write_text(json.dumps({'save_path': str(save_root)}), encoding='utf-8')
+    jobs = [
+        {'type': 'zip', 'params': {'path': 'works'}},
+        # 没有登录授权码：任务出错
+        {'type': 'like_share_tag', 'params': {}},
+    ]
+    code, events, _ = run_batch(tmp_path, '\n'.join(json.dumps(job) for job in jobs), '--jobs', '2')
+
+    assert code == 1
+    assert events[-1]['event'] == 'summary'
+    assert (events[-1]['jobs'], events[-1]['failed']) == (2, 1)
+    ends = {event['job']: event for event in events if event['event'] == 'end'}
+    assert ends[0]['ok'] and ends[0]['error'] is None
+    assert ends[0]['exports'] == {'counts': {}, 'failed': []}
+    assert not ends[1]['ok'] and '登录授权码' in ends[1]['error']
+    assert {event['job'] for event in events if event['event'] == 'start'} == {0, 1}
+    assert any(event['event'] == 'log' and event['job'] == 0 and '打包完成' in event['message'] for event in events)
+
+    archives = os.listdir(save_root / 'zip')
+    assert len(archives) == 1 and archives[0].startswith('works ')
+    # 子进程各自的队列文件在结束时删除
+    assert not [name for name in os.listdir(tmp_path) if name.startswith('export_queue.batch-')]
+
+
+def test_unknown_job_type_is_rejected(tmp_path):
+    code, events, stderr = run_batch(tmp_path, json.dumps([{'type': 'nope'}]))
+    assert code != 0
+    assert events == []
+    assert '未知的任务类型' in stderr
+
+
+def test_close_queue_reports_failed_exports(tmp_path):
+    queue = ExportQueue(str(tmp_path / 'queue.batch-1.json'), str(tmp_path / 'sources'), log=lambda message: None)
+    # 没有源文件：导出失败
+    queue.enqueue(str(tmp_path / 'work.txt'), ['epub'], title='标题')
+    deadline = time.monotonic() + 30
+    while queue.status()['counts'] != {'failed': 1}:
+        assert time.monotonic() < deadline, '导出作业超时'
+        time.sleep(0.05)
+    assert os.path.exists(queue.queue_file)
+
+    exports = batch.close_queue(queue, queue.queue_file)
+    assert exports['counts'] == {'failed': 1}
+    assert [(item['title'], item['path']) for item in exports['failed']] == [('标题', str(tmp_path / 'work.txt'))]
+    errors = exports['failed'][0]['errors']
+    assert list(errors) == ['epub'] and errors['epub']
+    # 失败的作业不留在孤立的队列文件中
+    assert not os.path.exists(queue.queue_file)
@@ -0,0 +1,58 @@
+# coding:utf-8
+import os
+
+from blob_store import BlobStore
+
+
+class Downloads:
+    """记录下载次数的假下载函数"""
+
+    def __init__(self, content):
+        self.content = content
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.content
+
+
+def test_same_url_is_downloaded_once(tmp_path):
+    store = BlobStore(str(tmp_path / '.blobs'))
+    download = Downloads(b'image-a')
+    blob_path, first = store.materialize('https://Example.com/a.jpg?w=500', str(tmp_path / 'a.jpg'), download)
+    # 查询参数和协议不同仍是同一张图
+    same_path, second = store.materialize('http://example.com/a.jpg', str(tmp_path / 'b.jpg'), download)
+    assert (first, second) == (True, False)
+    assert blob_path == same_path
+    assert download.calls == 1
+    assert store.lookup('https://example.com/a.jpg#top') is not None
+    assert store.lookup('https://example.com/other.jpg') is None
+
+
+def test_identical_content_is_stored_once_and_hardlinked(tmp_path):
+    store = BlobStore(str(tmp_path / '.blobs'))
+    (tmp_path / 'this').mkdir()
+    (tmp_path / 'author').mkdir()
+    store.materialize('https://example.com/1.jpg', str(tmp_path / 'this' / '1.jpg'), Downloads(b'same'))
+    store.materialize('https://example.com/2.jpg', str(tmp_path / 'author' / '2.jpg'), Downloads(b'same'))
+
+    blob_path = store.lookup('https://example.com/1.jpg')
+    assert blob_path == store.lookup('https://example.com/2.jpg')
+    blobs = [name for _, _, files in os.walk(store.root) for name in files if name.endswith('.jpg')]
+    assert len(blobs) == 1
+    # 各目录中的文件都是内容文件的硬链接
+    assert os.path.samefile(blob_path, tmp_path / 'this' / '1.jpg')
+    assert os.path.samefile(blob_path, tmp_path / 'author' / '2.jpg')
+    assert os.stat(blob_path).st_nlink == 3
+
+
+def test_materialize_replaces_stale_file(tmp_path):
+    store = BlobStore(str(tmp_path / '.blobs'))
+    dest = tmp_path / 'a.jpg'
+    dest.write_bytes(b'old')
+    store.materialize('https://example.com/a.jpg', str(dest), Downloads(b'new'))
+    assert dest.read_bytes() == b'new'
+    assert os.path.samefile(store.lookup('https://example.com/a.jpg'), dest)
+    # 已是同一文件时不再改动
+    store.materialize('https://example.com/a.jpg', str(dest), Downloads(b'new'))
+    assert os.stat(dest).st_nlink == 2
@@ -0,0 +1,58 @@
+# coding:utf-8
+import zipfile
+
+from document import Chapter, Document
+from exporters import document_digest, read_source, render_txt, source_digest, write_epub, write_source
+
+
+def make_doc():
+    return Document('ao3', '标题', '作者', 'https://archiveofourown.org/works/1',
+                    [Chapter('第一章', ['第一段', '第二段 😀']), Chapter('第二章', ['第三段'])],
+                    metadata=['Rating: General'], chaptered=True, words=3)
+
+
+def test_source_round_trip(tmp_path):
+    doc = make_doc()
+    path = str(tmp_path / 'src' / 'doc.jsonl')
+    write_source(path, doc)
+
+    loaded = read_source(path)
+    assert loaded.header() == doc.header()
+    assert [c.to_dict() for c in loaded.chapters] == [c.to_dict() for c in doc.chapters]
+    assert loaded.extra == {'words': 3}
+    assert list(loaded.paragraphs()) == ['第一段', '第二段 😀', '第三段']
+    assert document_digest(loaded) == document_digest(doc) == source_digest(path)
+
+
+def test_lazy_source_reads_chapters_once(tmp_path):
+    path = str(tmp_path / 'doc.jsonl')
+    write_source(path, make_doc())
+    doc = read_source(path, lazy=True)
+    assert [c.title for c in doc.chapters] == ['第一章', '第二章']
+    assert list(doc.chapters) == []
+
+
+def test_digest_changes_with_content():
+    doc = make_doc()
+    changed = make_doc()
+    changed.chapters[1].paragraphs.append('新段落')
+    assert document_digest(doc) != document_digest(changed)
+
+
+def test_txt_from_source(tmp_path):
+    path = str(tmp_path / 'doc.jsonl')
+    write_source(path, make_doc())
+    text = render_txt(read_source(path))
+    assert '标题' in text and 'Rating: General' in text
+    assert text.index('第一章') < text.index('第二段 😀') < text.index('第二章') < text.index('第三段')
+
+
+def test_epub_from_source(tmp_path):
+    path = str(tmp_path / 'doc.jsonl')
+    write_source(path, make_doc())
+    epub_path = str(tmp_path / 'doc.epub')
+    assert write_epub(read_source(path, lazy=True), epub_path)
+    with zipfile.ZipFile(epub_path) as zf:
+        assert zf.namelist()[0] == 'mimetype'
+        body = ''.join(zf.read(name).decode('utf-8') for name in zf.namelist() if name.endswith('.xhtml'))
+    assert 'Rating: General' in body and '第二段 😀' in body and '第三段' in body
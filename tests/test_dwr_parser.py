@@ -0,0 +1,43 @@
+# coding:utf-8
+from dwr_parser import decode_js_string, parse_dwr
+
+RESPONSE = '''//#DWR-INSERT
+//#DWR-REPLY
+var s0=[];var s1={};var s2={};var s3={};
+s0[0]=s1;s0[1]=s3;
+s1.blogInfo=s2;s1.id=101;s1.permalink="1_abc";s1.publishTime=1700000000000;s1.title="\\u6807\\u9898";s1.noticeLinkTitle=null;
+s2.blogNickName="\\u4F5C\\u8005";s2.blogPageUrl="https://a.lofter.com/";
+s3.blogInfo=s2;s3.id=102;s3.permalink="1_def";s3.publishTime=new Date(1700000001000);s3.title="a\\"b";s3.valid=true;
+dwr.engine._remoteHandleCallback('1','0',s0);
+'''
+
+
+def test_decode_js_string():
+    assert decode_js_string('plain') == 'plain'
+    assert decode_js_string('\\u4E2D\\u6587') == '中文'
+    assert decode_js_string('a\\/b\\n') == 'a/b\n'
+    # 代理对合并为一个 emoji
+    assert decode_js_string('\\uD83D\\uDE00') == '\U0001F600'
+
+
+def test_result_resolves_references():
+    result = parse_dwr(RESPONSE).result
+    assert [post['id'] for post in result] == [101, 102]
+    assert result[0]['title'] == '标题'
+    assert result[0]['noticeLinkTitle'] is None
+    assert result[0]['blogInfo']['blogNickName'] == '作者'
+    assert result[1]['publishTime'] == 1700000001000
+    assert result[1]['title'] == 'a"b'
+    assert result[1]['valid'] is True
+
+
+def test_records_flatten_shared_children():
+    records = parse_dwr(RESPONSE).records('permalink', fields=['id', 'permalink', 'blogNickName'])
+    assert records == [
+        {'id': 101, 'permalink': '1_abc', 'blogNickName': '作者'},
+        {'id': 102, 'permalink': '1_def', 'blogNickName': '作者'},
+    ]
+
+
+def test_missing_callback():
+    assert parse_dwr('var s0={};s0.a=1;').result is None
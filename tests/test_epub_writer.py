@@ -0,0 +1,73 @@
+# coding:utf-8
+import zipfile
+from xml.etree import ElementTree as ET
+
+import pytest
+
+from epub_writer import EpubWriter
+
+
+def write_book(path):
+    with EpubWriter(path, '合集 & 标题', '作者') as book:
+        with book.page('part_1.xhtml', '第一部') as out:
+            out.write('<h1>第一部</h1>')
+            part = out.entry
+        for idx in (1, 2):
+            with book.page(f'chapter_{idx}.xhtml', f'第{idx}章', toc_parent=part) as out:
+                out.write(f'<p>第{idx}章正文</p>')
+        with book.page('notes.xhtml', '附注', toc_parent=False) as out:
+            out.write('<p>不在目录中</p>')
+
+
+def test_mimetype_is_first_and_stored(tmp_path):
+    path = str(tmp_path / 'book.epub')
+    write_book(path)
+    with zipfile.ZipFile(path) as zf:
+        assert zf.testzip() is None
+        first = zf.infolist()[0]
+        assert first.filename == 'mimetype'
+        assert first.compress_type == zipfile.ZIP_STORED
+        assert zf.read('mimetype') == b'application/epub+zip'
+        assert '第2章正文' in zf.read('EPUB/chapter_2.xhtml').decode('utf-8')
+        opf = zf.read('EPUB/content.opf').decode('utf-8')
+    assert '合集 &amp; 标题' in opf
+    assert opf.count('<itemref idref="page_') == 4
+
+
+def test_toc_nests_children(tmp_path):
+    path = str(tmp_path / 'book.epub')
+    write_book(path)
+    with zipfile.ZipFile(path) as zf:
+        nav = zf.read('EPUB/nav.xhtml').decode('utf-8')
+        ncx = zf.read('EPUB/toc.ncx').decode('utf-8')
+
+    # 章节列在第一部下的二级目录中，附注不进目录
+    xhtml = '{http://www.w3.org/1999/xhtml}'
+    items = ET.fromstring(nav).findall(f'.//{xhtml}nav/{xhtml}ol/{xhtml}li')
+    assert [li.find(f'{xhtml}a').get('href') for li in items] == ['part_1.xhtml']
+    children = items[0].findall(f'{xhtml}ol/{xhtml}li/{xhtml}a')
+    assert [a.get('href') for a in children] == ['chapter_1.xhtml', 'chapter_2.xhtml']
+
+    ncx_ns = '{http://www.daisy.org/z3986/2005/ncx/}'
+    points = ET.fromstring(ncx).findall(f'{ncx_ns}navMap/{ncx_ns}navPoint')
+    assert [p.find(f'{ncx_ns}content').get('src') for p in points] == ['part_1.xhtml']
+    children = points[0].findall(f'{ncx_ns}navPoint')
+    assert [p.get('playOrder') for p in children] == ['2', '3']
+    assert 'notes.xhtml' not in nav and 'notes.xhtml' not in ncx
+
+
+def test_failed_write_keeps_previous_file(tmp_path):
+    path = str(tmp_path / 'book.epub')
+    write_book(path)
+    with open(path, 'rb') as f:
+        before = f.read()
+
+    with pytest.raises(RuntimeError):
+        with EpubWriter(path, '标题', '作者') as book:
+            with book.page('chapter_1.xhtml', '第一章') as out:
+                out.write('<p>写到一半</p>')
+                raise RuntimeError('boom')
+
+    with open(path, 'rb') as f:
+        assert f.read() == before
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['book.epub']
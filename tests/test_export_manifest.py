@@ -0,0 +1,52 @@
+# coding:utf-8
+import export_manifest
+
+
+def test_claim_path_reuses_path_for_same_url(tmp_path):
+    dir_path = str(tmp_path)
+    first = export_manifest.claim_path(dir_path, 'a.txt', 'https://x/1')
+    assert first == str(tmp_path / 'a.txt')
+    assert export_manifest.claim_path(dir_path, 'a.txt', 'https://x/1') == first
+
+
+def test_claim_path_avoids_name_clash(tmp_path):
+    dir_path = str(tmp_path)
+    (tmp_path / 'a.txt').write_text('other', encoding='utf-8')
+    first = export_manifest.claim_path(dir_path, 'a.txt', 'https://x/1')
+    second = export_manifest.claim_path(dir_path, 'a.txt', 'https://x/2')
+    assert first == str(tmp_path / 'a(1).txt')
+    assert second == str(tmp_path / 'a(2).txt')
+
+
+def test_record_and_is_current(tmp_path):
+    path = export_manifest.claim_path(str(tmp_path), 'a.txt', 'https://x/1')
+    assert not export_manifest.is_current(path, 'h1')
+    assert export_manifest.saved_entry(str(tmp_path), 'https://x/1') is None
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('text')
+    export_manifest.record(path, 'h1')
+    assert export_manifest.is_current(path, 'h1')
+    assert not export_manifest.is_current(path, 'h2')
+    assert export_manifest.saved_entry(str(tmp_path), 'https://x/1') == (path, 'h1')
+    assert export_manifest.saved_entry(str(tmp_path), 'https://x/2') is None
+
+
+def test_is_current_requires_file(tmp_path):
+    path = export_manifest.claim_path(str(tmp_path), 'a.txt', 'https://x/1')
+    export_manifest.record(path, 'h1')
+    assert not export_manifest.is_current(path, 'h1')
+    assert export_manifest.saved_entry(str(tmp_path), 'https://x/1') is None
+
+
+def test_picks_up_other_writers(tmp_path):
+    dir_path = str(tmp_path)
+    first = export_manifest.claim_path(dir_path, 'a.txt', 'https://x/1')
+    # 模拟另一个进程改写清单：b.txt 已被其他链接占用，缓存失效后重新读取
+    manifest_path = tmp_path / export_manifest.MANIFEST_NAME
+    manifest_path.write_text('{"files": {"a.txt": {"hash": null, "url": "https://x/1"}, '
+                             '"b.txt": {"hash": "h", "url": "https://x/2"}}, '
+                             '"urls": {"https://x/1": "a.txt", "https://x/2": "b.txt"}}', encoding='utf-8')
+    assert export_manifest.claim_path(dir_path, 'b.txt', 'https://x/3') == str(tmp_path / 'b(1).txt')
+    # 修改在其他进程写入的内容上进行，不覆盖它们
+    export_manifest.record(first, 'h1')
+    assert '"https://x/2"' in manifest_path.read_text(encoding='utf-8')
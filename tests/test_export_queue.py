@@ -0,0 +1,108 @@
+# coding:utf-8
+import json
+import os
+import time
+
+from document import Chapter, Document
+from export_queue import ExportQueue
+from exporters import document_digest
+
+
+def make_queue(tmp_path):
+    return ExportQueue(str(tmp_path / 'queue.json'), str(tmp_path / 'sources'), log=lambda message: None)
+
+
+def save_work(queue, txt_path, paragraphs=('第一段', '第二段')):
+    doc = Document('ao3', '标题', '作者', 'https://x/1', [Chapter(None, list(paragraphs))])
+    queue.save_source(txt_path, doc)
+    return doc
+
+
+def wait_finished(queue, job_id, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = next(job for job in queue.status()['jobs'] if job['id'] == job_id)
+        if job['status'] in ('done', 'failed'):
+            return job
+        time.sleep(0.05)
+    raise AssertionError('导出作业超时')
+
+
+def test_enqueue_runs_until_done(tmp_path):
+    queue = make_queue(tmp_path)
+    txt_path = str(tmp_path / 'work.txt')
+    save_work(queue, txt_path)
+    assert queue.has_source(txt_path)
+    assert queue.enqueue(txt_path, ['mobi']) is None
+
+    job_id = queue.enqueue(txt_path, ['epub', 'mobi'], title='标题')
+    job = wait_finished(queue, job_id)
+    assert job['status'] == 'done'
+    assert job['formats'] == ['epub']
+    assert job['results']['epub']['ok']
+    assert os.path.getsize(tmp_path / 'work.epub') > 0
+
+    # 结束的作业保存在队列文件中，重启后仍可查询
+    assert make_queue(tmp_path).status()['counts'] == {'done': 1}
+
+
+def test_requeue_after_failure(tmp_path):
+    queue = make_queue(tmp_path)
+    txt_path = str(tmp_path / 'work.txt')
+    # 没有源文件：导出失败
+    job_id = queue.enqueue(txt_path, ['epub'])
+    job = wait_finished(queue, job_id)
+    assert job['status'] == 'failed'
+    assert not job['results']['epub']['ok']
+
+    save_work(queue, txt_path)
+    assert queue.requeue(job_id)
+    assert wait_finished(queue, job_id)['status'] == 'done'
+    assert os.path.exists(tmp_path / 'work.epub')
+    assert not queue.requeue('missing')
+
+
+def test_unchanged_formats_are_skipped(tmp_path):
+    queue = make_queue(tmp_path)
+    txt_path = str(tmp_path / 'work.txt')
+    doc = save_work(queue, txt_path)
+    assert queue.stale_formats(txt_path, ['epub'], document_digest(doc)) == ['epub']
+    first = wait_finished(queue, queue.enqueue(txt_path, ['epub']))
+    assert not first['results']['epub']['skipped']
+    assert queue.stale_formats(txt_path, ['epub'], document_digest(doc)) == []
+
+    # 内容未变化：不重新渲染
+    mtime = os.path.getmtime(tmp_path / 'work.epub')
+    second = wait_finished(queue, queue.enqueue(txt_path, ['epub']))
+    assert second['status'] == 'done' and second['results']['epub']['skipped']
+    assert os.path.getmtime(tmp_path / 'work.epub') == mtime
+    # force 时总是重新渲染
+    forced = wait_finished(queue, queue.enqueue(txt_path, ['epub'], force=True))
+    assert not forced['results']['epub']['skipped']
+
+    # 内容变化后过期，重新渲染
+    changed = save_work(queue, txt_path, ['第一段', '新的第二段'])
+    assert queue.stale_formats(txt_path, ['epub'], document_digest(changed)) == ['epub']
+    third = wait_finished(queue, queue.enqueue(txt_path, ['epub']))
+    assert not third['results']['epub']['skipped']
+
+
+def test_running_jobs_resume_after_restart(tmp_path):
+    job = {'id': 'j1', 'title': '', 'txt_path': str(tmp_path / 'a.txt'), 'source': '', 'formats': ['epub'],
+           'status': 'running', 'results': {}, 'created': 1, 'updated': 1}
+    (tmp_path / 'queue.json').write_text(json.dumps({'jobs': [job]}), encoding='utf-8')
+    assert make_queue(tmp_path).status()['counts'] == {'pending': 1}
+
+
+def test_drain_stops_taking_new_jobs(tmp_path):
+    queue = make_queue(tmp_path)
+    txt_path = str(tmp_path / 'work.txt')
+    save_work(queue, txt_path)
+    assert wait_finished(queue, queue.enqueue(txt_path, ['epub']))['status'] == 'done'
+    assert queue.drain(timeout=10)
+
+    # 关闭后加入的作业留在队列文件中，下次启动时继续
+    job_id = queue.enqueue(txt_path, ['epub'], force=True)
+    time.sleep(0.3)
+    assert make_queue(tmp_path).status()['counts'].get('pending') == 1
+    assert next(job for job in queue.status()['jobs'] if job['id'] == job_id)['status'] == 'pending'
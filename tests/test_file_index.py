@@ -0,0 +1,90 @@
+# coding:utf-8
+import os
+import shutil
+
+from file_index import FileIndex
+
+
+def write(root, rel_path, size, mtime):
+    path = os.path.join(root, rel_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(b'x' * size)
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def names(index, **kwargs):
+    files, _ = index.query(**kwargs)
+    return [item['name'] for item in files]
+
+
+def test_record_lists_new_files(tmp_path):
+    root = str(tmp_path)
+    index = FileIndex(root)
+    index.reconcile()
+    assert index.query() == ([], 0)
+
+    index.record(write(root, 'like/作者/a.txt', 3, 100))
+    index.record(write(root, 'like/img/b.jpg', 5, 200))
+    # 隐藏文件、JSON 状态文件、隐藏目录和保存目录外的文件不列出
+    index.record(write(root, 'like/.hidden.txt', 1, 100))
+    index.record(write(root, 'like/state.json', 1, 100))
+    index.record(write(root, '.blobs/ab/c.jpg', 1, 100))
+    index.record(write(str(tmp_path.parent), 'outside.txt', 1, 100))
+
+    files, total = index.query()
+    assert total == 2
+    assert files[0] == {'name': 'b.jpg', 'path': os.path.join('like', 'img', 'b.jpg'), 'folder': 'img',
+                        'type': 'image', 'size': 5, 'mtime': 200}
+    assert files[1]['folder'] == '作者' and files[1]['type'] == 'text'
+
+    # 记录时文件已不存在：从索引中删除
+    os.remove(os.path.join(root, 'like/img/b.jpg'))
+    index.record(os.path.join(root, 'like/img/b.jpg'))
+    assert names(index) == ['a.txt']
+
+
+def test_reconcile_picks_up_disk_changes(tmp_path):
+    root = str(tmp_path)
+    write(root, 'a/1.txt', 1, 100)
+    write(root, 'a/2.txt', 1, 100)
+    write(root, 'b/c/3.txt', 1, 100)
+    index = FileIndex(root)
+    index.reconcile(full=True)
+    assert names(index, sort='name', order='asc') == ['1.txt', '2.txt', '3.txt']
+
+    # 在磁盘上直接删除文件、删除目录、新增文件
+    os.remove(os.path.join(root, 'a/1.txt'))
+    shutil.rmtree(os.path.join(root, 'b'))
+    write(root, 'd/4.txt', 1, 100)
+    index.reconcile()
+    assert names(index, sort='name', order='asc') == ['2.txt', '4.txt']
+
+    # 索引保存在磁盘上，重新打开后不必完整对账
+    reopened = FileIndex(root)
+    reopened.reconcile()
+    assert reopened.query()[1] == 2
+
+
+def test_query_sorts_filters_and_pages(tmp_path):
+    root = str(tmp_path)
+    index = FileIndex(root)
+    for idx in range(5):
+        index.record(write(root, f'works/w{idx}.txt', 10 - idx, 100 + idx))
+    index.record(write(root, 'img/cover.png', 50, 50))
+    index.reconcile()
+
+    assert names(index) == ['w4.txt', 'w3.txt', 'w2.txt', 'w1.txt', 'w0.txt', 'cover.png']
+    assert names(index, sort='size', order='asc') == ['w4.txt', 'w3.txt', 'w2.txt', 'w1.txt', 'w0.txt', 'cover.png']
+    # 未知的排序字段按修改时间
+    assert names(index, sort='path; DROP TABLE files') == names(index)
+
+    files, total = index.query(page=2, per_page=4, sort='name', order='asc')
+    assert total == 6
+    assert [item['name'] for item in files] == ['w3.txt', 'w4.txt']
+    assert index.query(page=3, per_page=4) == ([], 6)
+
+    assert names(index, kind='image') == ['cover.png']
+    assert names(index, folder='works', keyword='w1') == ['w1.txt']
+    assert index.query(kind='text', per_page=1)[1] == 5
@@ -0,0 +1,32 @@
+# coding:utf-8
+from image_urls import canonical_image_url, image_key, unique_image_urls
+
+
+def test_image_key_ignores_mirror_scheme_and_params():
+    keys = {
+        image_key('http://imglf3.lf127.net/img/abc/def.jpg?imageView&thumbnail=500x0'),
+        image_key('https://imglf4.lf127.net/img/abc/def.jpg'),
+        image_key('https://imglf5.nosdn0.126.net/img/abc/def.jpg?imageView&amp;type=jpg'),
+    }
+    assert keys == {'imglf:/img/abc/def.jpg'}
+
+
+def test_image_key_for_other_hosts():
+    assert image_key('http://Example.com/a.png?x=1#f') == 'https://example.com/a.png'
+    assert image_key('https://example.com/a.png') != image_key('https://example.com/b.png')
+
+
+def test_canonical_image_url():
+    assert (canonical_image_url(' https://IMGLF3.lf127.net/img/a.jpg?imageView&amp;thumbnail=64x64 ')
+            == 'https://imglf3.lf127.net/img/a.jpg')
+
+
+def test_unique_image_urls():
+    urls = [
+        'https://imglf3.lf127.net/img/a.jpg?imageView',
+        'https://imglf4.lf127.net/img/a.jpg',
+        'https://imglf3.lf127.net/img/avatar.jpg?imageView&thumbnail=64y64',
+        'https://imglf3.lf127.net/img/b.png',
+    ]
+    assert unique_image_urls(urls) == ['https://imglf3.lf127.net/img/a.jpg', 'https://imglf3.lf127.net/img/b.png']
+    assert len(unique_image_urls(urls, skip_thumbnails=False)) == 3
@@ -0,0 +1,39 @@
+# coding:utf-8
+from pypdf import PdfReader
+
+from document import Chapter, Document
+from exporters import write_source
+from pdf_direct import render_document_pdf, render_source_pdf
+
+
+def pdf_text(path):
+    reader = PdfReader(path)
+    return len(reader.pages), ''.join(page.extract_text() for page in reader.pages)
+
+
+def test_ao3_document(tmp_path):
+    doc = Document('ao3', 'Quiet Harbor 静港', 'someone', 'https://archiveofourown.org/works/1',
+                   [Chapter('Chapter 1', ['First paragraph.', '第二段']), Chapter('Chapter 2', ['Last paragraph.'])],
+                   metadata=['Rating: General Audiences', 'Words: 6'], chaptered=True)
+    pdf_path = str(tmp_path / 'ao3.pdf')
+    ok, message = render_document_pdf(doc, pdf_path)
+    assert ok, message
+    pages, text = pdf_text(pdf_path)
+    assert pages > 0
+    assert 'Quiet Harbor' in text and '静港' in text
+    assert 'Last paragraph.' in text
+
+
+def test_lofter_document_from_source(tmp_path):
+    doc = Document('lofter', 'Evening Notes 晚记', '作者', 'https://a.lofter.com/post/1_abc',
+                   [Chapter(None, ['今天下雨了。', 'It rained today.'])],
+                   author_ip='a', public_time='2024-01-02')
+    source_path = str(tmp_path / 'doc.jsonl')
+    write_source(source_path, doc)
+    pdf_path = str(tmp_path / 'lofter.pdf')
+    ok, message = render_source_pdf(source_path, pdf_path)
+    assert ok, message
+    pages, text = pdf_text(pdf_path)
+    assert pages > 0
+    assert 'Evening Notes' in text and '晚记' in text
+    assert 'It rained today.' in text
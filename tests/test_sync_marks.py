@@ -0,0 +1,75 @@
+# coding:utf-8
+import json
+
+from sync_marks import MAX_SEEN_IDS, SyncMarks, SyncRun
+
+
+def test_first_run_is_not_active_and_commit_records_marks(tmp_path):
+    marks = SyncMarks(str(tmp_path / 'marks.json'))
+    run = SyncRun(marks, 'author:a')
+    assert not run.active
+    assert not run.is_archived('1', 1000)
+    run.observe('2', 2000)
+    run.observe('1', 1000)
+    run.commit()
+
+    saved = json.loads((tmp_path / 'marks.json').read_text(encoding='utf-8'))
+    assert saved['author:a']['newest'] == 2000
+    assert saved['author:a']['ids'] == ['2', '1']
+
+
+def test_incremental_run_stops_at_marks(tmp_path):
+    marks = SyncMarks(str(tmp_path / 'marks.json'))
+    marks.merge('author:a', 2000, ['2', '1'])
+
+    run = SyncRun(marks, 'author:a')
+    assert run.active
+    assert run.is_archived('2')
+    assert run.is_archived('99', 1500)
+    assert not run.is_archived('3', 3000)
+
+    # 按操作时间排列的来源只看帖子 ID
+    by_id = SyncRun(marks, 'author:a', by_time=False)
+    assert not by_id.is_archived('99', 1500)
+
+    # 完整翻页时不使用标记
+    full = SyncRun(marks, 'author:a', incremental=False)
+    assert not full.active and not full.is_archived('2', 2000)
+
+
+def test_uncommitted_run_leaves_marks_unchanged(tmp_path):
+    marks = SyncMarks(str(tmp_path / 'marks.json'))
+    marks.merge('tag:x', 1000, ['1'])
+    run = SyncRun(marks, 'tag:x')
+    run.observe('2', 2000)
+    assert marks.get('tag:x')['newest'] == 1000
+
+
+def test_state_restores_from_checkpoint(tmp_path):
+    marks = SyncMarks(str(tmp_path / 'marks.json'))
+    run = SyncRun(marks, 'like2', by_time=False)
+    run.observe('5', 5000)
+    resumed = SyncRun(marks, 'like2', by_time=False, state=run.state())
+    resumed.observe('4', 4000)
+    resumed.commit()
+    assert marks.get('like2')['ids'] == ['5', '4']
+    assert marks.get('like2')['newest'] == 5000
+
+
+def test_merge_keeps_newest_ids_first_and_capped(tmp_path):
+    marks = SyncMarks(str(tmp_path / 'marks.json'))
+    marks.merge('s', 10, [str(i) for i in range(MAX_SEEN_IDS)])
+    marks.merge('s', 5, ['new', '0'])
+    mark = marks.get('s')
+    assert mark['newest'] == 10
+    assert mark['ids'][:2] == ['new', '0']
+    assert len(mark['ids']) == MAX_SEEN_IDS
+
+
+def test_merge_picks_up_other_writers(tmp_path):
+    path = str(tmp_path / 'marks.json')
+    first, second = SyncMarks(path), SyncMarks(path)
+    first.merge('a', 1, ['1'])
+    second.merge('b', 2, ['2'])
+    assert set(json.loads((tmp_path / 'marks.json').read_text(encoding='utf-8'))) == {'a', 'b'}
+    assert first.get('b')['ids'] == ['2']
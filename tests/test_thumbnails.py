@@ -0,0 +1,62 @@
+# coding:utf-8
+import os
+import time
+
+from PIL import Image
+
+from thumbnails import ThumbnailCache
+
+
+def make_image(root, name, size=(800, 400)):
+    path = os.path.join(root, 'img', name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    Image.new('RGB', size, (200, 80, 40)).save(path)
+    return path
+
+
+def wait_until(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, '等待超时'
+        time.sleep(0.02)
+
+
+def test_thumbnail_is_cached(tmp_path):
+    root = str(tmp_path)
+    src = make_image(root, 'a.png')
+    cache = ThumbnailCache(root)
+
+    thumb = cache.get(src, size=128, fmt='jpeg')
+    assert thumb.startswith(cache.root)
+    with Image.open(thumb) as img:
+        assert img.format == 'JPEG' and img.size == (128, 64)
+
+    # 命中缓存：直接返回已完成的结果，不再提交到进程池
+    future = cache.submit(src, size=128, fmt='jpeg')
+    assert future.done() and future.result() == thumb
+    # 尺寸、格式或原图修改时间变化时是另一个缓存文件
+    assert cache.cache_path(src, 256, 'jpeg') != thumb
+    os.utime(src, ns=(1, 1))
+    assert cache.cache_path(src, 128, 'jpeg') != thumb
+
+
+def test_least_recently_used_is_evicted(tmp_path):
+    root = str(tmp_path)
+    a, b, c = (make_image(root, name) for name in ('a.png', 'b.png', 'c.png'))
+    cache = ThumbnailCache(root)
+    thumb_a = cache.get(a, fmt='jpeg')
+    thumb_b = cache.get(b, fmt='jpeg')
+    # 生成完成的回调里登记到缓存
+    wait_until(lambda: len(cache._entries) == 2)
+    # 同样的像素，缩略图大小相同；上限只容得下两张
+    size = os.path.getsize(thumb_a)
+    assert os.path.getsize(thumb_b) == size
+    cache.limit = 2 * size
+
+    cache.get(a, fmt='jpeg')
+    thumb_c = cache.get(c, fmt='jpeg')
+    wait_until(lambda: not os.path.exists(thumb_b))
+    assert os.path.exists(thumb_a) and os.path.exists(thumb_c)
+
+    # 重启后从磁盘恢复缓存内容
+    assert set(ThumbnailCache(root)._entries) == {thumb_a, thumb_c}
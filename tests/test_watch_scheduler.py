@@ -0,0 +1,134 @@
+# coding:utf-8
+import threading
+import time
+
+import watch_scheduler
+from watch_scheduler import MIN_INTERVAL_MINUTES, WatchScheduler, validate, validate_interval
+
+
+def make_scheduler(tmp_path, run_task=None):
+    return WatchScheduler(str(tmp_path / 'watch.json'), run_task or (lambda task_type, params: (True, None)),
+                          log=lambda message: None)
+
+
+def test_validate():
+    assert validate('author_txt', {'author_url': 'https://a.lofter.com/'}) is None
+    assert validate('single_txt', {}) is not None
+    assert validate('author_img', {}) is not None
+    assert validate('like_share_tag', {'mode': 'tag'}) is not None
+    assert validate('ao3', {'urls': [' ']}) is not None
+    # AO3 没有增量同步
+    assert validate('ao3', {'urls': ['https://archiveofourown.org/works/1'], 'incremental': True}) is not None
+
+
+def test_validate_interval():
+    for interval in (None, MIN_INTERVAL_MINUTES, 720, '60', 30.5):
+        assert validate_interval(interval) is None
+    for interval in ('abc', '', [], True, 0, MIN_INTERVAL_MINUTES - 1, '5', float('nan'), float('inf')):
+        assert validate_interval(interval) is not None
+
+
+def test_same_source_is_merged(tmp_path):
+    scheduler = make_scheduler(tmp_path)
+    first = scheduler.add('author_txt', {'author_url': 'https://Writer.lofter.com/'}, interval_minutes=120)
+    # 同一作者的不同页面链接是同一来源：合并，间隔取较短的
+    second = scheduler.add('author_txt', {'author_url': 'https://writer.lofter.com/view', 'mode': 'all'},
+                           interval_minutes=60, name='作者')
+    assert second['id'] == first['id']
+    assert second['interval'] == 60 and second['name'] == '作者'
+    assert second['params'] == {'author_url': 'https://writer.lofter.com/view', 'mode': 'all'}
+    longer = scheduler.add('author_txt', {'author_url': 'https://writer.lofter.com/'}, interval_minutes='600')
+    assert longer['interval'] == 60
+    assert scheduler.update(first['id'], interval_minutes='90.5')['interval'] == 90
+
+    # 类型或来源不同的是另一项；间隔不低于下限
+    other = scheduler.add('author_img', {'author_url': 'https://writer.lofter.com/'}, interval_minutes=1)
+    assert other['id'] != first['id'] and other['interval'] == MIN_INTERVAL_MINUTES
+    assert len(scheduler.status()['entries']) == 2
+    # 列表保存在文件中，重启后继续
+    assert {entry['id'] for entry in make_scheduler(tmp_path).status()['entries']} == {first['id'], other['id']}
+
+
+def test_manual_run_postpones_refresh(tmp_path):
+    scheduler = make_scheduler(tmp_path)
+    entry = scheduler.add('like_share_tag', {'mode': 'tag', 'url': 'https://www.lofter.com/tag/x/'})
+    other = scheduler.add('like_share_tag', {'mode': 'tag', 'url': 'https://www.lofter.com/tag/y'})
+    scheduler.run_now(entry['id'])
+    scheduler.run_now(other['id'])
+
+    scheduler.note_run('like_share_tag', {'mode': 'tag', 'url': 'https://www.lofter.com/tag/X'})
+    entries = {e['id']: e for e in scheduler.status()['entries']}
+    assert entries[entry['id']]['next_run'] > time.time() + entry['interval'] * 60 * 0.8
+    assert entries[other['id']]['next_run'] <= time.time()
+
+
+def test_finish_records_status(tmp_path):
+    scheduler = make_scheduler(tmp_path)
+    entry = scheduler.add('author_txt', {'author_url': 'https://a.lofter.com/'}, interval_minutes=60)
+    scheduler.run_now(entry['id'])
+    due, delay = scheduler._next_due()
+    assert due['id'] == entry['id'] and delay == 0
+    assert scheduler.status()['running'] == entry['id']
+    # 正在刷新的项不因同一来源的手动任务顺延
+    scheduler.note_run('author_txt', {'author_url': 'https://a.lofter.com/'})
+    assert scheduler.status()['entries'][0]['next_run'] <= time.time()
+
+    scheduler._finish(entry['id'], '网络错误')
+    result = scheduler.status()
+    assert result['running'] is None
+    saved = result['entries'][0]
+    assert (saved['last_status'], saved['last_error'], saved['runs']) == ('error', '网络错误', 1)
+    assert saved['next_run'] - saved['last_run'] > 60 * 60 * 0.8
+
+    scheduler._finish(entry['id'], None)
+    saved = scheduler.status()['entries'][0]
+    assert (saved['last_status'], saved['last_error'], saved['runs']) == ('ok', None, 2)
+
+
+def test_scheduler_runs_due_entries(tmp_path, monkeypatch):
+    monkeypatch.setattr(watch_scheduler, 'WATCH_MIN_GAP', 0)
+    calls = []
+    ran = threading.Event()
+
+    def run_task(task_type, params):
+        calls.append((task_type, params))
+        ran.set()
+        return True, None
+
+    scheduler = make_scheduler(tmp_path, run_task)
+    entry = scheduler.add('author_img', {'author_url': 'https://a.lofter.com/'})
+    scheduler.run_now(entry['id'])
+    scheduler.start()
+    try:
+        assert ran.wait(10)
+    finally:
+        scheduler.stop()
+    # 刷新时只获取新内容
+    assert calls == [('author_img', {'author_url': 'https://a.lofter.com/', 'incremental': True, 'resume': True})]
+
+
+def test_failed_refresh_is_recorded(tmp_path, monkeypatch):
+    monkeypatch.setattr(watch_scheduler, 'WATCH_MIN_GAP', 0)
+    calls = []
+    ran = threading.Event()
+
+    def run_task(task_type, params):
+        calls.append((task_type, params))
+        ran.set()
+        return True, '2 个条目保存失败'
+
+    scheduler = make_scheduler(tmp_path, run_task)
+    entry = scheduler.add('ao3', {'urls': ['https://archiveofourown.org/tags/x/works']})
+    scheduler.run_now(entry['id'])
+    scheduler.start()
+    try:
+        assert ran.wait(10)
+        deadline = time.monotonic() + 10
+        while scheduler.get(entry['id'])['runs'] == 0 and time.monotonic() < deadline:
+            time.sleep(0.02)
+    finally:
+        scheduler.stop()
+    # AO3 只看列表第一页，不带增量参数
+    assert calls == [('ao3', {'urls': ['https://archiveofourown.org/tags/x/works'], 'max_pages': 1})]
+    saved = scheduler.get(entry['id'])
+    assert (saved['last_status'], saved['last_error']) == ('error', '2 个条目保存失败')
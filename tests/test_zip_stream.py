@@ -0,0 +1,48 @@
+# coding:utf-8
+import io
+import zipfile
+
+import zip_stream
+
+
+def make_tree(root):
+    (root / 'a').mkdir()
+    (root / 'a' / 'x.txt').write_text('hello', encoding='utf-8')
+    (root / 'b.jpg').write_bytes(b'\xff\xd8' + b'0' * 1000)
+    (root / '.hidden').write_text('secret', encoding='utf-8')
+    (root / 'zip').mkdir()
+    (root / 'zip' / 'old.zip').write_bytes(b'PK')
+
+
+def test_iter_tree_skips_hidden_and_skip_dir(tmp_path):
+    root = tmp_path / 'save'
+    root.mkdir()
+    make_tree(root)
+    names = [arcname for _, arcname in zip_stream.iter_tree(str(root), skip_dir=str(root / 'zip'))]
+    # 同一目录中先列文件、再进入子目录
+    assert names == ['save/b.jpg', 'save/a/x.txt']
+
+
+def test_stream_zip_round_trip(tmp_path):
+    root = tmp_path / 'save'
+    root.mkdir()
+    make_tree(root)
+    data = b''.join(zip_stream.stream_zip(zip_stream.iter_tree(str(root))))
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        assert zf.testzip() is None
+        assert zf.read('save/a/x.txt') == b'hello'
+        assert zf.read('save/zip/old.zip') == b'PK'
+        # 已压缩格式直接存储
+        assert zf.getinfo('save/b.jpg').compress_type == zipfile.ZIP_STORED
+        assert zf.getinfo('save/a/x.txt').compress_type == zipfile.ZIP_DEFLATED
+
+
+def test_write_zip_counts_files(tmp_path):
+    root = tmp_path / 'save'
+    root.mkdir()
+    make_tree(root)
+    dest = tmp_path / 'out.zip'
+    seen = []
+    count = zip_stream.write_zip(zip_stream.iter_tree(str(root)), str(dest), on_file=lambda n, name: seen.append(name))
+    assert count == 3 and len(seen) == 3
+    assert zipfile.ZipFile(str(dest)).namelist() == seen
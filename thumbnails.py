@@ -0,0 +1,173 @@
+# coding:utf-8
+"""
+图片缩略图服务
+
+界面预览图片时不必加载原图（常常是几 MB 的 PNG / GIF）：用 Pillow 生成缩小的
+WebP（不支持时为 JPEG）缩略图，在独立的进程池中生成，缓存在保存目录的 .thumbs/ 下。
+缓存文件名由「原图相对路径 + 修改时间 + 尺寸 + 格式」哈希得到，原图变化后自动失效；
+缓存总大小超过上限时按最近使用时间淘汰（LRU）。图片保存时可以预先生成默认尺寸。
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from cpu_pool import LazyProcessPool
+
+THUMB_DIR_NAME = '.thumbs'
+DEFAULT_SIZE = 256
+ALLOWED_SIZES = (128, 256, 512)
+# 缩略图缓存总大小上限（字节）
+CACHE_LIMIT = 200 * 1024 * 1024
+
+_webp_supported = None
+
+
+def init_thumb_worker():
+    """缩略图工作进程启动时调用：预先导入 Pillow"""
+    from PIL import Image  # noqa: F401
+
+
+def default_format():
+    global _webp_supported
+    if _webp_supported is None:
+        try:
+            from PIL import features
+            _webp_supported = bool(features.check('webp'))
+        except Exception:
+            _webp_supported = False
+    return 'webp' if _webp_supported else 'jpeg'
+
+
+def make_thumbnail(src_path, dst_path, size, fmt):
+    """生成缩略图（在进程池中执行）：GIF 取第一帧，等比缩小到 size x size 以内"""
+    from PIL import Image
+
+    with Image.open(src_path) as img:
+        img.seek(0)
+        # JPEG 解码时直接按比例缩小，大图省去大部分解码工作
+        img.draft('RGB', (size, size))
+        has_alpha = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+        img = img.convert('RGBA' if has_alpha and fmt == 'webp' else 'RGB')
+        img.thumbnail((size, size), Image.LANCZOS)
+        tmp_path = f"{dst_path}.{os.getpid()}.tmp"
+        img.save(tmp_path, 'WEBP' if fmt == 'webp' else 'JPEG', quality=80)
+    os.replace(tmp_path, dst_path)
+    return dst_path
+
+
+thumb_pool = LazyProcessPool(init_thumb_worker, 'thumb')
+
+
+class ThumbnailCache:
+    """一个保存目录的缩略图缓存"""
+
+    def __init__(self, save_root, limit=CACHE_LIMIT):
+        self.save_root = os.path.abspath(save_root)
+        self.root = os.path.join(self.save_root, THUMB_DIR_NAME)
+        self.limit = limit
+        self._lock = threading.Lock()
+        # 缓存文件 -> 大小，按最近使用排序（最久未用的在前）
+        self._entries = OrderedDict()
+        self._total = 0
+        self._inflight = {}
+        self._load()
+
+    def _load(self):
+        entries = []
+        if os.path.isdir(self.root):
+            for sub in os.scandir(self.root):
+                if not sub.is_dir():
+                    continue
+                for entry in os.scandir(sub.path):
+                    if entry.is_file() and not entry.name.endswith('.tmp'):
+                        st = entry.stat()
+                        entries.append((st.st_mtime, entry.path, st.st_size))
+        for _, path, size in sorted(entries):
+            self._entries[path] = size
+            self._total += size
+
+    def cache_path(self, src_path, size, fmt):
+        rel_path = os.path.relpath(os.path.abspath(src_path), self.save_root)
+        mtime_ns = os.stat(src_path).st_mtime_ns
+        key = hashlib.sha1(f"{rel_path}\0{mtime_ns}\0{size}\0{fmt}".encode('utf-8')).hexdigest()
+        return os.path.join(self.root, key[:2], f"{key}.{'webp' if fmt == 'webp' else 'jpg'}")
+
+    def _touch(self, path):
+        """命中缓存：移到 LRU 末尾，并更新修改时间（重启后按它恢复使用顺序）"""
+        with self._lock:
+            if path in self._entries:
+                self._entries.move_to_end(path)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def _add(self, path):
+        size = os.path.getsize(path)
+        evict = []
+        with self._lock:
+            self._total += size - self._entries.pop(path, 0)
+            self._entries[path] = size
+            while self._total > self.limit and len(self._entries) > 1:
+                old_path, old_size = self._entries.popitem(last=False)
+                self._total -= old_size
+                evict.append(old_path)
+        for old_path in evict:
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass
+
+    def submit(self, src_path, size=DEFAULT_SIZE, fmt=None):
+        """返回生成缩略图的 Future（结果为缓存文件路径）；已缓存时返回已完成的 Future"""
+        from concurrent.futures import Future
+
+        fmt = fmt or default_format()
+        dst_path = self.cache_path(src_path, size, fmt)
+        if os.path.exists(dst_path):
+            self._touch(dst_path)
+            future = Future()
+            future.set_result(dst_path)
+            return future
+        with self._lock:
+            future = self._inflight.get(dst_path)
+            if future is not None:
+                return future
+            os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+            future = thumb_pool.submit(make_thumbnail, src_path, dst_path, size, fmt)
+            self._inflight[dst_path] = future
+        future.add_done_callback(lambda f: self._done(f, dst_path))
+        return future
+
+    def _done(self, future, dst_path):
+        with self._lock:
+            self._inflight.pop(dst_path, None)
+        if future.exception() is None:
+            self._add(dst_path)
+
+    def get(self, src_path, size=DEFAULT_SIZE, fmt=None, timeout=30):
+        """返回缩略图缓存文件路径，没有时生成并等待"""
+        return self.submit(src_path, size, fmt).result(timeout=timeout)
+
+    def pregenerate(self, src_path):
+        """图片保存后预先生成默认尺寸的缩略图（不等待结果）"""
+        try:
+            self.submit(src_path)
+        except Exception:
+            pass
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def cache_for(save_root):
+    """保存目录对应的 ThumbnailCache（按绝对路径缓存）"""
+    root = os.path.abspath(save_root)
+    with _caches_lock:
+        cache = _caches.get(root)
+        if cache is None:
+            cache = _caches[root] = ThumbnailCache(root)
+        return cache
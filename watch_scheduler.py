@@ -0,0 +1,310 @@
+# coding:utf-8
+"""
+关注列表：定时增量刷新作者、Tag、AO3 搜索等来源
+
+关注列表中的每一项是一个任务（与 POST /api/task/start 的请求体相同）加上刷新间隔，
+调度线程在后端进程内按间隔逐项运行：
+- 下次运行时间带随机抖动，启动时已到期的项也随机错开，相邻两次刷新之间至少间隔 WATCH_MIN_GAP 秒
+- 任务在同一进程中运行（与手动任务共用任务线程），共享 Lofter 翻页 / 抓取限速器；
+  已有任务在运行时等它结束再试
+- 同一来源（同一作者 / Tag / AO3 链接）只保留一项，重复添加时合并；手动运行了同一来源后，该项的下次刷新顺延
+- 列表和每项的上次 / 下次运行时间保存在 JSON 文件中，重启后继续
+"""
+
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+import uuid
+
+# 可以加入关注列表的任务类型
+WATCH_TASK_TYPES = ('author_img', 'author_txt', 'like_share_tag', 'ao3')
+# 刷新间隔下限（分钟）与默认值
+MIN_INTERVAL_MINUTES = 10
+DEFAULT_INTERVAL_MINUTES = 24 * 60
+# 下次运行时间的随机抖动比例（间隔的 ±10%）
+WATCH_JITTER = 0.1
+# 相邻两次刷新之间的最小间隔（秒），实际间隔在 1~2 倍之间随机
+WATCH_MIN_GAP = 60
+# 启动时已到期的项在这么多秒内随机错开
+WATCH_STARTUP_SPREAD = 600
+# 有任务在运行时的重试间隔，以及空闲时最长多久检查一次（秒）
+WATCH_BUSY_RETRY = 30
+WATCH_POLL = 300
+# Lofter 任务刷新时固定使用的任务参数：只获取新内容、从断点继续
+WATCH_PARAMS = {'incremental': True, 'resume': True}
+# AO3 没有增量同步：列表默认只看第一页（按更新时间排序，新作品在最前），已下载的作品按下载历史跳过
+WATCH_AO3_MAX_PAGES = 1
+
+
+def source_key(task_type, params):
+    """来源标识：同一作者 / Tag / 链接的任务得到相同的标识"""
+    if task_type in ('author_img', 'author_txt'):
+        match = re.search(r"https?://([^/]+)", params.get('author_url', ''))
+        return f"{task_type}:{(match.group(1) if match else params.get('author_url', '')).lower()}"
+    if task_type == 'like_share_tag':
+        return f"{task_type}:{params.get('mode', 'like2')}:{params.get('url', '').strip().rstrip('/').lower()}"
+    urls = sorted(url.strip().rstrip('/') for url in params.get('urls', []) if url.strip())
+    return f"{task_type}:{'|'.join(urls)}"
+
+
+def validate(task_type, params):
+    """检查关注项的任务参数，返回错误信息（没有问题时返回 None）"""
+    if task_type not in WATCH_TASK_TYPES:
+        return f"不支持关注的任务类型: {task_type}"
+    if task_type in ('author_img', 'author_txt') and not params.get('author_url'):
+        return '请提供作者主页链接'
+    if task_type == 'like_share_tag' and not params.get('url'):
+        return '请提供链接地址'
+    if task_type == 'ao3' and not any(url.strip() for url in params.get('urls', [])):
+        return '请提供AO3链接'
+    if task_type == 'ao3' and 'incremental' in params:
+        return 'AO3 不支持增量同步（incremental），刷新时只看列表前 max_pages 页，已下载的作品自动跳过'
+    return None
+
+
+def validate_interval(interval_minutes):
+    """检查刷新间隔（分钟），返回错误信息；未指定（None）时使用默认值"""
+    if interval_minutes is None:
+        return None
+    try:
+        interval = float(interval_minutes)
+    except (TypeError, ValueError):
+        interval = None
+    if (isinstance(interval_minutes, bool) or interval is None or not math.isfinite(interval)
+            or interval < MIN_INTERVAL_MINUTES):
+        return f"刷新间隔应为不小于 {MIN_INTERVAL_MINUTES} 的分钟数"
+    return None
+
+
+def _jittered(seconds):
+    return seconds * random.uniform(1 - WATCH_JITTER, 1 + WATCH_JITTER)
+
+
+class WatchScheduler:
+    """关注列表和定时刷新线程
+
+    run_task(task_type, params) 在没有任务运行时启动任务并等待结束，返回 (是否启动, 错误信息)；
+    任务出错提前结束或有条目保存失败时错误信息不为 None，该项记为 error
+    """
+
+    def __init__(self, watch_file, run_task, log=print):
+        self.watch_file = watch_file
+        self.run_task = run_task
+        self.log = log
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._running_id = None
+        self.paused = False
+        self._entries = self._load()
+
+    # ---- 持久化 ----
+
+    def _load(self):
+        entries = {}
+        if os.path.exists(self.watch_file):
+            try:
+                with open(self.watch_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self.paused = data.get('paused', False)
+                for entry in data.get('entries', []):
+                    entries[entry['id']] = entry
+            except Exception as e:
+                print(f"加载关注列表失败: {e}")
+        # 停机期间已到期的项在启动后随机错开，不集中请求
+        now = time.time()
+        for entry in entries.values():
+            if entry['next_run'] < now:
+                entry['next_run'] = now + random.uniform(WATCH_MIN_GAP, WATCH_STARTUP_SPREAD)
+        return entries
+
+    def _save(self):
+        """写入关注列表文件（调用方持有锁）"""
+        tmp_path = self.watch_file + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'paused': self.paused, 'entries': list(self._entries.values())}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.watch_file)
+        except Exception as e:
+            print(f"保存关注列表失败: {e}")
+
+    # ---- 关注项管理 ----
+
+    def add(self, task_type, params, interval_minutes=DEFAULT_INTERVAL_MINUTES, name=''):
+        """加入关注列表，返回关注项；同一来源已在列表中时合并到原来的项（参数更新，间隔取较短的）"""
+        interval = max(MIN_INTERVAL_MINUTES, int(float(interval_minutes or DEFAULT_INTERVAL_MINUTES)))
+        key = source_key(task_type, params)
+        now = time.time()
+        with self._lock:
+            entry = next((e for e in self._entries.values() if e['source'] == key), None)
+            if entry is None:
+                entry = {
+                    'id': uuid.uuid4().hex[:12],
+                    'source': key,
+                    'type': task_type,
+                    'params': dict(params),
+                    'name': name or key.split(':', 1)[1],
+                    'interval': interval,
+                    'enabled': True,
+                    'created': now,
+                    'last_run': None,
+                    'last_status': None,
+                    'last_error': None,
+                    'runs': 0,
+                    # 第一次刷新也错开，不与其他项同时开始
+                    'next_run': now + random.uniform(WATCH_MIN_GAP, 2 * WATCH_MIN_GAP),
+                }
+                self._entries[entry['id']] = entry
+            else:
+                entry['params'].update(params)
+                entry['interval'] = min(entry['interval'], interval)
+                entry['name'] = name or entry['name']
+                entry['enabled'] = True
+            self._save()
+        self._wake.set()
+        return dict(entry)
+
+    def update(self, entry_id, interval_minutes=None, enabled=None, params=None, name=None):
+        """修改关注项，返回修改后的关注项；不存在时返回 None"""
+        with self._lock:
+            entry = self._entries.get(entry_id)
+            if entry is None:
+                return None
+            if interval_minutes is not None:
+                entry['interval'] = max(MIN_INTERVAL_MINUTES, int(float(interval_minutes)))
+                entry['next_run'] = min(entry['next_run'], time.time() + _jittered(entry['interval'] * 60))
+            if enabled is not None:
+                entry['enabled'] = bool(enabled)
+            if params:
+                entry['params'].update(params)
+            if name:
+                entry['name'] = name
+            self._save()
+            result = dict(entry)
+        self._wake.set()
+        return result
+
+    def get(self, entry_id):
+        """关注项；不存在时返回 None"""
+        with self._lock:
+            entry = self._entries.get(entry_id)
+            return dict(entry, params=dict(entry['params'])) if entry else None
+
+    def remove(self, entry_id):
+        with self._lock:
+            if self._entries.pop(entry_id, None) is None:
+                return False
+            self._save()
+            return True
+
+    def run_now(self, entry_id):
+        """把关注项排到最前（已经排在最前时不重复运行）"""
+        with self._lock:
+            entry = self._entries.get(entry_id)
+            if entry is None:
+                return False
+            entry['next_run'] = min(entry['next_run'], time.time())
+            self._save()
+        self._wake.set()
+        return True
+
+    def set_paused(self, paused):
+        with self._lock:
+            self.paused = bool(paused)
+            self._save()
+        self._wake.set()
+
+    def note_run(self, task_type, params):
+        """手动运行了某个任务：同一来源的关注项视为刚刷新过，下次刷新顺延"""
+        key = source_key(task_type, params)
+        with self._lock:
+            for entry in self._entries.values():
+                if entry['source'] == key and entry['id'] != self._running_id:
+                    entry['next_run'] = time.time() + _jittered(entry['interval'] * 60)
+                    self._save()
+
+    def status(self):
+        """关注列表（按下次运行时间排序）和调度状态"""
+        with self._lock:
+            entries = sorted(self._entries.values(), key=lambda entry: entry['next_run'])
+            return {
+                'paused': self.paused,
+                'running': self._running_id,
+                'entries': [dict(entry) for entry in entries],
+            }
+
+    # ---- 调度线程 ----
+
+    def start(self):
+        """启动调度线程（已启动时不做任何事）"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='watch-scheduler', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """关闭服务时调用：不再启动新的刷新（正在运行的任务由任务线程自己结束）"""
+        self._stopping.set()
+        self._wake.set()
+
+    def _next_due(self):
+        """已到期的关注项中最早的一个；没有时返回 (None, 距下一项到期的秒数)"""
+        with self._lock:
+            if self.paused:
+                return None, WATCH_POLL
+            enabled = [entry for entry in self._entries.values() if entry['enabled']]
+            if not enabled:
+                return None, WATCH_POLL
+            entry = min(enabled, key=lambda entry: entry['next_run'])
+            delay = entry['next_run'] - time.time()
+            if delay > 0:
+                return None, min(delay, WATCH_POLL)
+            self._running_id = entry['id']
+            return dict(entry), 0
+
+    def _finish(self, entry_id, error):
+        with self._lock:
+            self._running_id = None
+            entry = self._entries.get(entry_id)
+            if entry is None:
+                return
+            now = time.time()
+            entry['last_run'] = now
+            entry['last_status'] = 'ok' if error is None else 'error'
+            entry['last_error'] = error
+            entry['runs'] += 1
+            entry['next_run'] = now + _jittered(entry['interval'] * 60)
+            self._save()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            entry, delay = self._next_due()
+            if entry is None:
+                self._wake.wait(timeout=delay)
+                self._wake.clear()
+                continue
+
+            params = dict(entry['params'])
+            if entry['type'] == 'ao3':
+                params.setdefault('max_pages', WATCH_AO3_MAX_PAGES)
+            else:
+                params.update(WATCH_PARAMS)
+            started, error = self.run_task(entry['type'], params)
+            if not started:
+                # 已有任务在运行（或服务正在关闭）：稍后再试
+                with self._lock:
+                    self._running_id = None
+                self._stopping.wait(WATCH_BUSY_RETRY)
+                continue
+
+            self._finish(entry['id'], error)
+            self.log(f"⏰ 关注列表刷新完成: {entry['name']}" + (f"（出错: {error}）" if error else ''))
+            # 相邻两次刷新之间随机间隔，不连续请求
+            self._stopping.wait(random.uniform(WATCH_MIN_GAP, 2 * WATCH_MIN_GAP))
@@ -0,0 +1,58 @@
+# coding:utf-8
+"""
+生产环境 HTTP 服务
+
+Flask 自带的开发服务器在界面轮询、API 脚本和文件浏览同时进行时会成为瓶颈。
+生产模式改用 waitress：固定数量的工作线程处理请求，线程都忙时请求在任务队列中排队，
+超过连接上限的连接留在 listen backlog 中等待。
+
+收到 Ctrl+C / SIGTERM 时先进入排空阶段：服务继续响应（界面仍可查看进度），
+由 drain 回调等待正在运行的任务完成，然后才关闭服务；排空期间再次收到信号则立即退出。
+"""
+
+import _thread
+import signal
+import threading
+
+
+def serve(app, host='0.0.0.0', port=5000, threads=8, connection_limit=100, backlog=1024,
+          channel_timeout=120, drain=None):
+    """用 waitress 运行 app，直到收到退出信号且 drain() 返回"""
+    from waitress.server import create_server
+
+    server = create_server(app, host=host, port=port, threads=threads,
+                           connection_limit=connection_limit, backlog=backlog,
+                           channel_timeout=channel_timeout, ident='LoArchive')
+    stopping = threading.Event()
+    drained = threading.Event()
+
+    def finish():
+        try:
+            if drain is not None:
+                drain()
+        finally:
+            drained.set()
+            # 模拟 SIGINT：在主线程中抛出 KeyboardInterrupt，waitress 随即停止事件循环并关闭工作线程
+            _thread.interrupt_main()
+
+    def on_signal(signum, frame):
+        if drained.is_set():
+            raise KeyboardInterrupt
+        if stopping.is_set():
+            print("再次收到退出信号，立即退出")
+            raise KeyboardInterrupt
+        stopping.set()
+        print("正在关闭服务：等待当前任务完成（再次按 Ctrl+C 立即退出）")
+        threading.Thread(target=finish, name='drain', daemon=True).start()
+
+    for name in ('SIGINT', 'SIGTERM', 'SIGBREAK'):
+        signum = getattr(signal, name, None)
+        if signum is not None:
+            signal.signal(signum, on_signal)
+
+    print(f"生产模式: waitress {threads} 个线程，连接上限 {connection_limit}")
+    try:
+        server.run()
+    finally:
+        server.close()
+    print("服务已关闭")
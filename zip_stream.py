@@ -0,0 +1,109 @@
+# coding:utf-8
+"""
+流式 ZIP 打包
+
+把保存目录中的任意子目录边读边打包：zipfile 写入一个不可 seek 的接收器，
+每写完一块就把已生成的字节交出去（HTTP 响应的一个分块或文件的一次写入），
+不在内存或临时目录中暂存整个压缩包。JPEG / PNG / GIF 等本身已压缩的文件
+直接存储（ZIP_STORED），只有 TXT / HTML 等文本才用 deflate 压缩。
+"""
+
+import io
+import os
+import zipfile
+
+# 已压缩的格式：再压缩几乎不变小，只浪费 CPU
+STORED_EXTS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.pdf', '.epub', '.zip')
+CHUNK_SIZE = 256 * 1024
+
+
+class _ChunkSink(io.RawIOBase):
+    """zipfile 的输出目标：只收集写入的字节，由 stream_zip 取走"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def take(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_tree(root, skip_dir=None):
+    """产出目录下所有文件的 (绝对路径, 压缩包内路径)，跳过隐藏文件 / 目录和 skip_dir"""
+    skip_dir = os.path.abspath(skip_dir) if skip_dir else None
+    base = os.path.dirname(os.path.abspath(root))
+    pending = [os.path.abspath(root)]
+    while pending:
+        current = pending.pop()
+        try:
+            with os.scandir(current) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError:
+            continue
+        subdirs = []
+        for entry in entries:
+            if entry.name.startswith('.'):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                if entry.path != skip_dir:
+                    subdirs.append(entry.path)
+            elif entry.is_file():
+                yield entry.path, os.path.relpath(entry.path, base).replace(os.sep, '/')
+        pending.extend(reversed(subdirs))
+
+
+def stream_zip(files):
+    """按 files（(绝对路径, 压缩包内路径) 的可迭代对象）流式生成 ZIP，逐块产出字节"""
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, 'w') as zf:
+        for path, arcname in files:
+            try:
+                info = zipfile.ZipInfo.from_file(path, arcname)
+            except OSError:
+                continue
+            info.compress_type = (zipfile.ZIP_STORED if path.lower().endswith(STORED_EXTS)
+                                  else zipfile.ZIP_DEFLATED)
+            try:
+                with open(path, 'rb') as src, zf.open(info, 'w') as dst:
+                    for block in iter(lambda: src.read(CHUNK_SIZE), b''):
+                        dst.write(block)
+                        data = sink.take()
+                        if data:
+                            yield data
+            except OSError:
+                continue
+            data = sink.take()
+            if data:
+                yield data
+    # 中央目录
+    data = sink.take()
+    if data:
+        yield data
+
+
+def write_zip(files, dest_path, on_file=None):
+    """把 ZIP 流写到文件（先写临时文件再替换），返回打包的文件数"""
+    count = 0
+
+    def counted():
+        nonlocal count
+        for item in files:
+            count += 1
+            if on_file is not None:
+                on_file(count, item[1])
+            yield item
+
+    tmp_path = dest_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        for data in stream_zip(counted()):
+            f.write(data)
+    os.replace(tmp_path, dest_path)
+    return count